@@ -0,0 +1,104 @@
+"""Baseline schema
+
+Matches the tables previously created by Base.metadata.create_all. Databases
+that already have them should be stamped rather than upgraded:
+
+    alembic stamp 0001
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-15
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+revision = "0001"
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "treatments",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("generic_name", sa.String(255), nullable=False),
+        sa.Column("brand_names", postgresql.ARRAY(sa.Text())),
+        sa.Column("drug_class", sa.String(100)),
+        sa.Column("mechanism_of_action", sa.Text()),
+        sa.Column("fda_approval_status", sa.String(50)),
+        sa.Column("fda_approval_date", sa.Date()),
+        sa.Column("approved_indications", postgresql.ARRAY(sa.Text())),
+        sa.Column("biomarker_requirements", postgresql.JSONB()),
+        sa.Column("common_side_effects", postgresql.ARRAY(sa.Text())),
+        sa.Column("manufacturer", sa.String(255)),
+        sa.Column("source_urls", postgresql.JSONB()),
+        sa.Column("last_updated", sa.DateTime(), server_default=sa.func.now()),
+    )
+    op.create_index("ix_treatments_id", "treatments", ["id"])
+    op.create_index("ix_treatments_generic_name", "treatments", ["generic_name"])
+    op.create_index("ix_treatments_drug_class", "treatments", ["drug_class"])
+
+    op.create_table(
+        "clinical_trials",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("nct_id", sa.String(20), nullable=False),
+        sa.Column("title", sa.Text()),
+        sa.Column("brief_summary", sa.Text()),
+        sa.Column("phase", sa.String(20)),
+        sa.Column("status", sa.String(50)),
+        sa.Column("sponsor", sa.String(255)),
+        sa.Column("interventions", postgresql.JSONB()),
+        sa.Column("conditions", postgresql.ARRAY(sa.Text())),
+        sa.Column("eligibility_criteria", sa.Text()),
+        sa.Column("biomarker_requirements", postgresql.JSONB()),
+        sa.Column("primary_completion_date", sa.Date()),
+        sa.Column("locations", postgresql.JSONB()),
+        sa.Column("contact_info", postgresql.JSONB()),
+        sa.Column("study_url", sa.String(500)),
+        sa.Column("last_updated", sa.DateTime(), server_default=sa.func.now()),
+        sa.Column("nsclc_relevance", sa.String(20)),
+        sa.Column("relevance_score", sa.DECIMAL(3, 2)),
+        sa.Column("structured_eligibility", postgresql.JSONB()),
+        sa.Column("eligibility_extraction_version", sa.String(20)),
+        sa.Column("eligibility_extracted_at", sa.DateTime()),
+    )
+    op.create_index("ix_clinical_trials_id", "clinical_trials", ["id"])
+    op.create_index("ix_clinical_trials_nct_id", "clinical_trials", ["nct_id"], unique=True)
+    op.create_index("ix_clinical_trials_phase", "clinical_trials", ["phase"])
+    op.create_index("ix_clinical_trials_status", "clinical_trials", ["status"])
+    op.create_index("ix_clinical_trials_nsclc_relevance", "clinical_trials", ["nsclc_relevance"])
+
+    op.create_table(
+        "cancer_centers",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("name", sa.String(255), nullable=False),
+        sa.Column("address", sa.Text()),
+        sa.Column("city", sa.String(100)),
+        sa.Column("state", sa.String(50)),
+        sa.Column("country", sa.String(100)),
+        sa.Column("lat", sa.DECIMAL(10, 8)),
+        sa.Column("lng", sa.DECIMAL(11, 8)),
+        sa.Column("nci_designation", sa.String(50)),
+        sa.Column("us_news_rank", sa.Integer()),
+        sa.Column("academic_affiliation", sa.String(255)),
+        sa.Column("website", sa.String(500)),
+        sa.Column("phone", sa.String(50)),
+        sa.Column("specialties", postgresql.ARRAY(sa.Text())),
+        sa.Column("active_nsclc_trials", sa.Integer()),
+        sa.Column("source_urls", postgresql.JSONB()),
+        sa.Column("last_updated", sa.DateTime(), server_default=sa.func.now()),
+    )
+    op.create_index("ix_cancer_centers_id", "cancer_centers", ["id"])
+    op.create_index("ix_cancer_centers_name", "cancer_centers", ["name"])
+    op.create_index("ix_cancer_centers_city", "cancer_centers", ["city"])
+    op.create_index("ix_cancer_centers_state", "cancer_centers", ["state"])
+    op.create_index("ix_cancer_centers_nci_designation", "cancer_centers", ["nci_designation"])
+
+
+def downgrade() -> None:
+    op.drop_table("cancer_centers")
+    op.drop_table("clinical_trials")
+    op.drop_table("treatments")
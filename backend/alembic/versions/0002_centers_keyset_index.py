@@ -0,0 +1,25 @@
+"""Composite index for keyset pagination of /centers
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-15
+"""
+from alembic import op
+
+
+revision = "0002"
+down_revision = "0001"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Same order as the list_centers ORDER BY, so each page is an index seek
+    op.execute(
+        "CREATE INDEX IF NOT EXISTS centers_rank_name_id "
+        "ON cancer_centers (us_news_rank NULLS LAST, name, id)"
+    )
+
+
+def downgrade() -> None:
+    op.execute("DROP INDEX IF EXISTS centers_rank_name_id")
@@ -0,0 +1,30 @@
+"""PostGIS point column and GIST index on cancer_centers
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-15
+"""
+from alembic import op
+
+
+revision = "0003"
+down_revision = "0002"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.execute("CREATE EXTENSION IF NOT EXISTS postgis")
+    op.execute(
+        "ALTER TABLE cancer_centers ADD COLUMN IF NOT EXISTS geom geography(Point,4326) "
+        "GENERATED ALWAYS AS "
+        "(ST_SetSRID(ST_MakePoint(lng::float, lat::float), 4326)::geography) STORED"
+    )
+    op.execute(
+        "CREATE INDEX IF NOT EXISTS centers_geom_gix ON cancer_centers USING GIST (geom)"
+    )
+
+
+def downgrade() -> None:
+    op.execute("DROP INDEX IF EXISTS centers_geom_gix")
+    op.execute("ALTER TABLE cancer_centers DROP COLUMN IF EXISTS geom")
@@ -0,0 +1,30 @@
+"""GIN index for case-insensitive specialty filtering
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-15
+"""
+from alembic import op
+
+
+revision = "0004"
+down_revision = "0003"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.execute(
+        "CREATE OR REPLACE FUNCTION lower_text_array(text[]) RETURNS text[] "
+        "AS $$ SELECT array_agg(lower(s)) FROM unnest($1) AS s $$ "
+        "LANGUAGE sql IMMUTABLE PARALLEL SAFE"
+    )
+    op.execute(
+        "CREATE INDEX IF NOT EXISTS centers_specialties_gin "
+        "ON cancer_centers USING GIN (lower_text_array(specialties))"
+    )
+
+
+def downgrade() -> None:
+    op.execute("DROP INDEX IF EXISTS centers_specialties_gin")
+    op.execute("DROP FUNCTION IF EXISTS lower_text_array(text[])")
@@ -0,0 +1,29 @@
+"""Trigram indexes for the /centers free-text search
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2026-10-15
+"""
+from alembic import op
+
+
+revision = "0005"
+down_revision = "0004"
+branch_labels = None
+depends_on = None
+
+COLUMNS = ["name", "city", "academic_affiliation"]
+
+
+def upgrade() -> None:
+    op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    for column in COLUMNS:
+        op.execute(
+            f"CREATE INDEX IF NOT EXISTS centers_{column}_trgm "
+            f"ON cancer_centers USING GIN ({column} gin_trgm_ops)"
+        )
+
+
+def downgrade() -> None:
+    for column in COLUMNS:
+        op.execute(f"DROP INDEX IF EXISTS centers_{column}_trgm")
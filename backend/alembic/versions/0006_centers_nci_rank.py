@@ -0,0 +1,25 @@
+"""Partial index for list_centers filtered by NCI designation
+
+Revision ID: 0006
+Revises: 0005
+Create Date: 2026-10-15
+"""
+from alembic import op
+
+
+revision = "0006"
+down_revision = "0005"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.execute(
+        "CREATE INDEX IF NOT EXISTS centers_nci_rank "
+        "ON cancer_centers (nci_designation, us_news_rank NULLS LAST, name, id) "
+        "WHERE nci_designation IS NOT NULL"
+    )
+
+
+def downgrade() -> None:
+    op.execute("DROP INDEX IF EXISTS centers_nci_rank")
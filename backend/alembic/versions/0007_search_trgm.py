@@ -0,0 +1,42 @@
+"""Trigram and full-text indexes for treatment, trial and center search
+
+Revision ID: 0007
+Revises: 0006
+Create Date: 2026-10-15
+"""
+from alembic import op
+
+
+revision = "0007"
+down_revision = "0006"
+branch_labels = None
+depends_on = None
+
+# (index prefix, table, columns) searched with ILIKE '%term%'
+TRIGRAM_COLUMNS = [
+    ("treatments", "treatments", ["generic_name", "drug_class", "mechanism_of_action", "manufacturer"]),
+    ("trials", "clinical_trials", ["title", "brief_summary", "nct_id", "sponsor"]),
+    ("centers", "cancer_centers", ["state"]),
+]
+
+
+def upgrade() -> None:
+    op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    for prefix, table, columns in TRIGRAM_COLUMNS:
+        for column in columns:
+            op.execute(
+                f"CREATE INDEX IF NOT EXISTS {prefix}_{column}_trgm "
+                f"ON {table} USING GIN ({column} gin_trgm_ops)"
+            )
+    op.execute(
+        "CREATE INDEX IF NOT EXISTS trials_fts ON clinical_trials USING GIN "
+        "(to_tsvector('english'::regconfig, "
+        "coalesce(title, '') || ' ' || coalesce(brief_summary, '')))"
+    )
+
+
+def downgrade() -> None:
+    op.execute("DROP INDEX IF EXISTS trials_fts")
+    for prefix, _table, columns in TRIGRAM_COLUMNS:
+        for column in columns:
+            op.execute(f"DROP INDEX IF EXISTS {prefix}_{column}_trgm")
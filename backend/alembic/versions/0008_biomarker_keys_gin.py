@@ -0,0 +1,52 @@
+"""GIN indexes for case-insensitive biomarker filtering
+
+Revision ID: 0008
+Revises: 0007
+Create Date: 2026-10-15
+"""
+from alembic import op
+
+
+revision = "0008"
+down_revision = "0007"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.execute(
+        "CREATE OR REPLACE FUNCTION upper_jsonb_keys(jsonb) RETURNS text[] "
+        "AS $$ SELECT coalesce(array_agg(upper(k)), '{}') FROM ("
+        "SELECT jsonb_object_keys($1) AS k WHERE jsonb_typeof($1) = 'object' "
+        "UNION ALL "
+        "SELECT jsonb_array_elements_text($1) WHERE jsonb_typeof($1) = 'array'"
+        ") AS keys $$ "
+        "LANGUAGE sql IMMUTABLE PARALLEL SAFE"
+    )
+    op.execute(
+        "CREATE OR REPLACE FUNCTION trial_biomarker_keys(jsonb, jsonb) RETURNS text[] "
+        "AS $$ SELECT upper_jsonb_keys($1) "
+        "|| upper_jsonb_keys($2 -> 'biomarkers' -> 'required_positive') "
+        "|| upper_jsonb_keys($2 -> 'biomarkers' -> 'required_negative') $$ "
+        "LANGUAGE sql IMMUTABLE PARALLEL SAFE"
+    )
+    op.execute(
+        "CREATE INDEX IF NOT EXISTS treatments_biomarker_keys_gin "
+        "ON treatments USING GIN (upper_jsonb_keys(biomarker_requirements))"
+    )
+    op.execute(
+        "CREATE INDEX IF NOT EXISTS trials_biomarker_keys_gin ON clinical_trials "
+        "USING GIN (trial_biomarker_keys(biomarker_requirements, structured_eligibility))"
+    )
+    op.execute(
+        "CREATE INDEX IF NOT EXISTS trials_eligibility_criteria_trgm "
+        "ON clinical_trials USING GIN (eligibility_criteria gin_trgm_ops)"
+    )
+
+
+def downgrade() -> None:
+    op.execute("DROP INDEX IF EXISTS trials_eligibility_criteria_trgm")
+    op.execute("DROP INDEX IF EXISTS trials_biomarker_keys_gin")
+    op.execute("DROP INDEX IF EXISTS treatments_biomarker_keys_gin")
+    op.execute("DROP FUNCTION IF EXISTS trial_biomarker_keys(jsonb, jsonb)")
+    op.execute("DROP FUNCTION IF EXISTS upper_jsonb_keys(jsonb)")
@@ -0,0 +1,31 @@
+"""Partial indexes matching the /trials list ordering
+
+Revision ID: 0009
+Revises: 0008
+Create Date: 2026-10-15
+"""
+from alembic import op
+
+
+revision = "0009"
+down_revision = "0008"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.execute(
+        "CREATE INDEX IF NOT EXISTS trials_default_order ON clinical_trials "
+        "(relevance_score DESC NULLS LAST, nct_id DESC) "
+        "WHERE nsclc_relevance IN ('nsclc_specific', 'nsclc_primary')"
+    )
+    op.execute(
+        "CREATE INDEX IF NOT EXISTS trials_structured_order ON clinical_trials "
+        "(relevance_score DESC NULLS LAST, nct_id DESC) "
+        "WHERE structured_eligibility IS NOT NULL"
+    )
+
+
+def downgrade() -> None:
+    op.execute("DROP INDEX IF EXISTS trials_structured_order")
+    op.execute("DROP INDEX IF EXISTS trials_default_order")
@@ -0,0 +1,29 @@
+"""Eligibility extractions cached by criteria text hash
+
+Revision ID: 0010
+Revises: 0009
+Create Date: 2026-10-15
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+revision = "0010"
+down_revision = "0009"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "eligibility_extractions",
+        sa.Column("text_hash", sa.String(64), primary_key=True),
+        sa.Column("version", sa.String(20), primary_key=True),
+        sa.Column("result", postgresql.JSONB(), nullable=False),
+        sa.Column("created_at", sa.DateTime(), server_default=sa.func.now()),
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("eligibility_extractions")
@@ -0,0 +1,24 @@
+"""Derived location_states column on clinical_trials
+
+Revision ID: 0011
+Revises: 0010
+Create Date: 2026-10-15
+"""
+from alembic import op
+
+
+revision = "0011"
+down_revision = "0010"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.execute(
+        "ALTER TABLE clinical_trials ADD COLUMN IF NOT EXISTS location_states jsonb "
+        "GENERATED ALWAYS AS (jsonb_path_query_array(locations, '$[*].state')) STORED"
+    )
+
+
+def downgrade() -> None:
+    op.execute("ALTER TABLE clinical_trials DROP COLUMN IF EXISTS location_states")
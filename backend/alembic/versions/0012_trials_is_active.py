@@ -0,0 +1,29 @@
+"""Derived is_active column on clinical_trials with a partial index
+
+Revision ID: 0012
+Revises: 0011
+Create Date: 2026-10-15
+"""
+from alembic import op
+
+
+revision = "0012"
+down_revision = "0011"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.execute(
+        "ALTER TABLE clinical_trials ADD COLUMN IF NOT EXISTS is_active boolean "
+        "GENERATED ALWAYS AS (upper(status) IN "
+        "('RECRUITING', 'ACTIVE_NOT_RECRUITING', 'ENROLLING_BY_INVITATION')) STORED"
+    )
+    op.execute(
+        "CREATE INDEX IF NOT EXISTS trials_active ON clinical_trials (id) WHERE is_active"
+    )
+
+
+def downgrade() -> None:
+    op.execute("DROP INDEX IF EXISTS trials_active")
+    op.execute("ALTER TABLE clinical_trials DROP COLUMN IF EXISTS is_active")
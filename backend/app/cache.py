@@ -0,0 +1,209 @@
+"""
+Redis-backed response cache.
+
+Caching is optional: when REDIS_URL is not set every lookup is a miss and
+writes are dropped, so the API behaves exactly as it does uncached. Redis
+errors are logged and treated the same way - the cache must never take an
+endpoint down with it.
+"""
+
+import os
+import asyncio
+import hashlib
+import logging
+from decimal import Decimal
+from functools import wraps
+from typing import Any, Awaitable, Callable, Optional
+
+import orjson
+from fastapi import Request, Response
+from pydantic import BaseModel
+from prometheus_client import Counter
+from redis.asyncio import Redis
+from redis.exceptions import RedisError
+
+logger = logging.getLogger(__name__)
+
+REDIS_URL = os.getenv("REDIS_URL")
+
+redis_client: Optional[Redis] = Redis.from_url(REDIS_URL) if REDIS_URL else None
+
+# /search results span every entity, so each create endpoint drops them
+SEARCH_CACHE_PREFIX = "search"
+
+# Competitor analyses are scored against every recruiting trial, so creating
+# a trial drops them as well
+COMPETITOR_CACHE_PREFIX = "competitor"
+
+CACHE_HITS = Counter(
+    "weirwood_cache_hits_total",
+    "Response cache hits",
+    ["namespace"],
+)
+CACHE_MISSES = Counter(
+    "weirwood_cache_misses_total",
+    "Response cache misses",
+    ["namespace"],
+)
+
+
+def _namespace(key: str) -> str:
+    """Metric label for a cache key, e.g. "centers" for "centers:locations"."""
+    return key.split(":", 1)[0]
+
+
+def _default(obj: Any) -> Any:
+    if isinstance(obj, Decimal):
+        return float(obj)
+    if isinstance(obj, BaseModel):
+        return obj.model_dump(mode="json")
+    raise TypeError(f"Type is not JSON serializable: {type(obj).__name__}")
+
+
+def dumps(payload: Any) -> bytes:
+    """Serialize a JSON payload, converting Decimal columns to floats."""
+    return orjson.dumps(payload, default=_default)
+
+
+def hash_key(prefix: str, payload: Any) -> str:
+    """Cache key for a JSON-serializable payload, stable across dict ordering."""
+    digest = hashlib.sha256(
+        orjson.dumps(payload, default=_default, option=orjson.OPT_SORT_KEYS)
+    ).hexdigest()
+    return f"{prefix}:{digest}"
+
+
+def request_key(prefix: str, request: Request) -> str:
+    """Cache key for a GET request, from its query parameters in any order."""
+    return hash_key(prefix, sorted(request.query_params.multi_items()))
+
+
+async def get_cached(key: str) -> Optional[bytes]:
+    """Return the cached bytes for key, or None on a miss."""
+    value = None
+    if redis_client is not None:
+        try:
+            value = await redis_client.get(key)
+        except RedisError as e:
+            logger.warning(f"Cache read failed for {key}: {e}")
+
+    if value is None:
+        CACHE_MISSES.labels(_namespace(key)).inc()
+    else:
+        CACHE_HITS.labels(_namespace(key)).inc()
+    return value
+
+
+async def set_cached(key: str, value: bytes, ttl: int) -> None:
+    """Store value under key for ttl seconds."""
+    if redis_client is None:
+        return
+    try:
+        await redis_client.setex(key, ttl, value)
+    except RedisError as e:
+        logger.warning(f"Cache write failed for {key}: {e}")
+
+
+async def invalidate(*keys: str) -> None:
+    """Drop the given keys, e.g. after a write that changes their payload."""
+    if redis_client is None or not keys:
+        return
+    try:
+        await redis_client.delete(*keys)
+    except RedisError as e:
+        logger.warning(f"Cache invalidation failed for {keys}: {e}")
+
+
+async def invalidate_prefix(*prefixes: str) -> None:
+    """Drop every key under the given prefixes, e.g. all cached pages of a listing."""
+    if redis_client is None:
+        return
+    for prefix in prefixes:
+        try:
+            keys = [key async for key in redis_client.scan_iter(match=f"{prefix}:*", count=500)]
+            if keys:
+                await redis_client.unlink(*keys)
+        except RedisError as e:
+            logger.warning(f"Cache invalidation failed for {prefix}:*: {e}")
+
+
+async def cached_json_response(
+    key: str,
+    ttl: int,
+    compute: Callable[[], Awaitable[Any]],
+    max_age: Optional[int] = None,
+) -> Response:
+    """
+    Serve a JSON payload from the cache, computing and storing it on a miss.
+
+    The cached bytes are returned as-is, so a hit skips both the database
+    and response serialization. With max_age, browsers may also reuse the
+    response for that many seconds.
+    """
+    body = await get_cached(key)
+    if body is None:
+        body = dumps(await compute())
+        await set_cached(key, body, ttl)
+    headers = {"Cache-Control": f"max-age={max_age}"} if max_age else None
+    return Response(content=body, media_type="application/json", headers=headers)
+
+
+# Calls currently computing a memoized value, by cache key
+_inflight: dict[str, asyncio.Task] = {}
+
+
+def redis_memoize(
+    prefix: str,
+    ttl: int,
+    version: str = "",
+    cache_if: Optional[Callable[[Any], bool]] = None,
+    key_args: Optional[Callable[..., Any]] = None,
+):
+    """
+    Cache an async function's JSON-serializable result in Redis.
+
+    The key is a hash of the call arguments, which must be JSON-serializable
+    too; key_args, called with the same arguments, can pick out the ones that
+    determine the result. Bumping version orphans every existing entry, so
+    stale results never need to be deleted explicitly. Results rejected by
+    cache_if (e.g. error payloads) are returned but not stored.
+
+    Concurrent calls with the same key in one process share a single
+    underlying call (single flight), so a burst of identical requests costs
+    one upstream call rather than one each. The wrapper's cache_key(*args,
+    **kwargs) gives the key a call would use, for callers that read or fill
+    the cache in bulk.
+    """
+    key_prefix = f"{prefix}:{version}" if version else prefix
+
+    def decorator(func):
+        async def compute(key: str, args: tuple, kwargs: dict) -> Any:
+            result = await func(*args, **kwargs)
+            if cache_if is None or cache_if(result):
+                await set_cached(key, dumps(result), ttl)
+            return result
+
+        def cache_key(*args, **kwargs) -> str:
+            payload = key_args(*args, **kwargs) if key_args else [args, kwargs]
+            return hash_key(key_prefix, payload)
+
+        @wraps(func)
+        async def wrapper(*args, **kwargs):
+            key = cache_key(*args, **kwargs)
+            cached = await get_cached(key)
+            if cached is not None:
+                return orjson.loads(cached)
+
+            task = _inflight.get(key)
+            if task is None:
+                task = asyncio.create_task(compute(key, args, kwargs))
+                _inflight[key] = task
+                task.add_done_callback(lambda _: _inflight.pop(key, None))
+
+            # Shielded so one caller disconnecting doesn't cancel the others' call
+            return await asyncio.shield(task)
+
+        wrapper.cache_key = cache_key
+        return wrapper
+
+    return decorator
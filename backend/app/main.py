@@ -1,36 +1,57 @@
 import os
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.responses import ORJSONResponse
+from prometheus_fastapi_instrumentator import Instrumentator
 from app.database import engine, Base
+from app.settings import settings
 from app.routers import treatments, trials, centers, search, match, competitor
+from app.services import claude_service
+from app.services.suggestion_index import suggestion_index
+
+# Schema is managed by Alembic (`alembic upgrade head`); creating tables on
+# import is only a convenience for local development.
+if os.getenv("AUTO_CREATE_TABLES") == "1":
+    Base.metadata.create_all(bind=engine)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    await suggestion_index.start()
+    yield
+    await suggestion_index.close()
+    await claude_service.batch_dispatcher.close()
+    await claude_service.async_client.close()
 
-# Create database tables
-Base.metadata.create_all(bind=engine)
 
 app = FastAPI(
     title="Weirwood API",
     description="NSCLC Treatment & Trial Discovery Platform",
     version="1.0.0",
+    default_response_class=ORJSONResponse,
+    lifespan=lifespan,
 )
 
 # CORS middleware for frontend
-# Allow origins from environment variable (comma-separated) or defaults
-cors_origins_env = os.getenv("CORS_ORIGINS", "")
-cors_origins = [
-    "http://localhost:3000",
-    "http://127.0.0.1:3000",
-]
-if cors_origins_env:
-    cors_origins.extend([origin.strip() for origin in cors_origins_env.split(",")])
-
+# Allow the local frontend plus any origins listed in CORS_ORIGINS
 app.add_middleware(
     CORSMiddleware,
-    allow_origins=cors_origins,
+    allow_origins=settings.cors_origin_list,
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
 )
 
+# Compress larger responses (location lists, match and competitor results)
+app.add_middleware(GZipMiddleware, minimum_size=1024, compresslevel=5)
+
+# Per-route request counts and latency histograms, plus the cache hit/miss
+# counters from app.cache, at /metrics
+Instrumentator().instrument(app).expose(app, endpoint="/metrics", include_in_schema=False)
+
 # Include routers
 app.include_router(treatments.router)
 app.include_router(trials.router)
@@ -1,9 +1,20 @@
-from sqlalchemy import Column, Integer, String, Text, Date, DateTime, DECIMAL, ARRAY
+from sqlalchemy import Column, Integer, String, Text, Boolean, Date, DateTime, DECIMAL, ARRAY, Index, Computed, DDL, event
 from sqlalchemy.dialects.postgresql import JSONB
-from sqlalchemy.sql import func
+from sqlalchemy.orm import deferred
+from sqlalchemy.sql import func, literal_column
+from sqlalchemy.types import UserDefinedType
 from app.database import Base
 
 
+class Geography(UserDefinedType):
+    """PostGIS geography(Point, 4326); only used in SQL expressions, never loaded."""
+
+    cache_ok = True
+
+    def get_col_spec(self, **kw):
+        return "geography(Point,4326)"
+
+
 class Treatment(Base):
     __tablename__ = "treatments"
 
@@ -21,6 +32,40 @@ class Treatment(Base):
     source_urls = Column(JSONB)
     last_updated = Column(DateTime, server_default=func.now(), onupdate=func.now())
 
+    __table_args__ = (
+        # Trigram indexes let the ILIKE '%term%' search filters use an index
+        Index(
+            "treatments_generic_name_trgm",
+            generic_name,
+            postgresql_using="gin",
+            postgresql_ops={"generic_name": "gin_trgm_ops"},
+        ),
+        Index(
+            "treatments_drug_class_trgm",
+            drug_class,
+            postgresql_using="gin",
+            postgresql_ops={"drug_class": "gin_trgm_ops"},
+        ),
+        Index(
+            "treatments_mechanism_of_action_trgm",
+            mechanism_of_action,
+            postgresql_using="gin",
+            postgresql_ops={"mechanism_of_action": "gin_trgm_ops"},
+        ),
+        Index(
+            "treatments_manufacturer_trgm",
+            manufacturer,
+            postgresql_using="gin",
+            postgresql_ops={"manufacturer": "gin_trgm_ops"},
+        ),
+        # Upper-cased biomarker names, for the biomarker filter
+        Index(
+            "treatments_biomarker_keys_gin",
+            func.upper_jsonb_keys(biomarker_requirements),
+            postgresql_using="gin",
+        ),
+    )
+
 
 class ClinicalTrial(Base):
     __tablename__ = "clinical_trials"
@@ -38,6 +83,22 @@ class ClinicalTrial(Base):
     biomarker_requirements = Column(JSONB)
     primary_completion_date = Column(Date)
     locations = Column(JSONB)
+    # Every site's state, derived from locations by Postgres, so competitor
+    # scoring reads a short array instead of the full site list
+    location_states = deferred(Column(
+        JSONB,
+        Computed("jsonb_path_query_array(locations, '$[*].state')", persisted=True),
+    ))
+    # Whether the trial is open to patients, derived from status by Postgres
+    # so the matching pools filter on a plain column with a partial index
+    # instead of upper(status) IN (...)
+    is_active = deferred(Column(
+        Boolean,
+        Computed(
+            "upper(status) IN ('RECRUITING', 'ACTIVE_NOT_RECRUITING', 'ENROLLING_BY_INVITATION')",
+            persisted=True,
+        ),
+    ))
     contact_info = Column(JSONB)
     study_url = Column(String(500))
     last_updated = Column(DateTime, server_default=func.now(), onupdate=func.now())
@@ -51,6 +112,72 @@ class ClinicalTrial(Base):
     eligibility_extraction_version = Column(String(20))
     eligibility_extracted_at = Column(DateTime)
 
+    __table_args__ = (
+        # Trigram indexes let the ILIKE '%term%' search filters use an index
+        Index(
+            "trials_title_trgm",
+            title,
+            postgresql_using="gin",
+            postgresql_ops={"title": "gin_trgm_ops"},
+        ),
+        Index(
+            "trials_brief_summary_trgm",
+            brief_summary,
+            postgresql_using="gin",
+            postgresql_ops={"brief_summary": "gin_trgm_ops"},
+        ),
+        Index(
+            "trials_nct_id_trgm",
+            nct_id,
+            postgresql_using="gin",
+            postgresql_ops={"nct_id": "gin_trgm_ops"},
+        ),
+        Index(
+            "trials_sponsor_trgm",
+            sponsor,
+            postgresql_using="gin",
+            postgresql_ops={"sponsor": "gin_trgm_ops"},
+        ),
+        Index(
+            "trials_eligibility_criteria_trgm",
+            eligibility_criteria,
+            postgresql_using="gin",
+            postgresql_ops={"eligibility_criteria": "gin_trgm_ops"},
+        ),
+        # Upper-cased biomarker names from biomarker_requirements and the
+        # structured required_positive/required_negative lists
+        Index(
+            "trials_biomarker_keys_gin",
+            func.trial_biomarker_keys(biomarker_requirements, structured_eligibility),
+            postgresql_using="gin",
+        ),
+        # list_trials ordering within its default relevance filter, and within
+        # trials that have structured eligibility (also the v2 matching pool)
+        Index(
+            "trials_default_order",
+            relevance_score.desc().nulls_last(),
+            nct_id.desc(),
+            postgresql_where=nsclc_relevance.in_(["nsclc_specific", "nsclc_primary"]),
+        ),
+        Index(
+            "trials_structured_order",
+            relevance_score.desc().nulls_last(),
+            nct_id.desc(),
+            postgresql_where=structured_eligibility.isnot(None),
+        ),
+        # Open trials, the pool every matching and competitor query starts from
+        Index("trials_active", id, postgresql_where=literal_column("is_active")),
+        # Full-text index over title + summary, for ranked text search
+        Index(
+            "trials_fts",
+            func.to_tsvector(
+                literal_column("'english'::regconfig"),
+                func.coalesce(title, "") + " " + func.coalesce(brief_summary, ""),
+            ),
+            postgresql_using="gin",
+        ),
+    )
+
 
 class CancerCenter(Base):
     __tablename__ = "cancer_centers"
@@ -72,3 +199,116 @@ class CancerCenter(Base):
     active_nsclc_trials = Column(Integer)
     source_urls = Column(JSONB)
     last_updated = Column(DateTime, server_default=func.now(), onupdate=func.now())
+
+    # Derived from lat/lng by Postgres (requires PostGIS), for radius search
+    geom = deferred(Column(
+        Geography,
+        Computed(
+            "ST_SetSRID(ST_MakePoint(lng::float, lat::float), 4326)::geography",
+            persisted=True,
+        ),
+    ))
+
+    __table_args__ = (
+        # Matches the list_centers ordering so keyset pages are index seeks
+        Index("centers_rank_name_id", us_news_rank.asc().nulls_last(), name, id),
+        # Same ordering within one designation, for the nci_designation filter
+        Index(
+            "centers_nci_rank",
+            nci_designation,
+            us_news_rank.asc().nulls_last(),
+            name,
+            id,
+            postgresql_where=nci_designation.isnot(None),
+        ),
+        Index("centers_geom_gix", "geom", postgresql_using="gist"),
+        Index(
+            "centers_specialties_gin",
+            func.lower_text_array(specialties),
+            postgresql_using="gin",
+        ),
+        # Trigram indexes let the ILIKE '%term%' search filters use an index
+        Index(
+            "centers_name_trgm",
+            name,
+            postgresql_using="gin",
+            postgresql_ops={"name": "gin_trgm_ops"},
+        ),
+        Index(
+            "centers_city_trgm",
+            city,
+            postgresql_using="gin",
+            postgresql_ops={"city": "gin_trgm_ops"},
+        ),
+        Index(
+            "centers_state_trgm",
+            state,
+            postgresql_using="gin",
+            postgresql_ops={"state": "gin_trgm_ops"},
+        ),
+        Index(
+            "centers_academic_affiliation_trgm",
+            academic_affiliation,
+            postgresql_using="gin",
+            postgresql_ops={"academic_affiliation": "gin_trgm_ops"},
+        ),
+    )
+
+
+class EligibilityExtraction(Base):
+    """Claude eligibility extractions by criteria text, reused across re-ingests."""
+
+    __tablename__ = "eligibility_extractions"
+
+    # SHA-256 hex digest of the eligibility criteria text
+    text_hash = Column(String(64), primary_key=True)
+    # EXTRACTION_VERSION the result was produced by; a new version misses
+    version = Column(String(20), primary_key=True)
+    result = Column(JSONB, nullable=False)
+    created_at = Column(DateTime, server_default=func.now())
+
+
+# Prerequisites for the indexes when tables are created without Alembic
+# (revisions 0004, 0005, 0007 and 0008 do the same).
+for _table in (Treatment.__table__, ClinicalTrial.__table__, CancerCenter.__table__):
+    event.listen(_table, "before_create", DDL("CREATE EXTENSION IF NOT EXISTS pg_trgm"))
+# The geography type behind CancerCenter.geom (revision 0003)
+event.listen(CancerCenter.__table__, "before_create", DDL("CREATE EXTENSION IF NOT EXISTS postgis"))
+# Immutable lower() over a text[], so specialties can be GIN-indexed and
+# matched case-insensitively
+event.listen(
+    CancerCenter.__table__,
+    "before_create",
+    DDL(
+        "CREATE OR REPLACE FUNCTION lower_text_array(text[]) RETURNS text[] "
+        "AS $$ SELECT array_agg(lower(s)) FROM unnest($1) AS s $$ "
+        "LANGUAGE sql IMMUTABLE PARALLEL SAFE"
+    ),
+)
+# Upper-cased keys of a JSONB object (or string elements of an array), so
+# biomarker names can be GIN-indexed and matched case-insensitively
+for _table in (Treatment.__table__, ClinicalTrial.__table__):
+    event.listen(
+        _table,
+        "before_create",
+        DDL(
+            "CREATE OR REPLACE FUNCTION upper_jsonb_keys(jsonb) RETURNS text[] "
+            "AS $$ SELECT coalesce(array_agg(upper(k)), '{}') FROM ("
+            "SELECT jsonb_object_keys($1) AS k WHERE jsonb_typeof($1) = 'object' "
+            "UNION ALL "
+            "SELECT jsonb_array_elements_text($1) WHERE jsonb_typeof($1) = 'array'"
+            ") AS keys $$ "
+            "LANGUAGE sql IMMUTABLE PARALLEL SAFE"
+        ),
+    )
+event.listen(
+    ClinicalTrial.__table__,
+    "before_create",
+    DDL(
+        "CREATE OR REPLACE FUNCTION trial_biomarker_keys(jsonb, jsonb) RETURNS text[] "
+        "AS $$ SELECT upper_jsonb_keys($1) "
+        "|| upper_jsonb_keys($2 -> 'biomarkers' -> 'required_positive') "
+        "|| upper_jsonb_keys($2 -> 'biomarkers' -> 'required_negative') $$ "
+        "LANGUAGE sql IMMUTABLE PARALLEL SAFE"
+    ),
+)
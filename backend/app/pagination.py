@@ -0,0 +1,25 @@
+import base64
+import binascii
+
+import orjson
+from fastapi import HTTPException
+
+
+def encode_cursor(*values) -> str:
+    """Opaque next_cursor token for the sort key of the last row on a page."""
+    return base64.urlsafe_b64encode(orjson.dumps(values)).decode()
+
+
+def decode_cursor(cursor: str, length: int) -> list:
+    """Sort key from a next_cursor token; 400 if it was not produced by encode_cursor."""
+    try:
+        values = orjson.loads(base64.urlsafe_b64decode(cursor))
+    except (ValueError, TypeError, binascii.Error):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    if not isinstance(values, list) or len(values) != length:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    return values
+
+
+def total_pages(total: int, page_size: int) -> int:
+    return (total + page_size - 1) // page_size
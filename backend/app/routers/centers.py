@@ -1,92 +1,240 @@
-from fastapi import APIRouter, Depends, HTTPException, Query
-from sqlalchemy.orm import Session
-from sqlalchemy import or_
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
+from fastapi.responses import StreamingResponse
+from pydantic import TypeAdapter
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select, func, or_, and_, tuple_, text, cast, Text
+from sqlalchemy.dialects.postgresql import ARRAY as PG_ARRAY
+from sqlalchemy.engine import Row
 from typing import Optional
-from app.database import get_db
-from app.models import CancerCenter
-from app.schemas import CancerCenterResponse, CancerCenterCreate, PaginatedResponse
+from app.cache import (
+    SEARCH_CACHE_PREFIX,
+    cached_json_response,
+    dumps,
+    get_cached,
+    invalidate,
+    invalidate_prefix,
+    set_cached,
+)
+from app.database import AsyncSessionLocal, get_db
+from app.models import CancerCenter, Geography
+from app.pagination import decode_cursor, encode_cursor, total_pages
+from app.schemas import (
+    CancerCenterResponse,
+    CancerCenterCreate,
+    CancerCenterMetaResponse,
+    NearbyCancerCenterResponse,
+    PaginatedResponse,
+)
 
 router = APIRouter(prefix="/centers", tags=["centers"])
 
+# Center metadata only changes when centers are seeded or created
+CENTERS_CACHE_TTL = 600
+STATES_CACHE_KEY = "centers:states"
+DESIGNATIONS_CACHE_KEY = "centers:designations"
+LOCATIONS_CACHE_KEY = "centers:locations"
+META_CACHE_KEY = "centers:meta"
+
+_centers_adapter = TypeAdapter(list[CancerCenterResponse])
+_nearby_centers_adapter = TypeAdapter(list[NearbyCancerCenterResponse])
+
+# Read endpoints select exactly the response columns and validate the rows
+# directly, skipping ORM instance hydration and the identity map
+CENTER_RESPONSE_COLUMNS = tuple(
+    getattr(CancerCenter, field) for field in CancerCenterResponse.model_fields
+)
+
+# All filter metadata for the centers page in one round trip
+CENTERS_META_SQL = text("""
+    SELECT
+        (SELECT coalesce(array_agg(DISTINCT state ORDER BY state), '{}')
+           FROM cancer_centers WHERE state <> '') AS states,
+        (SELECT coalesce(array_agg(DISTINCT nci_designation), '{}')
+           FROM cancer_centers WHERE nci_designation <> '') AS designations,
+        (SELECT coalesce(jsonb_object_agg(specialty, n), '{}')
+           FROM (
+               SELECT unnest(specialties) AS specialty, count(*) AS n
+               FROM cancer_centers
+               GROUP BY 1
+           ) s) AS specialties
+""")
+
 
 @router.get("/states/list", response_model=list[str])
-def list_states(db: Session = Depends(get_db)):
-    states = (
-        db.query(CancerCenter.state)
-        .filter(CancerCenter.state.isnot(None))
-        .distinct()
-        .all()
-    )
-    return sorted([s[0] for s in states if s[0]])
+async def list_states(db: AsyncSession = Depends(get_db)):
+    async def compute():
+        result = await db.execute(
+            select(CancerCenter.state)
+            .where(CancerCenter.state.isnot(None))
+            .distinct()
+        )
+        return sorted([s for s in result.scalars().all() if s])
+
+    return await cached_json_response(STATES_CACHE_KEY, CENTERS_CACHE_TTL, compute)
 
 
 @router.get("/designations/list", response_model=list[str])
-def list_designations(db: Session = Depends(get_db)):
-    designations = (
-        db.query(CancerCenter.nci_designation)
-        .filter(CancerCenter.nci_designation.isnot(None))
-        .distinct()
-        .all()
+async def list_designations(db: AsyncSession = Depends(get_db)):
+    async def compute():
+        result = await db.execute(
+            select(CancerCenter.nci_designation)
+            .where(CancerCenter.nci_designation.isnot(None))
+            .distinct()
+        )
+        return [d for d in result.scalars().all() if d]
+
+    return await cached_json_response(DESIGNATIONS_CACHE_KEY, CENTERS_CACHE_TTL, compute)
+
+
+@router.get("/meta", response_model=CancerCenterMetaResponse)
+async def get_centers_meta(db: AsyncSession = Depends(get_db)):
+    """States, NCI designations and specialty counts for the filter UI"""
+    async def compute():
+        row = (await db.execute(CENTERS_META_SQL)).one()
+        return {
+            "states": row.states,
+            "designations": row.designations,
+            "specialties": row.specialties,
+        }
+
+    return await cached_json_response(META_CACHE_KEY, CENTERS_CACHE_TTL, compute)
+
+
+LOCATIONS_QUERY = (
+    select(
+        CancerCenter.id,
+        CancerCenter.name,
+        CancerCenter.city,
+        CancerCenter.state,
+        CancerCenter.lat,
+        CancerCenter.lng,
+        CancerCenter.nci_designation,
     )
-    return [d[0] for d in designations if d[0]]
+    .where(CancerCenter.lat.isnot(None), CancerCenter.lng.isnot(None))
+    .execution_options(yield_per=500)
+)
+
+
+async def _stream_center_locations():
+    """
+    Yield the locations JSON array in chunks as rows arrive from a server-side
+    cursor, then cache the complete body.
+    """
+    body = [b"["]
+    separator = b""
+
+    # Own session: the response is still streaming after the handler returns
+    async with AsyncSessionLocal() as db:
+        result = await db.stream(LOCATIONS_QUERY)
+        async for rows in result.mappings().partitions():
+            # One orjson call per partition; strip its enclosing brackets
+            chunk = separator + dumps([dict(row) for row in rows])[1:-1]
+            separator = b","
+            body.append(chunk)
+            yield chunk
+
+    body.append(b"]")
+    yield b"]"
+    await set_cached(LOCATIONS_CACHE_KEY, b"".join(body), CENTERS_CACHE_TTL)
 
 
 @router.get("/locations", response_model=list[dict])
-def get_center_locations(db: Session = Depends(get_db)):
+async def get_center_locations():
     """Get all center locations for map display"""
-    centers = (
-        db.query(
-            CancerCenter.id,
-            CancerCenter.name,
-            CancerCenter.city,
-            CancerCenter.state,
-            CancerCenter.lat,
-            CancerCenter.lng,
-            CancerCenter.nci_designation,
-        )
-        .filter(CancerCenter.lat.isnot(None), CancerCenter.lng.isnot(None))
-        .all()
+    cached = await get_cached(LOCATIONS_CACHE_KEY)
+    if cached is not None:
+        return Response(content=cached, media_type="application/json")
+
+    return StreamingResponse(_stream_center_locations(), media_type="application/json")
+
+
+@router.get("/near", response_model=list[NearbyCancerCenterResponse])
+async def list_centers_near(
+    lat: float = Query(..., ge=-90, le=90),
+    lng: float = Query(..., ge=-180, le=180),
+    radius_m: float = Query(100_000, gt=0, le=5_000_000),
+    limit: int = Query(20, ge=1, le=100),
+    db: AsyncSession = Depends(get_db),
+):
+    """Centers within radius_m meters of a point, nearest first"""
+    point = cast(func.ST_SetSRID(func.ST_MakePoint(lng, lat), 4326), Geography)
+    distance = func.ST_Distance(CancerCenter.geom, point).label("distance_m")
+
+    # ST_DWithin can use the GIST index on geom; ST_Distance <= r cannot
+    result = await db.execute(
+        select(*CENTER_RESPONSE_COLUMNS, distance)
+        .where(func.ST_DWithin(CancerCenter.geom, point, radius_m))
+        .order_by(distance)
+        .limit(limit)
     )
 
-    return [
-        {
-            "id": c.id,
-            "name": c.name,
-            "city": c.city,
-            "state": c.state,
-            "lat": float(c.lat),
-            "lng": float(c.lng),
-            "nci_designation": c.nci_designation,
-        }
-        for c in centers
-    ]
+    return _nearby_centers_adapter.validate_python(result.all(), from_attributes=True)
+
+
+def _encode_cursor(center: Row) -> str:
+    return encode_cursor(center.us_news_rank, center.name, center.id)
+
+
+def _decode_cursor(cursor: str) -> tuple[Optional[int], str, int]:
+    rank, name, center_id = decode_cursor(cursor, 3)
+    if (
+        not isinstance(name, str)
+        or not isinstance(center_id, int) or isinstance(center_id, bool)
+        or rank is not None and (not isinstance(rank, int) or isinstance(rank, bool))
+    ):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    return rank, name, center_id
+
+
+def _after_cursor(rank: Optional[int], name: str, center_id: int):
+    """Rows that sort after (rank, name, id) in `us_news_rank NULLS LAST, name, id` order."""
+    after_within_rank = tuple_(CancerCenter.name, CancerCenter.id) > tuple_(name, center_id)
+    if rank is None:
+        return and_(CancerCenter.us_news_rank.is_(None), after_within_rank)
+    return or_(
+        CancerCenter.us_news_rank > rank,
+        and_(CancerCenter.us_news_rank == rank, after_within_rank),
+        CancerCenter.us_news_rank.is_(None),
+    )
+
+
+async def _estimated_center_count(db: AsyncSession) -> Optional[int]:
+    """Planner row estimate for the whole table; avoids a COUNT(*) scan."""
+    estimate = await db.scalar(
+        text("SELECT reltuples::bigint FROM pg_class WHERE oid = 'cancer_centers'::regclass")
+    )
+    # reltuples is -1 until the table has been analyzed
+    return estimate if estimate is not None and estimate >= 0 else None
 
 
 @router.get("", response_model=PaginatedResponse)
-def list_centers(
+async def list_centers(
     page: int = Query(1, ge=1),
     page_size: int = Query(20, ge=1, le=100),
+    cursor: Optional[str] = Query(None, description="next_cursor from a previous page"),
     state: Optional[str] = None,
     nci_designation: Optional[str] = None,
     specialty: Optional[str] = None,
     search: Optional[str] = None,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
 ):
-    query = db.query(CancerCenter)
+    query = select(*CENTER_RESPONSE_COLUMNS)
 
     if state:
-        query = query.filter(CancerCenter.state.ilike(f"%{state}%"))
+        query = query.where(CancerCenter.state.ilike(f"%{state}%"))
 
     if nci_designation:
-        query = query.filter(CancerCenter.nci_designation == nci_designation)
+        query = query.where(CancerCenter.nci_designation == nci_designation)
 
     if specialty:
-        query = query.filter(
-            CancerCenter.specialties.cast(str).ilike(f"%{specialty}%")
+        # Case-insensitive element match, served by centers_specialties_gin
+        query = query.where(
+            func.lower_text_array(CancerCenter.specialties, type_=PG_ARRAY(Text))
+            .contains([specialty.lower()])
         )
 
     if search:
-        query = query.filter(
+        query = query.where(
             or_(
                 CancerCenter.name.ilike(f"%{search}%"),
                 CancerCenter.city.ilike(f"%{search}%"),
@@ -94,37 +242,74 @@ def list_centers(
             )
         )
 
-    total = query.count()
-    total_pages = (total + page_size - 1) // page_size
+    ordered = query.order_by(
+        CancerCenter.us_news_rank.nulls_last(), CancerCenter.name, CancerCenter.id
+    )
+
+    # Keyset mode: seek past the cursor instead of counting and offsetting
+    if cursor:
+        result = await db.execute(
+            ordered.where(_after_cursor(*_decode_cursor(cursor))).limit(page_size + 1)
+        )
+        items = result.all()
+        has_next = len(items) > page_size
+        items = items[:page_size]
 
-    items = (
-        query.order_by(CancerCenter.us_news_rank.nulls_last(), CancerCenter.name)
+        filtered = any([state, nci_designation, specialty, search])
+        return PaginatedResponse(
+            items=_centers_adapter.validate_python(items, from_attributes=True),
+            total=None if filtered else await _estimated_center_count(db),
+            page_size=page_size,
+            next_cursor=_encode_cursor(items[-1]) if has_next else None,
+        )
+
+    # The filtered total rides along on every row via a window count, so the
+    # page and the total come back from the same scan
+    result = await db.execute(
+        ordered.add_columns(func.count().over().label("total"))
         .offset((page - 1) * page_size)
         .limit(page_size)
-        .all()
     )
+    items = result.all()
+
+    if items:
+        total = items[0].total
+    elif page == 1:
+        total = 0
+    else:
+        # Past the last page there are no rows to carry the count
+        total = await db.scalar(select(func.count()).select_from(query.subquery()))
+    pages = total_pages(total, page_size)
 
     return PaginatedResponse(
-        items=[CancerCenterResponse.model_validate(item) for item in items],
+        items=_centers_adapter.validate_python(items, from_attributes=True),
         total=total,
         page=page,
         page_size=page_size,
-        total_pages=total_pages,
+        total_pages=pages,
+        next_cursor=_encode_cursor(items[-1]) if items and page < pages else None,
     )
 
 
 @router.get("/{center_id}", response_model=CancerCenterResponse)
-def get_center(center_id: int, db: Session = Depends(get_db)):
-    center = db.query(CancerCenter).filter(CancerCenter.id == center_id).first()
+async def get_center(center_id: int, db: AsyncSession = Depends(get_db)):
+    result = await db.execute(
+        select(*CENTER_RESPONSE_COLUMNS).where(CancerCenter.id == center_id)
+    )
+    center = result.one_or_none()
     if not center:
         raise HTTPException(status_code=404, detail="Cancer center not found")
-    return center
+    return CancerCenterResponse.model_validate(center)
 
 
 @router.post("", response_model=CancerCenterResponse, status_code=201)
-def create_center(center: CancerCenterCreate, db: Session = Depends(get_db)):
+async def create_center(center: CancerCenterCreate, db: AsyncSession = Depends(get_db)):
     db_center = CancerCenter(**center.model_dump())
     db.add(db_center)
-    db.commit()
-    db.refresh(db_center)
+    await db.commit()
+    await db.refresh(db_center)
+    await invalidate(
+        STATES_CACHE_KEY, DESIGNATIONS_CACHE_KEY, LOCATIONS_CACHE_KEY, META_CACHE_KEY
+    )
+    await invalidate_prefix(SEARCH_CACHE_PREFIX)
     return db_center
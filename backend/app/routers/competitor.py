@@ -1,9 +1,11 @@
-import time
+import os
 import logging
 from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 
+from app.cache import COMPETITOR_CACHE_PREFIX, get_cached, hash_key, set_cached
 from app.database import get_db
+from app.timing import Timer
 from app.schemas.competitor import (
     ResearcherTrialProfile,
     CompetitorAnalysisResponse,
@@ -14,17 +16,45 @@ from app.services.competitor_service import (
     find_competitors,
     get_trial_as_profile,
 )
-from app.services.claude_service import parse_trial_description
+from app.services.claude_service import aparse_trial_description
 
 logger = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/competitor", tags=["competitor"])
 
+COMPETITOR_CACHE_TTL = int(os.getenv("COMPETITOR_CACHE_TTL", "900"))
+
+
+async def _analyze(
+    profile: ResearcherTrialProfile,
+    db: AsyncSession,
+    timer: Timer,
+) -> CompetitorAnalysisResponse:
+    """Run find_competitors, cached by a hash of the normalized profile."""
+    key = hash_key(f"{COMPETITOR_CACHE_PREFIX}:analyze", profile.model_dump(mode="json"))
+
+    cached = await get_cached(key)
+    if cached is not None:
+        response = CompetitorAnalysisResponse.model_validate_json(cached)
+    else:
+        competitors, insights = await find_competitors(profile, db)
+        response = CompetitorAnalysisResponse(
+            profile=profile,
+            competitors=competitors,
+            insights=insights,
+            total_competitors=len(competitors),
+            processing_time_ms=0,
+        )
+        await set_cached(key, response.model_dump_json().encode(), COMPETITOR_CACHE_TTL)
+
+    response.processing_time_ms = timer.ms
+    return response
+
 
 @router.post("/analyze", response_model=CompetitorAnalysisResponse)
-def analyze_competitors(
+async def analyze_competitors(
     profile: ResearcherTrialProfile,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
 ):
     """
     Analyze competitive landscape for a researcher's trial.
@@ -32,20 +62,10 @@ def analyze_competitors(
     Takes a structured trial profile and returns similar/competing trials
     with market insights.
     """
-    start_time = time.time()
+    timer = Timer()
 
     try:
-        competitors, insights = find_competitors(profile, db)
-
-        processing_time_ms = int((time.time() - start_time) * 1000)
-
-        return CompetitorAnalysisResponse(
-            profile=profile,
-            competitors=competitors,
-            insights=insights,
-            total_competitors=len(competitors),
-            processing_time_ms=processing_time_ms,
-        )
+        return await _analyze(profile, db, timer)
 
     except Exception as e:
         logger.error(f"Error analyzing competitors: {e}")
@@ -53,9 +73,9 @@ def analyze_competitors(
 
 
 @router.post("/analyze/natural", response_model=CompetitorAnalysisResponse)
-def analyze_competitors_natural(
+async def analyze_competitors_natural(
     request: NaturalLanguageRequest,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
 ):
     """
     Analyze competitive landscape from a natural language trial description.
@@ -63,11 +83,11 @@ def analyze_competitors_natural(
     Uses Claude to parse the description into a structured profile,
     then performs competitor analysis.
     """
-    start_time = time.time()
+    timer = Timer()
 
     try:
         # Parse description using Claude
-        parsed = parse_trial_description(request.description)
+        parsed = await aparse_trial_description(request.description)
 
         # Convert to profile
         profile = ResearcherTrialProfile(
@@ -83,17 +103,7 @@ def analyze_competitors_natural(
             prior_treatments_excluded=parsed.get("prior_treatments_excluded", []),
         )
 
-        competitors, insights = find_competitors(profile, db)
-
-        processing_time_ms = int((time.time() - start_time) * 1000)
-
-        return CompetitorAnalysisResponse(
-            profile=profile,
-            competitors=competitors,
-            insights=insights,
-            total_competitors=len(competitors),
-            processing_time_ms=processing_time_ms,
-        )
+        return await _analyze(profile, db, timer)
 
     except Exception as e:
         logger.error(f"Error analyzing competitors from natural language: {e}")
@@ -101,20 +111,20 @@ def analyze_competitors_natural(
 
 
 @router.get("/analyze/{nct_id}", response_model=CompetitorAnalysisResponse)
-def analyze_competitors_by_nct_id(
+async def analyze_competitors_by_nct_id(
     nct_id: str,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
 ):
     """
     Analyze competitive landscape for an existing trial by NCT ID.
 
     Loads the trial from the database and performs competitor analysis.
     """
-    start_time = time.time()
+    timer = Timer()
 
     try:
         # Load trial and convert to profile
-        profile = get_trial_as_profile(nct_id, db)
+        profile = await get_trial_as_profile(nct_id, db)
 
         if not profile:
             raise HTTPException(
@@ -122,17 +132,7 @@ def analyze_competitors_by_nct_id(
                 detail=f"Trial {nct_id} not found in database"
             )
 
-        competitors, insights = find_competitors(profile, db)
-
-        processing_time_ms = int((time.time() - start_time) * 1000)
-
-        return CompetitorAnalysisResponse(
-            profile=profile,
-            competitors=competitors,
-            insights=insights,
-            total_competitors=len(competitors),
-            processing_time_ms=processing_time_ms,
-        )
+        return await _analyze(profile, db, timer)
 
     except HTTPException:
         raise
@@ -142,7 +142,7 @@ def analyze_competitors_by_nct_id(
 
 
 @router.post("/parse", response_model=ParsedTrialResponse)
-def parse_trial(
+async def parse_trial(
     request: NaturalLanguageRequest,
 ):
     """
@@ -151,7 +151,7 @@ def parse_trial(
     Returns the parsed profile for preview before analysis.
     """
     try:
-        parsed = parse_trial_description(request.description)
+        parsed = await aparse_trial_description(request.description)
 
         profile = ResearcherTrialProfile(
             title=parsed.get("title"),
@@ -1,9 +1,11 @@
-import time
 import logging
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
+from typing import Any, Literal, Optional
+from fastapi import APIRouter, Depends, HTTPException, Query
+from pydantic import TypeAdapter
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.database import get_db
+from app.timing import Timer
 from app.schemas.matching import (
     PatientProfile,
     PatientMatchRequest,
@@ -11,18 +13,47 @@ from app.schemas.matching import (
     ParsedProfileResponse,
     TreatmentMatch,
     TrialMatch,
-    EligibilityResult,
 )
-from app.services.claude_service import parse_patient_description
-from app.services.matching_service import match_treatments, match_trials, match_trials_v2, match_trials_structured
+from app.services.claude_service import aparse_patient_description
+from app.services.matching_service import (
+    has_structured_eligibility,
+    match_treatments,
+    match_trials,
+    match_trials_v2,
+    match_trials_structured,
+)
 
 logger = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/match", tags=["matching"])
 
+# Validate whole result lists in one pydantic-core call instead of per row.
+# Eligibility comes from Claude, so this is the one validation pass; the
+# response models around the validated lists are built with model_construct.
+_treatment_matches_adapter = TypeAdapter(list[TreatmentMatch])
+_trial_matches_adapter = TypeAdapter(list[TrialMatch])
+
+
+def _build_profile(
+    raw_extraction: dict[str, Any], location: Optional[str]
+) -> tuple[PatientProfile, dict[str, Any]]:
+    """PatientProfile from a parsed description, plus its dict form for the matching services."""
+    profile = PatientProfile(
+        cancer_type=raw_extraction.get("cancer_type", "NSCLC"),
+        histology=raw_extraction.get("histology"),
+        stage=raw_extraction.get("stage"),
+        biomarkers=raw_extraction.get("biomarkers", {}),
+        age=raw_extraction.get("age"),
+        ecog_status=raw_extraction.get("ecog_status"),
+        prior_treatments=raw_extraction.get("prior_treatments", []),
+        brain_metastases=raw_extraction.get("brain_metastases"),
+        location=location or raw_extraction.get("location"),
+    )
+    return profile, profile.model_dump()
+
 
 @router.post("/parse", response_model=ParsedProfileResponse)
-def parse_patient(request: PatientMatchRequest):
+async def parse_patient(request: PatientMatchRequest):
     """
     Parse a natural language patient description into a structured profile.
 
@@ -30,7 +61,7 @@ def parse_patient(request: PatientMatchRequest):
     running the full matching process.
     """
     try:
-        raw_extraction = parse_patient_description(request.description)
+        raw_extraction = await aparse_patient_description(request.description)
 
         # Check for parsing errors
         if "parse_error" in raw_extraction:
@@ -40,19 +71,9 @@ def parse_patient(request: PatientMatchRequest):
             )
 
         # Build PatientProfile from extraction
-        profile = PatientProfile(
-            cancer_type=raw_extraction.get("cancer_type", "NSCLC"),
-            histology=raw_extraction.get("histology"),
-            stage=raw_extraction.get("stage"),
-            biomarkers=raw_extraction.get("biomarkers", {}),
-            age=raw_extraction.get("age"),
-            ecog_status=raw_extraction.get("ecog_status"),
-            prior_treatments=raw_extraction.get("prior_treatments", []),
-            brain_metastases=raw_extraction.get("brain_metastases"),
-            location=request.location or raw_extraction.get("location"),
-        )
+        profile, _ = _build_profile(raw_extraction, request.location)
 
-        return ParsedProfileResponse(
+        return ParsedProfileResponse.model_construct(
             profile=profile,
             raw_extraction=raw_extraction
         )
@@ -68,7 +89,11 @@ def parse_patient(request: PatientMatchRequest):
 
 
 @router.post("", response_model=PatientMatchResponse)
-def match_patient(request: PatientMatchRequest, db: Session = Depends(get_db)):
+async def match_patient(
+    request: PatientMatchRequest,
+    mode: Literal["interactive", "batch"] = Query("interactive"),
+    db: AsyncSession = Depends(get_db),
+):
     """
     Match a patient to treatments and clinical trials.
 
@@ -76,12 +101,15 @@ def match_patient(request: PatientMatchRequest, db: Session = Depends(get_db)):
     2. Matches FDA-approved treatments based on biomarkers
     3. Evaluates clinical trial eligibility using AI
     4. Returns ranked results with explanations
+
+    mode=batch evaluates trials through the Claude Message Batches API at
+    half the cost; the response can take several minutes.
     """
-    start_time = time.time()
+    timer = Timer()
 
     try:
         # Parse patient description
-        raw_extraction = parse_patient_description(request.description)
+        raw_extraction = await aparse_patient_description(request.description)
 
         if "parse_error" in raw_extraction:
             raise HTTPException(
@@ -89,53 +117,22 @@ def match_patient(request: PatientMatchRequest, db: Session = Depends(get_db)):
                 detail=f"Failed to parse patient description: {raw_extraction['parse_error']}"
             )
 
-        # Build profile dict for matching services
-        profile_dict = {
-            "cancer_type": raw_extraction.get("cancer_type", "NSCLC"),
-            "histology": raw_extraction.get("histology"),
-            "stage": raw_extraction.get("stage"),
-            "biomarkers": raw_extraction.get("biomarkers", {}),
-            "age": raw_extraction.get("age"),
-            "ecog_status": raw_extraction.get("ecog_status"),
-            "prior_treatments": raw_extraction.get("prior_treatments", []),
-            "brain_metastases": raw_extraction.get("brain_metastases"),
-            "location": request.location or raw_extraction.get("location"),
-        }
-
-        # Build PatientProfile for response
-        profile = PatientProfile(**profile_dict)
+        # Build PatientProfile for the response and its dict for matching services
+        profile, profile_dict = _build_profile(raw_extraction, request.location)
 
         # Match treatments (rule-based)
-        treatment_matches = match_treatments(profile_dict, db)
+        treatment_matches = await match_treatments(profile_dict, db)
 
         # Match trials (AI-evaluated)
-        trial_matches = match_trials(profile_dict, db)
+        trial_matches = await match_trials(profile_dict, db, use_batch=mode == "batch")
 
         # Convert to response models
-        treatment_results = [
-            TreatmentMatch(**t) for t in treatment_matches
-        ]
-
-        trial_results = [
-            TrialMatch(
-                id=t["id"],
-                nct_id=t["nct_id"],
-                title=t["title"],
-                phase=t["phase"],
-                status=t["status"],
-                sponsor=t["sponsor"],
-                brief_summary=t["brief_summary"],
-                biomarker_requirements=t["biomarker_requirements"],
-                eligibility=EligibilityResult(**t["eligibility"]),
-                study_url=t["study_url"],
-                locations=t["locations"],
-            )
-            for t in trial_matches
-        ]
+        treatment_results = _treatment_matches_adapter.validate_python(treatment_matches)
+        trial_results = _trial_matches_adapter.validate_python(trial_matches)
 
-        processing_time_ms = int((time.time() - start_time) * 1000)
+        processing_time_ms = timer.ms
 
-        return PatientMatchResponse(
+        return PatientMatchResponse.model_construct(
             profile=profile,
             treatments=treatment_results,
             trials=trial_results,
@@ -155,7 +152,7 @@ def match_patient(request: PatientMatchRequest, db: Session = Depends(get_db)):
 
 
 @router.post("/v2", response_model=PatientMatchResponse)
-def match_patient_v2(request: PatientMatchRequest, db: Session = Depends(get_db)):
+async def match_patient_v2(request: PatientMatchRequest, db: AsyncSession = Depends(get_db)):
     """
     Fast patient matching using pre-extracted structured eligibility.
 
@@ -170,11 +167,11 @@ def match_patient_v2(request: PatientMatchRequest, db: Session = Depends(get_db)
 
     Note: Falls back to original matching if no structured eligibility data exists.
     """
-    start_time = time.time()
+    timer = Timer()
 
     try:
         # Parse patient description (still requires one Claude call)
-        raw_extraction = parse_patient_description(request.description)
+        raw_extraction = await aparse_patient_description(request.description)
 
         if "parse_error" in raw_extraction:
             raise HTTPException(
@@ -182,66 +179,29 @@ def match_patient_v2(request: PatientMatchRequest, db: Session = Depends(get_db)
                 detail=f"Failed to parse patient description: {raw_extraction['parse_error']}"
             )
 
-        # Build profile dict for matching services
-        profile_dict = {
-            "cancer_type": raw_extraction.get("cancer_type", "NSCLC"),
-            "histology": raw_extraction.get("histology"),
-            "stage": raw_extraction.get("stage"),
-            "biomarkers": raw_extraction.get("biomarkers", {}),
-            "age": raw_extraction.get("age"),
-            "ecog_status": raw_extraction.get("ecog_status"),
-            "prior_treatments": raw_extraction.get("prior_treatments", []),
-            "brain_metastases": raw_extraction.get("brain_metastases"),
-            "location": request.location or raw_extraction.get("location"),
-        }
-
-        # Build PatientProfile for response
-        profile = PatientProfile(**profile_dict)
+        # Build PatientProfile for the response and its dict for matching services
+        profile, profile_dict = _build_profile(raw_extraction, request.location)
 
         # Match treatments (rule-based, same as v1)
-        treatment_matches = match_treatments(profile_dict, db)
+        treatment_matches = await match_treatments(profile_dict, db)
 
         # Match trials using fast v2 method
-        trial_matches = match_trials_v2(profile_dict, db)
+        trial_matches = await match_trials_v2(profile_dict, db)
 
         # If no trials found with v2, check if we have structured eligibility data
         if not trial_matches:
-            # Check if any trials have structured eligibility
-            from app.models import ClinicalTrial
-            has_structured = db.query(ClinicalTrial).filter(
-                ClinicalTrial.structured_eligibility.isnot(None)
-            ).first() is not None
-
-            if not has_structured:
+            if not await has_structured_eligibility(db):
                 # Fall back to original matching
                 logger.info("No structured eligibility data, falling back to v1 matching")
-                trial_matches = match_trials(profile_dict, db)
+                trial_matches = await match_trials(profile_dict, db)
 
         # Convert to response models
-        treatment_results = [
-            TreatmentMatch(**t) for t in treatment_matches
-        ]
-
-        trial_results = [
-            TrialMatch(
-                id=t["id"],
-                nct_id=t["nct_id"],
-                title=t["title"],
-                phase=t["phase"],
-                status=t["status"],
-                sponsor=t["sponsor"],
-                brief_summary=t["brief_summary"],
-                biomarker_requirements=t["biomarker_requirements"],
-                eligibility=EligibilityResult(**t["eligibility"]),
-                study_url=t["study_url"],
-                locations=t["locations"],
-            )
-            for t in trial_matches
-        ]
+        treatment_results = _treatment_matches_adapter.validate_python(treatment_matches)
+        trial_results = _trial_matches_adapter.validate_python(trial_matches)
 
-        processing_time_ms = int((time.time() - start_time) * 1000)
+        processing_time_ms = timer.ms
 
-        return PatientMatchResponse(
+        return PatientMatchResponse.model_construct(
             profile=profile,
             treatments=treatment_results,
             trials=trial_results,
@@ -261,7 +221,7 @@ def match_patient_v2(request: PatientMatchRequest, db: Session = Depends(get_db)
 
 
 @router.post("/structured", response_model=PatientMatchResponse)
-def match_patient_structured(profile: PatientProfile, db: Session = Depends(get_db)):
+async def match_patient_structured(profile: PatientProfile, db: AsyncSession = Depends(get_db)):
     """
     Match using structured profile directly (no AI parsing).
 
@@ -274,43 +234,25 @@ def match_patient_structured(profile: PatientProfile, db: Session = Depends(get_
     - Speed is critical (no AI parsing overhead)
     - Cost minimization is important (no Claude API calls)
     """
-    start_time = time.time()
+    timer = Timer()
 
     try:
         # Convert profile to dict for matching services
         profile_dict = profile.model_dump()
 
         # Match treatments (rule-based)
-        treatment_matches = match_treatments(profile_dict, db)
+        treatment_matches = await match_treatments(profile_dict, db)
 
         # Match trials using structured matching with new scoring
-        trial_matches = match_trials_structured(profile_dict, db)
+        trial_matches = await match_trials_structured(profile_dict, db)
 
         # Convert to response models
-        treatment_results = [
-            TreatmentMatch(**t) for t in treatment_matches
-        ]
-
-        trial_results = [
-            TrialMatch(
-                id=t["id"],
-                nct_id=t["nct_id"],
-                title=t["title"],
-                phase=t["phase"],
-                status=t["status"],
-                sponsor=t["sponsor"],
-                brief_summary=t["brief_summary"],
-                biomarker_requirements=t["biomarker_requirements"],
-                eligibility=EligibilityResult(**t["eligibility"]),
-                study_url=t["study_url"],
-                locations=t["locations"],
-            )
-            for t in trial_matches
-        ]
+        treatment_results = _treatment_matches_adapter.validate_python(treatment_matches)
+        trial_results = _trial_matches_adapter.validate_python(trial_matches)
 
-        processing_time_ms = int((time.time() - start_time) * 1000)
+        processing_time_ms = timer.ms
 
-        return PatientMatchResponse(
+        return PatientMatchResponse.model_construct(
             profile=profile,
             treatments=treatment_results,
             trials=trial_results,
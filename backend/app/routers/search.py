@@ -1,132 +1,109 @@
-from fastapi import APIRouter, Depends, Query
-from sqlalchemy.orm import Session
-from sqlalchemy import or_
+from fastapi import APIRouter, Depends, Query, Request
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import or_, select, func, literal, union_all
+from app.cache import SEARCH_CACHE_PREFIX, cached_json_response, request_key
 from app.database import get_db
 from app.models import Treatment, ClinicalTrial, CancerCenter
-from app.schemas import SearchResult
+from app.schemas import (
+    SearchResult,
+    TreatmentResponse,
+    ClinicalTrialResponse,
+    CancerCenterResponse,
+)
+from app.services.suggestion_index import suggestion_index
 
 router = APIRouter(prefix="/search", tags=["search"])
 
+# Search results are cached briefly per query string, and dropped on create
+SEARCH_CACHE_TTL = 30
+
+
+def _search_branch(source: str, model, response_model, columns, q: str, limit: int):
+    """One UNION ALL arm: up to `limit` matching rows, each as a JSON object."""
+    matches = (
+        select(*(getattr(model, field) for field in response_model.model_fields))
+        .where(or_(*(column.ilike(f"%{q}%") for column in columns)))
+        .limit(limit)
+        .subquery()
+    )
+    return select(
+        literal(source).label("source"),
+        func.row_to_json(matches.table_valued()).label("item"),
+    )
+
 
 @router.get("", response_model=SearchResult)
-def unified_search(
+async def unified_search(
+    request: Request,
     q: str = Query(..., min_length=2),
     limit: int = Query(10, ge=1, le=50),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
 ):
     """
     Unified search across treatments, trials, and centers.
     Returns top results from each category.
     """
-    # Search treatments
-    treatments = (
-        db.query(Treatment)
-        .filter(
-            or_(
-                Treatment.generic_name.ilike(f"%{q}%"),
-                Treatment.drug_class.ilike(f"%{q}%"),
-                Treatment.mechanism_of_action.ilike(f"%{q}%"),
-                Treatment.manufacturer.ilike(f"%{q}%"),
-            )
+    async def compute():
+        # All three searches in one round trip
+        query = union_all(
+            _search_branch(
+                "treatment", Treatment, TreatmentResponse,
+                [
+                    Treatment.generic_name,
+                    Treatment.drug_class,
+                    Treatment.mechanism_of_action,
+                    Treatment.manufacturer,
+                ],
+                q, limit,
+            ),
+            _search_branch(
+                "trial", ClinicalTrial, ClinicalTrialResponse,
+                [
+                    ClinicalTrial.title,
+                    ClinicalTrial.brief_summary,
+                    ClinicalTrial.nct_id,
+                    ClinicalTrial.sponsor,
+                ],
+                q, limit,
+            ),
+            _search_branch(
+                "center", CancerCenter, CancerCenterResponse,
+                [
+                    CancerCenter.name,
+                    CancerCenter.city,
+                    CancerCenter.state,
+                    CancerCenter.academic_affiliation,
+                ],
+                q, limit,
+            ),
         )
-        .limit(limit)
-        .all()
-    )
 
-    # Search trials
-    trials = (
-        db.query(ClinicalTrial)
-        .filter(
-            or_(
-                ClinicalTrial.title.ilike(f"%{q}%"),
-                ClinicalTrial.brief_summary.ilike(f"%{q}%"),
-                ClinicalTrial.nct_id.ilike(f"%{q}%"),
-                ClinicalTrial.sponsor.ilike(f"%{q}%"),
-            )
-        )
-        .limit(limit)
-        .all()
-    )
+        results = {"treatment": [], "trial": [], "center": []}
+        for row in (await db.execute(query)).all():
+            results[row.source].append(row.item)
 
-    # Search centers
-    centers = (
-        db.query(CancerCenter)
-        .filter(
-            or_(
-                CancerCenter.name.ilike(f"%{q}%"),
-                CancerCenter.city.ilike(f"%{q}%"),
-                CancerCenter.state.ilike(f"%{q}%"),
-                CancerCenter.academic_affiliation.ilike(f"%{q}%"),
-            )
+        return SearchResult(
+            treatments=results["treatment"],
+            trials=results["trial"],
+            centers=results["center"],
         )
-        .limit(limit)
-        .all()
-    )
 
-    return SearchResult(
-        treatments=treatments,
-        trials=trials,
-        centers=centers,
+    return await cached_json_response(
+        request_key(SEARCH_CACHE_PREFIX, request),
+        SEARCH_CACHE_TTL,
+        compute,
+        max_age=SEARCH_CACHE_TTL,
     )
 
 
 @router.get("/suggest")
-def search_suggestions(
+async def search_suggestions(
     q: str = Query(..., min_length=2),
     limit: int = Query(5, ge=1, le=10),
-    db: Session = Depends(get_db),
 ):
     """
     Typeahead suggestions for search.
     Returns a flat list of suggestions with their types.
     """
-    suggestions = []
-
-    # Treatment suggestions
-    treatments = (
-        db.query(Treatment.id, Treatment.generic_name)
-        .filter(Treatment.generic_name.ilike(f"%{q}%"))
-        .limit(limit)
-        .all()
-    )
-    for t in treatments:
-        suggestions.append({
-            "id": t.id,
-            "text": t.generic_name,
-            "type": "treatment",
-        })
-
-    # Trial suggestions
-    trials = (
-        db.query(ClinicalTrial.nct_id, ClinicalTrial.title)
-        .filter(
-            or_(
-                ClinicalTrial.nct_id.ilike(f"%{q}%"),
-                ClinicalTrial.title.ilike(f"%{q}%"),
-            )
-        )
-        .limit(limit)
-        .all()
-    )
-    for t in trials:
-        suggestions.append({
-            "id": t.nct_id,
-            "text": t.title[:80] + "..." if len(t.title or "") > 80 else t.title,
-            "type": "trial",
-        })
-
-    # Center suggestions
-    centers = (
-        db.query(CancerCenter.id, CancerCenter.name)
-        .filter(CancerCenter.name.ilike(f"%{q}%"))
-        .limit(limit)
-        .all()
-    )
-    for c in centers:
-        suggestions.append({
-            "id": c.id,
-            "text": c.name,
-            "type": "center",
-        })
-
-    return suggestions[:limit * 3]
+    # Served from the in-memory index; no database round trip per keystroke
+    return await suggestion_index.search(q, limit)
@@ -1,88 +1,160 @@
-from fastapi import APIRouter, Depends, HTTPException, Query
-from sqlalchemy.orm import Session
-from sqlalchemy import or_
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from pydantic import TypeAdapter
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select, func, or_, tuple_, Text
+from sqlalchemy.dialects.postgresql import ARRAY as PG_ARRAY
 from typing import Optional
+from app.cache import (
+    SEARCH_CACHE_PREFIX,
+    cached_json_response,
+    invalidate,
+    invalidate_prefix,
+    request_key,
+)
 from app.database import get_db
 from app.models import Treatment
+from app.pagination import decode_cursor, encode_cursor, total_pages
 from app.schemas import TreatmentResponse, TreatmentCreate, PaginatedResponse
 
 router = APIRouter(prefix="/treatments", tags=["treatments"])
 
+# Drug classes only change when treatments are loaded or created
+TREATMENTS_CACHE_TTL = 600
+DRUG_CLASSES_CACHE_KEY = "treatments:classes"
+
+# List pages are cached briefly per query string, and dropped on create
+LIST_CACHE_TTL = 30
+TREATMENT_LIST_CACHE_PREFIX = "treatments:list"
+
+_treatments_adapter = TypeAdapter(list[TreatmentResponse])
+
 
 @router.get("/classes/list", response_model=list[str])
-def list_drug_classes(db: Session = Depends(get_db)):
-    classes = (
-        db.query(Treatment.drug_class)
-        .filter(Treatment.drug_class.isnot(None))
-        .distinct()
-        .all()
-    )
-    return [c[0] for c in classes if c[0]]
+async def list_drug_classes(db: AsyncSession = Depends(get_db)):
+    async def compute():
+        result = await db.execute(
+            select(Treatment.drug_class)
+            .where(Treatment.drug_class.isnot(None))
+            .distinct()
+        )
+        return [c for c in result.scalars().all() if c]
+
+    return await cached_json_response(DRUG_CLASSES_CACHE_KEY, TREATMENTS_CACHE_TTL, compute)
+
+
+def _decode_cursor(cursor: str) -> tuple[str, int]:
+    generic_name, treatment_id = decode_cursor(cursor, 2)
+    if not isinstance(generic_name, str) or not isinstance(treatment_id, int):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    return generic_name, treatment_id
 
 
 @router.get("", response_model=PaginatedResponse)
-def list_treatments(
+async def list_treatments(
+    request: Request,
     page: int = Query(1, ge=1),
     page_size: int = Query(20, ge=1, le=100),
+    cursor: Optional[str] = Query(None, description="next_cursor from a previous page"),
     drug_class: Optional[str] = None,
     biomarker: Optional[str] = None,
     fda_status: Optional[str] = None,
     search: Optional[str] = None,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
 ):
-    query = db.query(Treatment)
+    async def compute():
+        query = select(Treatment)
 
-    if drug_class:
-        query = query.filter(Treatment.drug_class.ilike(f"%{drug_class}%"))
+        if drug_class:
+            query = query.where(Treatment.drug_class.ilike(f"%{drug_class}%"))
 
-    if biomarker:
-        query = query.filter(
-            Treatment.biomarker_requirements.cast(str).ilike(f"%{biomarker}%")
-        )
+        if biomarker:
+            # Case-insensitive key match, served by treatments_biomarker_keys_gin
+            query = query.where(
+                func.upper_jsonb_keys(Treatment.biomarker_requirements, type_=PG_ARRAY(Text))
+                .contains([biomarker.strip().upper()])
+            )
 
-    if fda_status:
-        query = query.filter(Treatment.fda_approval_status == fda_status)
+        if fda_status:
+            query = query.where(Treatment.fda_approval_status == fda_status)
 
-    if search:
-        query = query.filter(
-            or_(
-                Treatment.generic_name.ilike(f"%{search}%"),
-                Treatment.drug_class.ilike(f"%{search}%"),
-                Treatment.mechanism_of_action.ilike(f"%{search}%"),
+        if search:
+            query = query.where(
+                or_(
+                    Treatment.generic_name.ilike(f"%{search}%"),
+                    Treatment.drug_class.ilike(f"%{search}%"),
+                    Treatment.mechanism_of_action.ilike(f"%{search}%"),
+                )
             )
-        )
 
-    total = query.count()
-    total_pages = (total + page_size - 1) // page_size
+        ordered = query.order_by(Treatment.generic_name, Treatment.id)
+
+        # Keyset mode: seek past the cursor instead of counting and offsetting
+        if cursor:
+            items = (await db.scalars(
+                ordered.where(
+                    tuple_(Treatment.generic_name, Treatment.id) > tuple_(*_decode_cursor(cursor))
+                ).limit(page_size + 1)
+            )).all()
+            has_next = len(items) > page_size
+            items = items[:page_size]
+
+            return PaginatedResponse(
+                items=_treatments_adapter.validate_python(items, from_attributes=True),
+                page_size=page_size,
+                next_cursor=encode_cursor(items[-1].generic_name, items[-1].id) if has_next else None,
+            )
 
-    items = (
-        query.order_by(Treatment.generic_name)
-        .offset((page - 1) * page_size)
-        .limit(page_size)
-        .all()
-    )
+        # Page and filtered total in one statement via a window count
+        rows = (await db.execute(
+            ordered.add_columns(func.count().over().label("total"))
+            .offset((page - 1) * page_size)
+            .limit(page_size)
+        )).all()
+
+        if rows:
+            total = rows[0].total
+        elif page == 1:
+            total = 0
+        else:
+            # Past the last page there are no rows to carry the count
+            total = await db.scalar(select(func.count()).select_from(query.subquery()))
+        pages = total_pages(total, page_size)
+        items = [row.Treatment for row in rows]
+
+        return PaginatedResponse(
+            items=_treatments_adapter.validate_python(items, from_attributes=True),
+            total=total,
+            page=page,
+            page_size=page_size,
+            total_pages=pages,
+            next_cursor=(
+                encode_cursor(items[-1].generic_name, items[-1].id)
+                if items and page < pages else None
+            ),
+        )
 
-    return PaginatedResponse(
-        items=[TreatmentResponse.model_validate(item) for item in items],
-        total=total,
-        page=page,
-        page_size=page_size,
-        total_pages=total_pages,
+    return await cached_json_response(
+        request_key(TREATMENT_LIST_CACHE_PREFIX, request),
+        LIST_CACHE_TTL,
+        compute,
+        max_age=LIST_CACHE_TTL,
     )
 
 
 @router.get("/{treatment_id}", response_model=TreatmentResponse)
-def get_treatment(treatment_id: int, db: Session = Depends(get_db)):
-    treatment = db.query(Treatment).filter(Treatment.id == treatment_id).first()
+async def get_treatment(treatment_id: int, db: AsyncSession = Depends(get_db)):
+    treatment = await db.get(Treatment, treatment_id)
     if not treatment:
         raise HTTPException(status_code=404, detail="Treatment not found")
     return treatment
 
 
 @router.post("", response_model=TreatmentResponse, status_code=201)
-def create_treatment(treatment: TreatmentCreate, db: Session = Depends(get_db)):
+async def create_treatment(treatment: TreatmentCreate, db: AsyncSession = Depends(get_db)):
     db_treatment = Treatment(**treatment.model_dump())
     db.add(db_treatment)
-    db.commit()
-    db.refresh(db_treatment)
+    await db.commit()
+    await db.refresh(db_treatment)
+    await invalidate(DRUG_CLASSES_CACHE_KEY)
+    await invalidate_prefix(TREATMENT_LIST_CACHE_PREFIX, SEARCH_CACHE_PREFIX)
     return db_treatment
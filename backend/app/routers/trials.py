@@ -1,91 +1,168 @@
-from fastapi import APIRouter, Depends, HTTPException, Query
-from sqlalchemy.orm import Session
-from sqlalchemy import or_, func, case, nullslast, Text
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from fastapi.responses import StreamingResponse
+from pydantic import TypeAdapter
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select, or_, and_, func, case, nullslast, bindparam, text, tuple_, Text
+from sqlalchemy.dialects.postgresql import ARRAY as PG_ARRAY
+from sqlalchemy.engine import Row
 from sqlalchemy.sql.expression import cast
+from decimal import Decimal, InvalidOperation
 from typing import Optional
-from app.database import get_db
+from app.cache import (
+    COMPETITOR_CACHE_PREFIX,
+    SEARCH_CACHE_PREFIX,
+    cached_json_response,
+    dumps,
+    invalidate,
+    invalidate_prefix,
+    request_key,
+)
+from app.database import AsyncSessionLocal, get_db
 from app.models import ClinicalTrial
-from app.schemas import ClinicalTrialResponse, ClinicalTrialCreate, PaginatedResponse
+from app.pagination import decode_cursor, encode_cursor, total_pages
+from app.schemas import (
+    ClinicalTrialResponse,
+    ClinicalTrialListResponse,
+    ClinicalTrialCreate,
+    PaginatedResponse,
+)
 
 router = APIRouter(prefix="/trials", tags=["trials"])
 
+# Trial enumerations and stats only change when trials are loaded or created
+TRIALS_CACHE_TTL = 600
+PHASES_CACHE_KEY = "trials:phases"
+STATUSES_CACHE_KEY = "trials:statuses"
+RELEVANCE_STATS_CACHE_KEY = "trials:relevance_stats"
+LOCATIONS_CACHE_PREFIX = "trials:locations"
+
+# List pages are cached briefly per query string, and dropped on create
+LIST_CACHE_TTL = 30
+TRIAL_LIST_CACHE_PREFIX = "trials:list"
+
+_trial_list_adapter = TypeAdapter(list[ClinicalTrialListResponse])
+
+# The list endpoint reads only what the list schema needs. eligibility_criteria,
+# locations and structured_eligibility are reduced to summaries in SQL rather
+# than shipped whole for every row.
+TRIAL_LIST_COLUMNS = (
+    ClinicalTrial.id,
+    ClinicalTrial.nct_id,
+    ClinicalTrial.title,
+    ClinicalTrial.brief_summary,
+    ClinicalTrial.phase,
+    ClinicalTrial.status,
+    ClinicalTrial.sponsor,
+    ClinicalTrial.conditions,
+    ClinicalTrial.primary_completion_date,
+    ClinicalTrial.study_url,
+    ClinicalTrial.last_updated,
+    ClinicalTrial.nsclc_relevance,
+    ClinicalTrial.relevance_score,
+    case(
+        (func.jsonb_typeof(ClinicalTrial.locations) == "array",
+         func.jsonb_array_length(ClinicalTrial.locations)),
+        else_=0,
+    ).label("location_count"),
+    ClinicalTrial.structured_eligibility.isnot(None).label("has_structured_eligibility"),
+    ClinicalTrial.structured_eligibility["biomarkers"]["required_positive"].label("required_biomarkers"),
+)
+
 # Valid relevance categories
 VALID_RELEVANCE_CATEGORIES = ["nsclc_specific", "nsclc_primary", "multi_cancer", "solid_tumor"]
 DEFAULT_RELEVANCE_FILTER = ["nsclc_specific", "nsclc_primary"]  # Strict mode default
 
 
 @router.get("/phases/list", response_model=list[str])
-def list_phases(db: Session = Depends(get_db)):
-    phases = (
-        db.query(ClinicalTrial.phase)
-        .filter(ClinicalTrial.phase.isnot(None))
-        .distinct()
-        .all()
-    )
-    return sorted([p[0] for p in phases if p[0]])
+async def list_phases(db: AsyncSession = Depends(get_db)):
+    async def compute():
+        result = await db.execute(
+            select(ClinicalTrial.phase)
+            .where(ClinicalTrial.phase.isnot(None))
+            .distinct()
+        )
+        return sorted([p for p in result.scalars().all() if p])
+
+    return await cached_json_response(PHASES_CACHE_KEY, TRIALS_CACHE_TTL, compute)
 
 
 @router.get("/statuses/list", response_model=list[str])
-def list_statuses(db: Session = Depends(get_db)):
-    statuses = (
-        db.query(ClinicalTrial.status)
-        .filter(ClinicalTrial.status.isnot(None))
-        .distinct()
-        .all()
-    )
-    return [s[0] for s in statuses if s[0]]
+async def list_statuses(db: AsyncSession = Depends(get_db)):
+    async def compute():
+        result = await db.execute(
+            select(ClinicalTrial.status)
+            .where(ClinicalTrial.status.isnot(None))
+            .distinct()
+        )
+        return [s for s in result.scalars().all() if s]
+
+    return await cached_json_response(STATUSES_CACHE_KEY, TRIALS_CACHE_TTL, compute)
 
 
 @router.get("/relevance/list", response_model=list[str])
-def list_relevance_categories():
+async def list_relevance_categories():
     """Return list of valid NSCLC relevance categories."""
     return VALID_RELEVANCE_CATEGORIES
 
 
 @router.get("/stats/relevance", response_model=dict)
-def get_relevance_stats(db: Session = Depends(get_db)):
+async def get_relevance_stats(db: AsyncSession = Depends(get_db)):
     """
     Get breakdown of trials by NSCLC relevance category.
 
-    Returns counts and percentages for each relevance category.
+    Returns counts and percentages for each relevance category, and each
+    category's counts by phase.
     """
-    # Get counts for each relevance category
-    results = (
-        db.query(
-            ClinicalTrial.nsclc_relevance,
-            func.count(ClinicalTrial.id).label('count')
-        )
-        .group_by(ClinicalTrial.nsclc_relevance)
-        .all()
-    )
-
-    total = sum(r.count for r in results)
-    stats = {
-        "total": total,
-        "categories": {},
-        "nsclc_relevant_count": 0,  # nsclc_specific + nsclc_primary
-    }
-
-    for result in results:
-        category = result.nsclc_relevance or "unknown"
-        count = result.count
-        stats["categories"][category] = {
-            "count": count,
-            "percentage": round((count / total * 100) if total > 0 else 0, 1)
+    async def compute():
+        # Per-category and per-(category, phase) counts from one scan;
+        # grouping(phase) = 1 marks the category subtotal rows
+        results = (await db.execute(
+            select(
+                ClinicalTrial.nsclc_relevance,
+                ClinicalTrial.phase,
+                func.grouping(ClinicalTrial.phase).label('is_subtotal'),
+                func.count(ClinicalTrial.id).label('count')
+            )
+            .group_by(func.grouping_sets(
+                tuple_(ClinicalTrial.nsclc_relevance),
+                tuple_(ClinicalTrial.nsclc_relevance, ClinicalTrial.phase),
+            ))
+        )).all()
+
+        # Every category is represented, even with no trials
+        categories = {
+            cat: {"count": 0, "percentage": 0.0, "phases": {}}
+            for cat in VALID_RELEVANCE_CATEGORIES
+        }
+        for result in results:
+            category = categories.setdefault(
+                result.nsclc_relevance or "unknown",
+                {"count": 0, "percentage": 0.0, "phases": {}},
+            )
+            if result.is_subtotal:
+                category["count"] = result.count
+            else:
+                category["phases"][result.phase or "unknown"] = result.count
+
+        total = sum(category["count"] for category in categories.values())
+        for category in categories.values():
+            if total > 0:
+                category["percentage"] = round(category["count"] / total * 100, 1)
+
+        return {
+            "total": total,
+            "categories": categories,
+            # nsclc_specific + nsclc_primary
+            "nsclc_relevant_count": (
+                categories["nsclc_specific"]["count"] + categories["nsclc_primary"]["count"]
+            ),
         }
-        if category in ("nsclc_specific", "nsclc_primary"):
-            stats["nsclc_relevant_count"] += count
-
-    # Ensure all categories are represented
-    for cat in VALID_RELEVANCE_CATEGORIES:
-        if cat not in stats["categories"]:
-            stats["categories"][cat] = {"count": 0, "percentage": 0.0}
 
-    return stats
+    return await cached_json_response(RELEVANCE_STATS_CACHE_KEY, TRIALS_CACHE_TTL, compute)
 
 
 @router.get("/biomarkers/list", response_model=list[str])
-def list_biomarkers(db: Session = Depends(get_db)):
+async def list_biomarkers():
     """
     Return common biomarkers found in trial eligibility criteria.
 
@@ -97,40 +174,92 @@ def list_biomarkers(db: Session = Depends(get_db)):
     ]
 
 
+# One row per located site, expanded and filtered inside Postgres. The limit
+# applies to trials, as before, not to the sites they expand into.
+TRIAL_LOCATIONS_SQL = text("""
+    SELECT t.nct_id,
+           t.title,
+           loc->>'facility' AS facility,
+           loc->>'city' AS city,
+           loc->>'state' AS state,
+           (loc->>'lat')::float AS lat,
+           (loc->>'lng')::float AS lng
+    FROM (
+        SELECT nct_id, title, locations
+        FROM clinical_trials
+        WHERE jsonb_typeof(locations) = 'array'
+        LIMIT :limit
+    ) AS t
+    CROSS JOIN LATERAL jsonb_array_elements(t.locations) AS loc
+    WHERE NULLIF(loc->>'lat', '') IS NOT NULL
+      AND NULLIF(loc->>'lng', '') IS NOT NULL
+""")
+
+
+async def _stream_trial_locations(limit: int):
+    """Yield one NDJSON line per location as rows arrive from a server-side cursor."""
+    # Own session: the response is still streaming after the handler returns
+    async with AsyncSessionLocal() as db:
+        result = await db.stream(
+            TRIAL_LOCATIONS_SQL.execution_options(yield_per=200), {"limit": limit}
+        )
+        async for rows in result.mappings().partitions():
+            yield b"".join(dumps(dict(row)) + b"\n" for row in rows)
+
+
 @router.get("/locations", response_model=list[dict])
-def get_trial_locations(
+async def get_trial_locations(
     limit: int = Query(500, ge=1, le=1000),
-    db: Session = Depends(get_db),
+    stream: bool = Query(False, description="Stream locations as NDJSON, one object per line"),
+    db: AsyncSession = Depends(get_db),
 ):
     """Get all trial locations for map display"""
-    trials = (
-        db.query(ClinicalTrial.nct_id, ClinicalTrial.title, ClinicalTrial.locations)
-        .filter(ClinicalTrial.locations.isnot(None))
-        .limit(limit)
-        .all()
+    if stream:
+        return StreamingResponse(
+            _stream_trial_locations(limit), media_type="application/x-ndjson"
+        )
+
+    async def compute():
+        result = await db.execute(TRIAL_LOCATIONS_SQL, {"limit": limit})
+        return [dict(row) for row in result.mappings()]
+
+    return await cached_json_response(
+        f"{LOCATIONS_CACHE_PREFIX}:{limit}", TRIALS_CACHE_TTL, compute
     )
 
-    locations = []
-    for trial in trials:
-        if trial.locations:
-            for loc in trial.locations:
-                if loc.get("lat") and loc.get("lng"):
-                    locations.append({
-                        "nct_id": trial.nct_id,
-                        "title": trial.title,
-                        "facility": loc.get("facility"),
-                        "city": loc.get("city"),
-                        "state": loc.get("state"),
-                        "lat": loc.get("lat"),
-                        "lng": loc.get("lng"),
-                    })
-    return locations
+
+def _encode_cursor(trial: Row) -> str:
+    score = trial.relevance_score
+    return encode_cursor(str(score) if score is not None else None, trial.nct_id)
+
+
+def _decode_cursor(cursor: str) -> tuple[Optional[Decimal], str]:
+    score, nct_id = decode_cursor(cursor, 2)
+    if not isinstance(nct_id, str) or not isinstance(score, (str, type(None))):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    try:
+        return (Decimal(score) if score is not None else None), nct_id
+    except InvalidOperation:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+def _after_cursor(score: Optional[Decimal], nct_id: str):
+    """Rows that sort after (score, nct_id) in `relevance_score DESC NULLS LAST, nct_id DESC` order."""
+    if score is None:
+        return and_(ClinicalTrial.relevance_score.is_(None), ClinicalTrial.nct_id < nct_id)
+    return or_(
+        ClinicalTrial.relevance_score < score,
+        and_(ClinicalTrial.relevance_score == score, ClinicalTrial.nct_id < nct_id),
+        ClinicalTrial.relevance_score.is_(None),
+    )
 
 
 @router.get("", response_model=PaginatedResponse)
-def list_trials(
+async def list_trials(
+    request: Request,
     page: int = Query(1, ge=1),
     page_size: int = Query(20, ge=1, le=100),
+    cursor: Optional[str] = Query(None, description="next_cursor from a previous page"),
     phase: Optional[str] = None,
     status: Optional[str] = None,
     state: Optional[str] = None,
@@ -151,7 +280,7 @@ def list_trials(
         None,
         description="Filter to trials with/without structured eligibility data"
     ),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
 ):
     """
     List clinical trials with filtering options.
@@ -159,102 +288,151 @@ def list_trials(
     By default, only NSCLC-specific and NSCLC-primary trials are returned
     (unless include_all_relevance=true or relevance parameter is specified).
     """
-    query = db.query(ClinicalTrial)
-
-    # Apply relevance filter
-    if not include_all_relevance:
-        if relevance:
-            # Parse comma-separated relevance categories
-            relevance_list = [r.strip() for r in relevance.split(",")]
-            valid_relevance = [r for r in relevance_list if r in VALID_RELEVANCE_CATEGORIES]
-            if valid_relevance:
-                query = query.filter(ClinicalTrial.nsclc_relevance.in_(valid_relevance))
-        else:
-            # Check if any trials have relevance data
-            has_relevance = db.query(ClinicalTrial).filter(
-                ClinicalTrial.nsclc_relevance.isnot(None)
-            ).first() is not None
-
-            if has_relevance:
-                # Default to NSCLC-specific trials only
-                query = query.filter(
-                    ClinicalTrial.nsclc_relevance.in_(DEFAULT_RELEVANCE_FILTER)
-                )
-
-    if phase:
-        query = query.filter(ClinicalTrial.phase.ilike(f"%{phase}%"))
+    async def compute():
+        query = select(*TRIAL_LIST_COLUMNS)
+
+        # Apply relevance filter
+        if not include_all_relevance:
+            if relevance:
+                # Parse comma-separated relevance categories
+                relevance_list = [r.strip() for r in relevance.split(",")]
+                valid_relevance = [r for r in relevance_list if r in VALID_RELEVANCE_CATEGORIES]
+                if valid_relevance:
+                    query = query.where(ClinicalTrial.nsclc_relevance.in_(valid_relevance))
+            else:
+                # Check if any trials have relevance data
+                has_relevance = await db.scalar(
+                    select(ClinicalTrial.id)
+                    .where(ClinicalTrial.nsclc_relevance.isnot(None))
+                    .limit(1)
+                ) is not None
+
+                if has_relevance:
+                    # Default to NSCLC-specific trials only. The values are inlined
+                    # so the planner can match the trials_default_order predicate.
+                    query = query.where(
+                        ClinicalTrial.nsclc_relevance.in_(
+                            bindparam(
+                                "default_relevance",
+                                DEFAULT_RELEVANCE_FILTER,
+                                expanding=True,
+                                literal_execute=True,
+                            )
+                        )
+                    )
+
+        if phase:
+            query = query.where(ClinicalTrial.phase.ilike(f"%{phase}%"))
+
+        if status:
+            query = query.where(ClinicalTrial.status.ilike(f"%{status}%"))
+
+        if state:
+            query = query.where(
+                cast(ClinicalTrial.locations, Text).ilike(f"%{state}%")
+            )
 
-    if status:
-        query = query.filter(ClinicalTrial.status.ilike(f"%{status}%"))
+        if sponsor:
+            query = query.where(ClinicalTrial.sponsor.ilike(f"%{sponsor}%"))
+
+        if biomarker:
+            # Search biomarker_requirements and structured eligibility by name
+            # (trials_biomarker_keys_gin), and the raw criteria text
+            query = query.where(
+                or_(
+                    func.trial_biomarker_keys(
+                        ClinicalTrial.biomarker_requirements,
+                        ClinicalTrial.structured_eligibility,
+                        type_=PG_ARRAY(Text),
+                    ).contains([biomarker.strip().upper()]),
+                    ClinicalTrial.eligibility_criteria.ilike(f"%{biomarker.strip()}%"),
+                )
+            )
 
-    if state:
-        query = query.filter(
-            cast(ClinicalTrial.locations, Text).ilike(f"%{state}%")
-        )
+        if search:
+            query = query.where(
+                or_(
+                    ClinicalTrial.title.ilike(f"%{search}%"),
+                    ClinicalTrial.brief_summary.ilike(f"%{search}%"),
+                    ClinicalTrial.nct_id.ilike(f"%{search}%"),
+                )
+            )
 
-    if sponsor:
-        query = query.filter(ClinicalTrial.sponsor.ilike(f"%{sponsor}%"))
+        if has_structured_eligibility is not None:
+            if has_structured_eligibility:
+                query = query.where(ClinicalTrial.structured_eligibility.isnot(None))
+            else:
+                query = query.where(ClinicalTrial.structured_eligibility.is_(None))
 
-    if biomarker:
-        # Search in structured eligibility JSONB, biomarker_requirements, and raw text
-        query = query.filter(
-            or_(
-                cast(ClinicalTrial.biomarker_requirements, Text).ilike(f"%{biomarker}%"),
-                ClinicalTrial.eligibility_criteria.ilike(f"%{biomarker}%"),
-                cast(ClinicalTrial.structured_eligibility, Text).ilike(f"%{biomarker}%"),
-            )
+        # Order by relevance score (if available) then by NCT ID
+        ordered = query.order_by(
+            nullslast(ClinicalTrial.relevance_score.desc()),
+            ClinicalTrial.nct_id.desc()
         )
 
-    if search:
-        query = query.filter(
-            or_(
-                ClinicalTrial.title.ilike(f"%{search}%"),
-                ClinicalTrial.brief_summary.ilike(f"%{search}%"),
-                ClinicalTrial.nct_id.ilike(f"%{search}%"),
+        # Keyset mode: seek past the cursor instead of counting and offsetting
+        if cursor:
+            items = (await db.execute(
+                ordered.where(_after_cursor(*_decode_cursor(cursor))).limit(page_size + 1)
+            )).all()
+            has_next = len(items) > page_size
+            items = items[:page_size]
+
+            return PaginatedResponse(
+                items=_trial_list_adapter.validate_python(items, from_attributes=True),
+                page_size=page_size,
+                next_cursor=_encode_cursor(items[-1]) if has_next else None,
             )
-        )
 
-    if has_structured_eligibility is not None:
-        if has_structured_eligibility:
-            query = query.filter(ClinicalTrial.structured_eligibility.isnot(None))
+        # Page and filtered total in one statement via a window count
+        items = (await db.execute(
+            ordered.add_columns(func.count().over().label("total"))
+            .offset((page - 1) * page_size)
+            .limit(page_size)
+        )).all()
+
+        if items:
+            total = items[0].total
+        elif page == 1:
+            total = 0
         else:
-            query = query.filter(ClinicalTrial.structured_eligibility.is_(None))
-
-    total = query.count()
-    total_pages = (total + page_size - 1) // page_size
-
-    # Order by relevance score (if available) then by NCT ID
-    items = (
-        query.order_by(
-            nullslast(ClinicalTrial.relevance_score.desc()),
-            ClinicalTrial.nct_id.desc()
+            # Past the last page there are no rows to carry the count
+            total = await db.scalar(select(func.count()).select_from(query.subquery()))
+        pages = total_pages(total, page_size)
+
+        return PaginatedResponse(
+            items=_trial_list_adapter.validate_python(items, from_attributes=True),
+            total=total,
+            page=page,
+            page_size=page_size,
+            total_pages=pages,
+            next_cursor=_encode_cursor(items[-1]) if items and page < pages else None,
         )
-        .offset((page - 1) * page_size)
-        .limit(page_size)
-        .all()
-    )
 
-    return PaginatedResponse(
-        items=[ClinicalTrialResponse.model_validate(item) for item in items],
-        total=total,
-        page=page,
-        page_size=page_size,
-        total_pages=total_pages,
+    return await cached_json_response(
+        request_key(TRIAL_LIST_CACHE_PREFIX, request),
+        LIST_CACHE_TTL,
+        compute,
+        max_age=LIST_CACHE_TTL,
     )
 
 
 @router.get("/{nct_id}", response_model=ClinicalTrialResponse)
-def get_trial(nct_id: str, db: Session = Depends(get_db)):
-    trial = db.query(ClinicalTrial).filter(ClinicalTrial.nct_id == nct_id).first()
+async def get_trial(nct_id: str, db: AsyncSession = Depends(get_db)):
+    trial = await db.scalar(select(ClinicalTrial).where(ClinicalTrial.nct_id == nct_id))
     if not trial:
         raise HTTPException(status_code=404, detail="Trial not found")
     return trial
 
 
 @router.post("", response_model=ClinicalTrialResponse, status_code=201)
-def create_trial(trial: ClinicalTrialCreate, db: Session = Depends(get_db)):
+async def create_trial(trial: ClinicalTrialCreate, db: AsyncSession = Depends(get_db)):
     db_trial = ClinicalTrial(**trial.model_dump())
     db.add(db_trial)
-    db.commit()
-    db.refresh(db_trial)
+    await db.commit()
+    await db.refresh(db_trial)
+    await invalidate(PHASES_CACHE_KEY, STATUSES_CACHE_KEY, RELEVANCE_STATS_CACHE_KEY)
+    await invalidate_prefix(
+        TRIAL_LIST_CACHE_PREFIX, LOCATIONS_CACHE_PREFIX, SEARCH_CACHE_PREFIX, COMPETITOR_CACHE_PREFIX
+    )
     return db_trial
@@ -14,9 +14,12 @@ from .entities import (
     TreatmentResponse,
     TreatmentCreate,
     ClinicalTrialResponse,
+    ClinicalTrialListResponse,
     ClinicalTrialCreate,
     CancerCenterResponse,
     CancerCenterCreate,
+    NearbyCancerCenterResponse,
+    CancerCenterMetaResponse,
     SearchResult,
     PaginatedResponse,
 )
@@ -5,11 +5,40 @@ These schemas define the structure of extracted eligibility criteria
 from free-text clinical trial eligibility requirements.
 """
 
-from pydantic import BaseModel, Field
-from typing import Optional
+from pydantic import BaseModel, ConfigDict, Field, field_validator
+from typing import Any, Optional
 from datetime import datetime
 
 
+# OpenAPI example for StructuredEligibility
+STRUCTURED_ELIGIBILITY_EXAMPLE = {
+    "age": {"min": 18, "max": None},
+    "ecog": {"min": 0, "max": 2},
+    "disease_stage": {"allowed": ["IIIB", "IV"], "excluded": []},
+    "histology": {"allowed": ["adenocarcinoma", "squamous"], "excluded": []},
+    "biomarkers": {
+        "required_positive": {"EGFR": ["L858R", "exon 19 deletion"]},
+        "required_negative": ["ALK", "ROS1"],
+        "pdl1_expression": None
+    },
+    "prior_treatments": {
+        "required": [],
+        "excluded": ["EGFR TKI"],
+        "max_lines": 2,
+        "min_lines": None,
+        "treatment_naive_required": False
+    },
+    "brain_metastases": {
+        "allowed": True,
+        "controlled_only": True,
+        "untreated_allowed": False
+    },
+    "common_exclusions": ["pregnancy", "active infection", "autoimmune disease"],
+    "extraction_confidence": 0.85,
+    "extraction_notes": []
+}
+
+
 class AgeRequirement(BaseModel):
     """Age eligibility requirements."""
     min: Optional[int] = Field(None, ge=0, le=120, description="Minimum age in years")
@@ -21,6 +50,14 @@ class ECOGRequirement(BaseModel):
     min: Optional[int] = Field(None, ge=0, le=4, description="Minimum ECOG score allowed")
     max: Optional[int] = Field(None, ge=0, le=4, description="Maximum ECOG score allowed")
 
+    @field_validator("min", "max", mode="before")
+    @classmethod
+    def clamp_to_scale(cls, value: Any) -> Any:
+        # Extracted scores outside the scale are clamped rather than rejected
+        if isinstance(value, (int, float)) and not isinstance(value, bool):
+            return max(0, min(4, value))
+        return value
+
 
 class ListRequirement(BaseModel):
     """Generic list-based requirement with allowed/excluded values."""
@@ -172,35 +209,16 @@ class StructuredEligibility(BaseModel):
         description="Notes about extraction challenges or uncertainties"
     )
 
-    class Config:
-        json_schema_extra = {
-            "example": {
-                "age": {"min": 18, "max": None},
-                "ecog": {"min": 0, "max": 2},
-                "disease_stage": {"allowed": ["IIIB", "IV"], "excluded": []},
-                "histology": {"allowed": ["adenocarcinoma", "squamous"], "excluded": []},
-                "biomarkers": {
-                    "required_positive": {"EGFR": ["L858R", "exon 19 deletion"]},
-                    "required_negative": ["ALK", "ROS1"],
-                    "pdl1_expression": None
-                },
-                "prior_treatments": {
-                    "required": [],
-                    "excluded": ["EGFR TKI"],
-                    "max_lines": 2,
-                    "min_lines": None,
-                    "treatment_naive_required": False
-                },
-                "brain_metastases": {
-                    "allowed": True,
-                    "controlled_only": True,
-                    "untreated_allowed": False
-                },
-                "common_exclusions": ["pregnancy", "active infection", "autoimmune disease"],
-                "extraction_confidence": 0.85,
-                "extraction_notes": []
-            }
-        }
+    model_config = ConfigDict(json_schema_extra={"example": STRUCTURED_ELIGIBILITY_EXAMPLE})
+
+    @field_validator("extraction_confidence", mode="before")
+    @classmethod
+    def clamp_confidence(cls, value: Any) -> float:
+        # An unusable confidence falls back to the default; others are clamped
+        try:
+            return max(0.0, min(1.0, float(value)))
+        except (TypeError, ValueError):
+            return 0.5
 
 
 class StructuredEligibilityResponse(BaseModel):
@@ -1,7 +1,10 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, ConfigDict
 from typing import Optional, Any
 from datetime import date, datetime
 
+# Shared by every response model read straight from ORM rows
+ORM_CONFIG = ConfigDict(from_attributes=True)
+
 
 class TreatmentBase(BaseModel):
     generic_name: str
@@ -25,8 +28,7 @@ class TreatmentResponse(TreatmentBase):
     id: int
     last_updated: Optional[datetime] = None
 
-    class Config:
-        from_attributes = True
+    model_config = ORM_CONFIG
 
 
 class ClinicalTrialBase(BaseModel):
@@ -62,8 +64,31 @@ class ClinicalTrialResponse(ClinicalTrialBase):
     eligibility_extraction_version: Optional[str] = None
     eligibility_extracted_at: Optional[datetime] = None
 
-    class Config:
-        from_attributes = True
+    model_config = ORM_CONFIG
+
+
+class ClinicalTrialListResponse(BaseModel):
+    """Trial row for list views; the heavy text and JSON fields stay on the detail endpoint."""
+
+    id: int
+    nct_id: str
+    title: Optional[str] = None
+    brief_summary: Optional[str] = None
+    phase: Optional[str] = None
+    status: Optional[str] = None
+    sponsor: Optional[str] = None
+    conditions: Optional[list[str]] = None
+    primary_completion_date: Optional[date] = None
+    study_url: Optional[str] = None
+    last_updated: Optional[datetime] = None
+    nsclc_relevance: Optional[str] = None
+    relevance_score: Optional[float] = None
+    # Summaries of locations and structured_eligibility
+    location_count: int = 0
+    has_structured_eligibility: bool = False
+    required_biomarkers: Optional[dict[str, Any]] = None
+
+    model_config = ORM_CONFIG
 
 
 class CancerCenterBase(BaseModel):
@@ -92,8 +117,17 @@ class CancerCenterResponse(CancerCenterBase):
     id: int
     last_updated: Optional[datetime] = None
 
-    class Config:
-        from_attributes = True
+    model_config = ORM_CONFIG
+
+
+class NearbyCancerCenterResponse(CancerCenterResponse):
+    distance_m: float
+
+
+class CancerCenterMetaResponse(BaseModel):
+    states: list[str]
+    designations: list[str]
+    specialties: dict[str, int]  # specialty -> number of centers
 
 
 class SearchResult(BaseModel):
@@ -104,10 +138,10 @@ class SearchResult(BaseModel):
 
 class PaginatedResponse(BaseModel):
     items: list[Any]
-    total: int
-    page: int
+    total: Optional[int] = None
+    page: Optional[int] = None
     page_size: int
-    total_pages: int
+    total_pages: Optional[int] = None
+    next_cursor: Optional[str] = None
 
-    class Config:
-        from_attributes = True
+    model_config = ORM_CONFIG
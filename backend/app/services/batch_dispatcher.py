@@ -0,0 +1,130 @@
+"""
+Pools Claude requests from concurrent callers into Message Batches.
+
+Batched requests are billed at half the normal token price, but a batch
+completes asynchronously (typically within minutes), so this is only for
+callers that can afford to wait, such as /match?mode=batch.
+"""
+
+import os
+import uuid
+import asyncio
+import logging
+from typing import Any, Optional
+
+from anthropic import AsyncAnthropic
+from anthropic.types import Message
+
+logger = logging.getLogger(__name__)
+
+# How long the first queued request waits for others before the batch is sent
+BATCH_WINDOW_SECONDS = float(os.getenv("CLAUDE_BATCH_WINDOW_SECONDS", "5"))
+
+# Send immediately once this many requests are queued
+BATCH_MAX_REQUESTS = int(os.getenv("CLAUDE_BATCH_MAX_REQUESTS", "100"))
+
+# How often to check whether a submitted batch has finished
+BATCH_POLL_SECONDS = float(os.getenv("CLAUDE_BATCH_POLL_SECONDS", "10"))
+
+
+class BatchDispatcher:
+    """
+    Collects messages.create requests and submits them together.
+
+    Each caller awaits submit() and gets back its own Message once the batch
+    containing it has ended.
+    """
+
+    def __init__(
+        self,
+        client: AsyncAnthropic,
+        window_seconds: float = BATCH_WINDOW_SECONDS,
+        max_requests: int = BATCH_MAX_REQUESTS,
+        poll_seconds: float = BATCH_POLL_SECONDS,
+    ):
+        self._client = client
+        self._window_seconds = window_seconds
+        self._max_requests = max_requests
+        self._poll_seconds = poll_seconds
+        self._pending: list[tuple[str, dict[str, Any], asyncio.Future]] = []
+        self._flush_handle: Optional[asyncio.TimerHandle] = None
+        self._batches: set[asyncio.Task] = set()
+
+    async def submit(self, params: dict[str, Any]) -> Message:
+        """Queue one messages.create request (as keyword arguments) and await its result."""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((uuid.uuid4().hex, params, future))
+
+        if len(self._pending) >= self._max_requests:
+            self._flush()
+        elif self._flush_handle is None:
+            self._flush_handle = loop.call_later(self._window_seconds, self._flush)
+
+        return await future
+
+    def _flush(self) -> None:
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+
+        pending, self._pending = self._pending, []
+        if not pending:
+            return
+
+        task = asyncio.create_task(self._run_batch(pending))
+        self._batches.add(task)
+        task.add_done_callback(self._batches.discard)
+
+    async def _run_batch(self, pending: list[tuple[str, dict[str, Any], asyncio.Future]]) -> None:
+        futures = {custom_id: future for custom_id, _, future in pending}
+
+        try:
+            batch = await self._client.messages.batches.create(
+                requests=[
+                    {"custom_id": custom_id, "params": params}
+                    for custom_id, params, _ in pending
+                ]
+            )
+            logger.info(f"Submitted Claude batch {batch.id} with {len(pending)} requests")
+
+            while batch.processing_status != "ended":
+                await asyncio.sleep(self._poll_seconds)
+                batch = await self._client.messages.batches.retrieve(batch.id)
+
+            async for entry in await self._client.messages.batches.results(batch.id):
+                future = futures.pop(entry.custom_id, None)
+                if future is None or future.done():
+                    continue
+                if entry.result.type == "succeeded":
+                    future.set_result(entry.result.message)
+                else:
+                    future.set_exception(
+                        RuntimeError(f"Batch request {entry.result.type}")
+                    )
+
+        except Exception as e:
+            logger.error(f"Claude batch failed: {e}")
+            self._fail(futures.values(), e)
+            return
+
+        self._fail(futures.values(), RuntimeError("Request missing from batch results"))
+
+    @staticmethod
+    def _fail(futures, error: BaseException) -> None:
+        for future in futures:
+            if not future.done():
+                future.set_exception(error)
+
+    async def close(self) -> None:
+        """Fail queued requests and stop polling; called on app shutdown."""
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+
+        pending, self._pending = self._pending, []
+        self._fail((future for _, _, future in pending), RuntimeError("Dispatcher closed"))
+
+        for task in list(self._batches):
+            task.cancel()
+        await asyncio.gather(*self._batches, return_exceptions=True)
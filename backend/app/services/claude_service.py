@@ -1,24 +1,73 @@
 import os
-import json
+import asyncio
 import logging
 from typing import Any
-from anthropic import Anthropic
+
+import orjson
+from anthropic import Anthropic, AsyncAnthropic, DefaultAsyncHttpxClient
+from anthropic.types import Message
+from pydantic import ValidationError
+
+from app.cache import dumps, get_cached, redis_memoize, set_cached
+from app.schemas.matching import EligibilityResult, PatientProfile
+from app.services.batch_dispatcher import BatchDispatcher
 
 logger = logging.getLogger(__name__)
 
-# Initialize Anthropic client
+# Initialize Anthropic clients. The async client is used by the API's request
+# handlers and shares one connection pool; it is closed in the app lifespan.
+# It speaks HTTP/2, so concurrent eligibility requests are multiplexed over a
+# connection instead of each needing its own TCP+TLS handshake.
 client = Anthropic(api_key=os.getenv("ANTHROPIC_API_KEY"))
+async_client = AsyncAnthropic(
+    api_key=os.getenv("ANTHROPIC_API_KEY"),
+    http_client=DefaultAsyncHttpxClient(http2=True),
+)
 
-MODEL = "claude-sonnet-4-20250514"
+# Pools eligibility evaluations from concurrent requests into Message Batches
+batch_dispatcher = BatchDispatcher(async_client)
 
+# Maximum number of direct Claude eligibility requests in flight per worker,
+# shared across requests to stay within Anthropic's rate limits
+CLAUDE_CONCURRENCY = int(os.getenv("CLAUDE_CONCURRENCY", "8"))
+_claude_semaphore = asyncio.Semaphore(CLAUDE_CONCURRENCY)
 
-def parse_patient_description(description: str) -> dict[str, Any]:
-    """
-    Parse a natural language patient description into a structured profile.
+MODEL = "claude-sonnet-4-20250514"
 
-    Returns a dict matching the PatientProfile schema.
-    """
-    system_prompt = """You are a medical information extraction system specializing in NSCLC (non-small cell lung cancer) patient profiles.
+# Part of the cache key for parsed descriptions and eligibility results; bump
+# whenever a prompt or MODEL changes so cached results from the old prompt
+# are ignored.
+CLAUDE_PROMPT_VERSION = "2"
+
+# Eligibility depends only on the profile and the trial text, so a repeat
+# (profile, trial) pair reuses the earlier evaluation for a week
+ELIGIBILITY_CACHE_TTL = int(os.getenv("ELIGIBILITY_CACHE_TTL", str(7 * 86400)))
+
+# Fields filled in when Claude's reply omits them; merged with `defaults | reply`.
+# Patient profiles get their defaults from PatientProfile instead, so
+# PATIENT_PROFILE_DEFAULTS is only the fallback for unparseable replies.
+PATIENT_PROFILE_DEFAULTS = {
+    "cancer_type": "NSCLC",
+    "biomarkers": {},
+    "prior_treatments": [],
+}
+TRIAL_PROFILE_DEFAULTS = {
+    "target_biomarkers": {},
+    "target_stages": [],
+    "target_histology": [],
+    "target_locations": [],
+    "prior_treatments_excluded": [],
+}
+ELIGIBILITY_DEFAULTS = {
+    "status": "uncertain",
+    "confidence": 0.5,
+    "matching_criteria": [],
+    "excluding_criteria": [],
+    "explanation": "Unable to determine eligibility",
+}
+
+
+PATIENT_PARSE_SYSTEM_PROMPT = """You are a medical information extraction system specializing in NSCLC (non-small cell lung cancer) patient profiles.
 
 Extract structured information from patient descriptions. Only extract what is explicitly stated - do not infer or assume values.
 
@@ -43,60 +92,7 @@ Important guidelines:
 - ECOG 0 = fully active, ECOG 4 = completely disabled
 - Return null for any field not explicitly mentioned"""
 
-    user_message = f"""Extract the patient profile from this description:
-
-{description}
-
-Return only the JSON object, no other text."""
-
-    try:
-        response = client.messages.create(
-            model=MODEL,
-            max_tokens=1024,
-            system=system_prompt,
-            messages=[{"role": "user", "content": user_message}]
-        )
-
-        # Extract the text content
-        content = response.content[0].text.strip()
-
-        # Parse JSON - handle potential markdown code blocks
-        if content.startswith("```"):
-            # Remove markdown code block
-            lines = content.split("\n")
-            content = "\n".join(lines[1:-1] if lines[-1] == "```" else lines[1:])
-
-        result = json.loads(content)
-
-        # Ensure required fields have defaults
-        result.setdefault("cancer_type", "NSCLC")
-        result.setdefault("biomarkers", {})
-        result.setdefault("prior_treatments", [])
-
-        return result
-
-    except json.JSONDecodeError as e:
-        logger.error(f"Failed to parse Claude response as JSON: {e}")
-        logger.error(f"Raw response: {content}")
-        # Return minimal valid profile
-        return {
-            "cancer_type": "NSCLC",
-            "biomarkers": {},
-            "prior_treatments": [],
-            "parse_error": str(e)
-        }
-    except Exception as e:
-        logger.error(f"Claude API error: {e}")
-        raise
-
-
-def parse_trial_description(description: str) -> dict[str, Any]:
-    """
-    Parse a natural language clinical trial description into a structured profile.
-
-    Returns a dict matching the ResearcherTrialProfile schema.
-    """
-    system_prompt = """You are a clinical trial information extraction system specializing in NSCLC (non-small cell lung cancer) trials.
+TRIAL_PARSE_SYSTEM_PROMPT = """You are a clinical trial information extraction system specializing in NSCLC (non-small cell lung cancer) trials.
 
 Extract structured information from trial descriptions. Only extract what is explicitly stated - do not infer or assume values.
 
@@ -120,65 +116,154 @@ Important guidelines:
 - Return null for any field not explicitly mentioned
 - Be conservative - only extract information that is clearly stated"""
 
-    user_message = f"""Extract the trial profile from this description:
+
+def _cached_system(prompt: str) -> list[dict[str, Any]]:
+    """
+    System prompt as a prompt-caching breakpoint, so the static instructions
+    are reused server-side across calls and only the user turn is billed at
+    the full input rate. Anthropic only caches prefixes above a model-specific
+    minimum length (1024 tokens for Sonnet); shorter prompts are sent normally.
+    """
+    return [{"type": "text", "text": prompt, "cache_control": {"type": "ephemeral"}}]
+
+
+def _strip_code_fence(content: str) -> str:
+    """Remove a markdown code block around a JSON reply, if present."""
+    if content.startswith("```"):
+        # Drop the opening ```json line and the closing fence, without
+        # splitting the whole reply into lines
+        newline = content.find("\n")
+        content = content[newline + 1:] if newline != -1 else ""
+        content = content.removesuffix("```")
+    return content
+
+
+def _patient_parse_request(description: str) -> dict[str, Any]:
+    user_message = f"""Extract the patient profile from this description:
 
 {description}
 
 Return only the JSON object, no other text."""
 
+    return {
+        "model": MODEL,
+        "max_tokens": 1024,
+        "system": _cached_system(PATIENT_PARSE_SYSTEM_PROMPT),
+        "messages": [{"role": "user", "content": user_message}],
+    }
+
+
+def _patient_parse_result(content: str) -> dict[str, Any]:
+    # Validate here so a reply that isn't a valid profile becomes a
+    # parse_error (422) rather than failing later when the profile is built.
+    # The prompt asks for null on unmentioned fields; dropping those lets
+    # PatientProfile fill in its defaults (e.g. biomarkers={}).
     try:
-        response = client.messages.create(
-            model=MODEL,
-            max_tokens=1024,
-            system=system_prompt,
-            messages=[{"role": "user", "content": user_message}]
+        result = orjson.loads(_strip_code_fence(content))
+        profile = PatientProfile.model_validate(
+            {field: value for field, value in result.items() if value is not None}
         )
+    except (orjson.JSONDecodeError, AttributeError, ValidationError) as e:
+        logger.error(f"Failed to parse Claude response as a patient profile: {e}")
+        logger.error(f"Raw response: {content}")
+        # Return minimal valid profile
+        return {**PATIENT_PROFILE_DEFAULTS, "parse_error": str(e)}
 
-        content = response.content[0].text.strip()
+    return profile.model_dump()
 
-        # Parse JSON - handle potential markdown code blocks
-        if content.startswith("```"):
-            lines = content.split("\n")
-            content = "\n".join(lines[1:-1] if lines[-1] == "```" else lines[1:])
 
-        result = json.loads(content)
+def parse_patient_description(description: str) -> dict[str, Any]:
+    """
+    Parse a natural language patient description into a structured profile.
+
+    Returns a dict matching the PatientProfile schema.
+    """
+    try:
+        response = client.messages.create(**_patient_parse_request(description))
+    except Exception as e:
+        logger.error(f"Claude API error: {e}")
+        raise
 
-        # Ensure required fields have defaults
-        result.setdefault("target_biomarkers", {})
-        result.setdefault("target_stages", [])
-        result.setdefault("target_histology", [])
-        result.setdefault("target_locations", [])
-        result.setdefault("prior_treatments_excluded", [])
+    return _patient_parse_result(response.content[0].text.strip())
 
-        return result
 
-    except json.JSONDecodeError as e:
-        logger.error(f"Failed to parse Claude response as JSON: {e}")
-        logger.error(f"Raw response: {content}")
-        return {
-            "target_biomarkers": {},
-            "target_stages": [],
-            "target_histology": [],
-            "target_locations": [],
-            "prior_treatments_excluded": [],
-            "parse_error": str(e)
-        }
+@redis_memoize(
+    prefix="claude:parse_patient",
+    ttl=86400,
+    version=CLAUDE_PROMPT_VERSION,
+    cache_if=lambda result: "parse_error" not in result,
+)
+async def aparse_patient_description(description: str) -> dict[str, Any]:
+    """Async parse_patient_description, cached for repeat descriptions."""
+    try:
+        response = await async_client.messages.create(**_patient_parse_request(description))
     except Exception as e:
         logger.error(f"Claude API error: {e}")
         raise
 
+    return _patient_parse_result(response.content[0].text.strip())
 
-def evaluate_trial_eligibility(
-    profile: dict[str, Any],
-    eligibility_text: str,
-    trial_title: str
-) -> dict[str, Any]:
+
+def _trial_parse_request(description: str) -> dict[str, Any]:
+    user_message = f"""Extract the trial profile from this description:
+
+{description}
+
+Return only the JSON object, no other text."""
+
+    return {
+        "model": MODEL,
+        "max_tokens": 1024,
+        "system": _cached_system(TRIAL_PARSE_SYSTEM_PROMPT),
+        "messages": [{"role": "user", "content": user_message}],
+    }
+
+
+def _trial_parse_result(content: str) -> dict[str, Any]:
+    try:
+        result = orjson.loads(_strip_code_fence(content))
+    except orjson.JSONDecodeError as e:
+        logger.error(f"Failed to parse Claude response as JSON: {e}")
+        logger.error(f"Raw response: {content}")
+        return {**TRIAL_PROFILE_DEFAULTS, "parse_error": str(e)}
+
+    # Ensure required fields have defaults
+    return TRIAL_PROFILE_DEFAULTS | result
+
+
+def parse_trial_description(description: str) -> dict[str, Any]:
     """
-    Evaluate patient eligibility for a clinical trial.
+    Parse a natural language clinical trial description into a structured profile.
 
-    Returns a dict matching the EligibilityResult schema.
+    Returns a dict matching the ResearcherTrialProfile schema.
     """
-    system_prompt = """You are a clinical trial eligibility evaluator for NSCLC patients.
+    try:
+        response = client.messages.create(**_trial_parse_request(description))
+    except Exception as e:
+        logger.error(f"Claude API error: {e}")
+        raise
+
+    return _trial_parse_result(response.content[0].text.strip())
+
+
+@redis_memoize(
+    prefix="claude:parse_trial",
+    ttl=86400,
+    version=CLAUDE_PROMPT_VERSION,
+    cache_if=lambda result: "parse_error" not in result,
+)
+async def aparse_trial_description(description: str) -> dict[str, Any]:
+    """Async parse_trial_description, cached for repeat descriptions."""
+    try:
+        response = await async_client.messages.create(**_trial_parse_request(description))
+    except Exception as e:
+        logger.error(f"Claude API error: {e}")
+        raise
+
+    return _trial_parse_result(response.content[0].text.strip())
+
+
+ELIGIBILITY_SYSTEM_PROMPT = """You are a clinical trial eligibility evaluator for NSCLC patients.
 
 Given a patient profile and trial eligibility criteria, determine if the patient is likely eligible.
 
@@ -197,8 +282,17 @@ Guidelines:
 - If patient biomarkers match required biomarkers, that's a strong positive signal
 - Prior treatments may be inclusionary or exclusionary depending on the trial"""
 
+
+def _eligibility_request(
+    profile: dict[str, Any],
+    eligibility_text: str,
+    trial_title: str
+) -> dict[str, Any]:
+    # Compact JSON: indentation only adds input tokens. Sorted keys keep the
+    # request, and so its eligibility cache key, stable for equal profiles.
+    profile_json = orjson.dumps(profile, option=orjson.OPT_SORT_KEYS).decode()
     user_message = f"""Patient Profile:
-{json.dumps(profile, indent=2)}
+{profile_json}
 
 Trial: {trial_title}
 
@@ -207,54 +301,224 @@ Eligibility Criteria:
 
 Evaluate eligibility and return only the JSON object."""
 
+    return {
+        "model": MODEL,
+        "max_tokens": 1024,
+        "system": _cached_system(ELIGIBILITY_SYSTEM_PROMPT),
+        "messages": [{"role": "user", "content": user_message}],
+    }
+
+
+def _eligibility_error(e: Exception) -> dict[str, Any]:
+    return {
+        "status": "uncertain",
+        "confidence": 0.0,
+        "matching_criteria": [],
+        "excluding_criteria": [],
+        "explanation": f"Error evaluating eligibility: {e}"
+    }
+
+
+def _eligibility_result(content: str) -> dict[str, Any]:
     try:
-        response = client.messages.create(
-            model=MODEL,
-            max_tokens=1024,
-            system=system_prompt,
-            messages=[{"role": "user", "content": user_message}]
-        )
+        return _parse_eligibility(content)
+    except orjson.JSONDecodeError as e:
+        logger.error(f"Failed to parse eligibility response as JSON: {e}")
+        return _eligibility_error(e)
+    except ValidationError as e:
+        logger.error(f"Eligibility response is not a valid EligibilityResult: {e}")
+        return _eligibility_error(e)
+
+
+def _parse_eligibility(content: str) -> dict[str, Any]:
+    """EligibilityResult dict from Claude's reply; raises JSONDecodeError or ValidationError if it isn't one."""
+    return _normalize_eligibility(orjson.loads(_strip_code_fence(content)))
 
-        content = response.content[0].text.strip()
 
-        # Parse JSON - handle potential markdown code blocks
-        if content.startswith("```"):
-            lines = content.split("\n")
-            content = "\n".join(lines[1:-1] if lines[-1] == "```" else lines[1:])
+def _clamp01(x: Any) -> float:
+    """float(x) clamped to [0, 1], without the max/min call overhead."""
+    x = float(x)
+    return 0.0 if x < 0.0 else 1.0 if x > 1.0 else x
 
-        result = json.loads(content)
 
-        # Ensure required fields
-        result.setdefault("status", "uncertain")
-        result.setdefault("confidence", 0.5)
-        result.setdefault("matching_criteria", [])
-        result.setdefault("excluding_criteria", [])
-        result.setdefault("explanation", "Unable to determine eligibility")
+def _normalize_eligibility(result: dict[str, Any]) -> dict[str, Any]:
+    # Ensure required fields; nulls fall back to the defaults too
+    result = ELIGIBILITY_DEFAULTS | {field: value for field, value in result.items() if value is not None}
 
-        # Validate status value
-        if result["status"] not in ("eligible", "ineligible", "uncertain"):
-            result["status"] = "uncertain"
+    # Clamp confidence to valid range
+    result["confidence"] = _clamp01(result["confidence"])
 
-        # Clamp confidence to valid range
-        result["confidence"] = max(0.0, min(1.0, float(result["confidence"])))
+    # Status and field types are checked by EligibilityResult before anything
+    # is cached; a ValidationError is reported as an "uncertain" result by the
+    # callers' error handling
+    return EligibilityResult.model_validate(result).model_dump()
 
-        return result
 
-    except json.JSONDecodeError as e:
+def evaluate_trial_eligibility(
+    profile: dict[str, Any],
+    eligibility_text: str,
+    trial_title: str
+) -> dict[str, Any]:
+    """
+    Evaluate patient eligibility for a clinical trial.
+
+    Returns a dict matching the EligibilityResult schema.
+    """
+    try:
+        response = client.messages.create(
+            **_eligibility_request(profile, eligibility_text, trial_title)
+        )
+        return _eligibility_result(response.content[0].text.strip())
+    except Exception as e:
+        logger.error(f"Claude API error during eligibility evaluation: {e}")
+        return _eligibility_error(e)
+
+
+async def aevaluate_trial_eligibility(
+    profile: dict[str, Any],
+    eligibility_text: str,
+    trial_title: str,
+    use_batch: bool = False
+) -> dict[str, Any]:
+    """
+    Async evaluate_trial_eligibility. Never raises; errors become "uncertain".
+
+    With use_batch, the request goes through the Message Batches API: half
+    the cost, but the result can take minutes.
+    """
+    params = _eligibility_request(profile, eligibility_text, trial_title)
+    try:
+        return await _evaluate_eligibility(params, use_batch)
+    except orjson.JSONDecodeError as e:
         logger.error(f"Failed to parse eligibility response as JSON: {e}")
-        return {
-            "status": "uncertain",
-            "confidence": 0.0,
-            "matching_criteria": [],
-            "excluding_criteria": [],
-            "explanation": f"Error evaluating eligibility: {e}"
-        }
+        return _eligibility_error(e)
+    except ValidationError as e:
+        logger.error(f"Eligibility response is not a valid EligibilityResult: {e}")
+        return _eligibility_error(e)
     except Exception as e:
         logger.error(f"Claude API error during eligibility evaluation: {e}")
-        return {
-            "status": "uncertain",
-            "confidence": 0.0,
-            "matching_criteria": [],
-            "excluding_criteria": [],
-            "explanation": f"Error evaluating eligibility: {e}"
-        }
+        return _eligibility_error(e)
+
+
+# Keyed by the request itself (model, prompts, profile and trial text), not by
+# how it was sent; errors raise and so are never cached
+@redis_memoize(
+    prefix="claude:eligibility",
+    ttl=ELIGIBILITY_CACHE_TTL,
+    version=CLAUDE_PROMPT_VERSION,
+    key_args=lambda params, use_batch=False: params,
+)
+async def _evaluate_eligibility(params: dict[str, Any], use_batch: bool = False) -> dict[str, Any]:
+    response = await _send_eligibility_request(params, use_batch)
+    return _parse_eligibility(response.content[0].text.strip())
+
+
+async def _send_eligibility_request(params: dict[str, Any], use_batch: bool) -> Message:
+    if use_batch:
+        # Batched requests don't count against the per-minute rate limit
+        return await batch_dispatcher.submit(params)
+
+    # Only the API call holds a slot, so cache hits and the grouped
+    # request's one-by-one fallback are never queued behind it
+    async with _claude_semaphore:
+        return await async_client.messages.create(**params)
+
+
+# Trials per grouped eligibility request: the system prompt and patient
+# profile are sent once per group rather than once per trial
+ELIGIBILITY_GROUP_SIZE = int(os.getenv("ELIGIBILITY_GROUP_SIZE", "5"))
+
+ELIGIBILITY_GROUP_SYSTEM_PROMPT = ELIGIBILITY_SYSTEM_PROMPT + """
+
+You will be given several trials as a JSON array of objects with trial_id, title and criteria. Evaluate each trial independently and return a JSON array with one result object per trial, in the same order as the input."""
+
+
+def _eligibility_group_request(
+    profile: dict[str, Any],
+    trials: list[tuple[str, str]]
+) -> dict[str, Any]:
+    profile_json = orjson.dumps(profile, option=orjson.OPT_SORT_KEYS).decode()
+    trials_json = orjson.dumps([
+        {"trial_id": i, "title": trial_title, "criteria": eligibility_text}
+        for i, (trial_title, eligibility_text) in enumerate(trials, 1)
+    ]).decode()
+    user_message = f"""Patient Profile:
+{profile_json}
+
+Trials:
+{trials_json}
+
+Evaluate eligibility for each trial and return only the JSON array."""
+
+    return {
+        "model": MODEL,
+        "max_tokens": 1024 * len(trials),
+        "system": _cached_system(ELIGIBILITY_GROUP_SYSTEM_PROMPT),
+        "messages": [{"role": "user", "content": user_message}],
+    }
+
+
+async def _evaluate_eligibility_group(
+    profile: dict[str, Any],
+    trials: list[tuple[str, str]],
+    use_batch: bool = False
+) -> list[dict[str, Any]]:
+    response = await _send_eligibility_request(
+        _eligibility_group_request(profile, trials), use_batch
+    )
+
+    results = orjson.loads(_strip_code_fence(response.content[0].text.strip()))
+    if not isinstance(results, list) or len(results) != len(trials):
+        raise ValueError(f"Expected a JSON array of {len(trials)} eligibility results")
+    return [_normalize_eligibility(result) for result in results]
+
+
+async def aevaluate_trials_eligibility(
+    profile: dict[str, Any],
+    trials: list[tuple[str, str]],
+    use_batch: bool = False
+) -> list[dict[str, Any]]:
+    """
+    aevaluate_trial_eligibility for several (trial_title, eligibility_text)
+    pairs, sent to Claude as one request. Never raises.
+
+    Results are cached per trial under the same keys as the single-trial
+    path, so cached trials are not re-sent. If the grouped reply can't be
+    matched up with the trials, each one is evaluated on its own instead.
+    """
+    keys = [
+        _evaluate_eligibility.cache_key(
+            _eligibility_request(profile, eligibility_text, trial_title)
+        )
+        for trial_title, eligibility_text in trials
+    ]
+    cached = await asyncio.gather(*(get_cached(key) for key in keys))
+    results = [orjson.loads(value) if value is not None else None for value in cached]
+
+    missing = [i for i, result in enumerate(results) if result is None]
+    if not missing:
+        return results
+
+    evaluated = None
+    if len(missing) > 1:
+        try:
+            evaluated = await _evaluate_eligibility_group(
+                profile, [trials[i] for i in missing], use_batch
+            )
+        except Exception as e:
+            logger.warning(f"Grouped eligibility evaluation failed, evaluating trials one by one: {e}")
+        else:
+            await asyncio.gather(*(
+                set_cached(keys[i], dumps(result), ELIGIBILITY_CACHE_TTL)
+                for i, result in zip(missing, evaluated)
+            ))
+
+    if evaluated is None:
+        evaluated = await asyncio.gather(*(
+            aevaluate_trial_eligibility(profile, trials[i][1], trials[i][0], use_batch)
+            for i in missing
+        ))
+
+    for i, result in zip(missing, evaluated):
+        results[i] = result
+    return results
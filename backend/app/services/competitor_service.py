@@ -1,8 +1,10 @@
+import heapq
 import logging
-from typing import Optional
+from typing import NamedTuple, Optional
 from collections import Counter
-from sqlalchemy.orm import Session
-from sqlalchemy import func
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import Row, Text, cast, select, func
+from sqlalchemy.dialects.postgresql import ARRAY as PG_ARRAY, JSONB, JSONPATH, array
 
 from app.models import ClinicalTrial
 from app.schemas.competitor import (
@@ -28,6 +30,36 @@ WEIGHTS = {
 # Maximum competitors to return
 MAX_COMPETITORS = 50
 
+# Maximum candidate trials scored per analysis
+MAX_CANDIDATES = 1000
+
+
+# Columns needed to score every candidate and aggregate market insights.
+# Rows are selected as tuples rather than ClinicalTrial objects, and sites
+# are read from the derived location_states column, so neither the
+# free-text columns nor full location lists are loaded for the whole pool.
+SCORING_COLUMNS = (
+    ClinicalTrial.nct_id,
+    ClinicalTrial.phase,
+    ClinicalTrial.sponsor,
+    ClinicalTrial.biomarker_requirements,
+    ClinicalTrial.structured_eligibility,
+    ClinicalTrial.location_states,
+)
+
+# Display columns, fetched only for the competitors actually returned
+DISPLAY_COLUMNS = (
+    ClinicalTrial.nct_id,
+    ClinicalTrial.title,
+    ClinicalTrial.status,
+    ClinicalTrial.study_url,
+    ClinicalTrial.brief_summary,
+    # Only the first five sites are returned
+    func.jsonb_path_query_array(
+        ClinicalTrial.locations, cast("$[0 to 4]", JSONPATH), type_=JSONB
+    ).label("locations"),
+)
+
 # Phase ordering for proximity scoring
 PHASE_ORDER = {
     "Phase 1": 1,
@@ -39,9 +71,9 @@ PHASE_ORDER = {
 }
 
 
-def find_competitors(
+async def find_competitors(
     profile: ResearcherTrialProfile,
-    db: Session,
+    db: AsyncSession,
     max_results: int = MAX_COMPETITORS,
 ) -> tuple[list[CompetitorMatch], MarketInsights]:
     """
@@ -50,20 +82,37 @@ def find_competitors(
     Returns a tuple of (competitor matches, market insights).
     """
     # Query recruiting trials
-    query = db.query(ClinicalTrial).filter(
-        func.upper(ClinicalTrial.status).in_(["RECRUITING", "ACTIVE_NOT_RECRUITING", "ENROLLING_BY_INVITATION"])
-    )
+    query = select(*SCORING_COLUMNS).where(ClinicalTrial.is_active)
 
     # Exclude the researcher's own trial if NCT ID provided
     if profile.nct_id:
-        query = query.filter(ClinicalTrial.nct_id != profile.nct_id)
+        query = query.where(ClinicalTrial.nct_id != profile.nct_id)
+
+    # When there are more candidates than are scored, take the trials that
+    # share a target biomarker first, then those recruiting in a target
+    # state, rather than an arbitrary subset
+    if profile.target_biomarkers:
+        shares_biomarker = func.trial_biomarker_keys(
+            ClinicalTrial.biomarker_requirements,
+            ClinicalTrial.structured_eligibility,
+            type_=PG_ARRAY(Text),
+        ).overlap([b.upper() for b in profile.target_biomarkers])
+        query = query.order_by(shares_biomarker.desc().nulls_last())
+    if profile.target_locations:
+        shares_state = ClinicalTrial.location_states.has_any(
+            array(profile.target_locations, type_=Text)
+        )
+        query = query.order_by(shares_state.desc().nulls_last())
 
-    candidates = query.limit(1000).all()
+    result = await db.execute(query.limit(MAX_CANDIDATES))
+    candidates = result.all()
 
     # Score each candidate
+    profile_sets = _profile_feature_sets(profile)
     scored_competitors = []
     for trial in candidates:
-        scores = _score_trial_similarity(profile, trial)
+        trial_sets = _trial_feature_sets(trial)
+        scores = _score_trial_similarity(profile, trial, profile_sets, trial_sets)
 
         # Calculate weighted overall score
         overall_score = (
@@ -76,22 +125,11 @@ def find_competitors(
 
         # Only include trials with meaningful overlap
         if overall_score > 0.1:
-            # Extract location states from trial
-            trial_states = set()
-            if trial.locations:
-                for loc in trial.locations:
-                    if loc.get("state"):
-                        trial_states.add(loc["state"])
-
-            overlapping_locations = list(
-                set(profile.target_locations) & trial_states
-            ) if profile.target_locations else []
-
-            competitor = CompetitorMatch(
+            overlapping_locations = list(profile_sets.locations & trial_sets.states)
+
+            competitor = dict(
                 nct_id=trial.nct_id,
-                title=trial.title,
                 phase=trial.phase,
-                status=trial.status,
                 sponsor=trial.sponsor,
                 similarity_score=round(overall_score, 3),
                 biomarker_overlap=round(scores["biomarker"], 3),
@@ -102,15 +140,45 @@ def find_competitors(
                 overlapping_biomarkers=scores["overlapping_biomarkers"],
                 overlapping_stages=scores["overlapping_stages"],
                 overlapping_locations=overlapping_locations,
-                locations=trial.locations[:5] if trial.locations else [],
-                study_url=trial.study_url,
-                brief_summary=trial.brief_summary,
+                states=sorted(trial_sets.states),
             )
             scored_competitors.append(competitor)
 
-    # Sort by similarity score
-    scored_competitors.sort(key=lambda x: x.similarity_score, reverse=True)
-    top_competitors = scored_competitors[:max_results]
+    # Top matches by similarity score; only these need ordering
+    top = heapq.nlargest(max_results, scored_competitors, key=lambda x: x["similarity_score"])
+
+    # Second, small query for the display fields of the returned matches
+    display = {}
+    if top:
+        result = await db.execute(
+            select(*DISPLAY_COLUMNS).where(ClinicalTrial.nct_id.in_([c["nct_id"] for c in top]))
+        )
+        display = {row.nct_id: row for row in result.all()}
+
+    # Every field is computed here from database rows, so the returned
+    # matches are built with model_construct rather than revalidated
+    top_competitors = []
+    for c in top:
+        row = display[c["nct_id"]]
+        top_competitors.append(CompetitorMatch.model_construct(
+            nct_id=c["nct_id"],
+            title=row.title,
+            phase=c["phase"],
+            status=row.status,
+            sponsor=c["sponsor"],
+            similarity_score=c["similarity_score"],
+            biomarker_overlap=c["biomarker_overlap"],
+            stage_overlap=c["stage_overlap"],
+            geographic_overlap=c["geographic_overlap"],
+            phase_proximity=c["phase_proximity"],
+            eligibility_similarity=c["eligibility_similarity"],
+            overlapping_biomarkers=c["overlapping_biomarkers"],
+            overlapping_stages=c["overlapping_stages"],
+            overlapping_locations=c["overlapping_locations"],
+            locations=row.locations or [],
+            study_url=row.study_url,
+            brief_summary=row.brief_summary,
+        ))
 
     # Generate market insights
     insights = _generate_market_insights(scored_competitors, profile)
@@ -118,9 +186,57 @@ def find_competitors(
     return top_competitors, insights
 
 
+class _ProfileSets(NamedTuple):
+    """Set forms of a profile's targets, compared against every candidate trial."""
+    biomarkers: frozenset[str]
+    stages: frozenset[str]  # upper-cased
+    locations: frozenset[str]
+
+
+def _profile_feature_sets(profile: ResearcherTrialProfile) -> _ProfileSets:
+    """Build the profile's comparison sets once per analysis rather than per candidate."""
+    return _ProfileSets(
+        biomarkers=frozenset(profile.target_biomarkers),
+        stages=frozenset(s.upper() for s in profile.target_stages),
+        locations=frozenset(profile.target_locations),
+    )
+
+
+class _TrialSets(NamedTuple):
+    """Set forms of a candidate trial's JSON columns, extracted once per candidate."""
+    biomarkers: frozenset[str]
+    stages: frozenset[str]  # upper-cased
+    states: frozenset[str]
+
+
+def _trial_feature_sets(trial: Row) -> _TrialSets:
+    """Biomarkers, allowed stages and location states of a candidate row."""
+    biomarkers = set()
+    if trial.biomarker_requirements:
+        biomarkers.update(trial.biomarker_requirements.keys())
+
+    stages = set()
+    if trial.structured_eligibility:
+        bio_req = trial.structured_eligibility.get("biomarkers", {}) or {}
+        required_positive = bio_req.get("required_positive")
+        if required_positive:
+            biomarkers.update(required_positive.keys())
+
+        stage_req = trial.structured_eligibility.get("disease_stage", {}) or {}
+        allowed_stages = stage_req.get("allowed")
+        if allowed_stages:
+            stages.update(s.upper() for s in allowed_stages)
+
+    states = frozenset(state for state in trial.location_states or () if state)
+
+    return _TrialSets(frozenset(biomarkers), frozenset(stages), states)
+
+
 def _score_trial_similarity(
     profile: ResearcherTrialProfile,
-    trial: ClinicalTrial,
+    trial: Row,
+    profile_sets: _ProfileSets,
+    trial_sets: _TrialSets,
 ) -> dict:
     """
     Score how similar a trial is to the researcher's profile.
@@ -138,18 +254,8 @@ def _score_trial_similarity(
     }
 
     # 1. Biomarker overlap (Jaccard similarity)
-    profile_biomarkers = set(profile.target_biomarkers.keys())
-    trial_biomarkers = set()
-
-    # Extract biomarkers from trial
-    if trial.biomarker_requirements:
-        trial_biomarkers.update(trial.biomarker_requirements.keys())
-
-    if trial.structured_eligibility:
-        bio_req = trial.structured_eligibility.get("biomarkers", {}) or {}
-        required_positive = bio_req.get("required_positive")
-        if required_positive:
-            trial_biomarkers.update(required_positive.keys())
+    profile_biomarkers = profile_sets.biomarkers
+    trial_biomarkers = trial_sets.biomarkers
 
     if profile_biomarkers or trial_biomarkers:
         overlap = profile_biomarkers & trial_biomarkers
@@ -159,14 +265,8 @@ def _score_trial_similarity(
             scores["overlapping_biomarkers"] = list(overlap)
 
     # 2. Stage overlap
-    profile_stages = set(s.upper() for s in profile.target_stages)
-    trial_stages = set()
-
-    if trial.structured_eligibility:
-        stage_req = trial.structured_eligibility.get("disease_stage", {}) or {}
-        allowed_stages = stage_req.get("allowed")
-        if allowed_stages:
-            trial_stages.update(s.upper() for s in allowed_stages)
+    profile_stages = profile_sets.stages
+    trial_stages = trial_sets.stages
 
     if profile_stages or trial_stages:
         overlap = profile_stages & trial_stages
@@ -176,13 +276,8 @@ def _score_trial_similarity(
             scores["overlapping_stages"] = list(overlap)
 
     # 3. Geographic overlap
-    profile_locations = set(profile.target_locations)
-    trial_locations = set()
-
-    if trial.locations:
-        for loc in trial.locations:
-            if loc.get("state"):
-                trial_locations.add(loc["state"])
+    profile_locations = profile_sets.locations
+    trial_locations = trial_sets.states
 
     if profile_locations or trial_locations:
         overlap = profile_locations & trial_locations
@@ -255,14 +350,14 @@ def _score_trial_similarity(
 
 
 def _generate_market_insights(
-    competitors: list[CompetitorMatch],
+    competitors: list[dict],
     profile: ResearcherTrialProfile,
 ) -> MarketInsights:
     """
     Generate aggregated market intelligence from competitor data.
     """
     if not competitors:
-        return MarketInsights(
+        return MarketInsights.model_construct(
             total_competing_trials=0,
             top_sponsors=[],
             geographic_hotspots=[],
@@ -271,44 +366,40 @@ def _generate_market_insights(
             avg_similarity_score=0.0,
         )
 
-    # Count sponsors
-    sponsor_counts = Counter(c.sponsor for c in competitors if c.sponsor)
-    top_sponsors = [
-        SponsorCount(name=name, count=count)
-        for name, count in sponsor_counts.most_common(10)
-    ]
-
-    # Geographic distribution
+    # Sponsors, states with a site (counted once per trial), phases, shared
+    # biomarkers and the score total, in one pass over the competitors
+    sponsor_counts = Counter()
     state_counts = Counter()
+    phase_counts = Counter()
+    biomarker_counts = Counter()
+    total_score = 0.0
     for c in competitors:
-        for loc in c.locations:
-            if loc.get("state"):
-                state_counts[loc["state"]] += 1
+        if c["sponsor"]:
+            sponsor_counts[c["sponsor"]] += 1
+        if c["phase"]:
+            phase_counts[c["phase"]] += 1
+        state_counts.update(c["states"])
+        biomarker_counts.update(c["overlapping_biomarkers"])
+        total_score += c["similarity_score"]
 
+    top_sponsors = [
+        SponsorCount.model_construct(name=name, count=count)
+        for name, count in sponsor_counts.most_common(10)
+    ]
     geographic_hotspots = [
-        GeographicHotspot(state=state, count=count)
+        GeographicHotspot.model_construct(state=state, count=count)
         for state, count in state_counts.most_common(10)
     ]
-
-    # Phase distribution
-    phase_counts = Counter(c.phase for c in competitors if c.phase)
     phase_distribution = dict(phase_counts)
-
-    # Common biomarkers among competitors
-    biomarker_counts = Counter()
-    for c in competitors:
-        for biomarker in c.overlapping_biomarkers:
-            biomarker_counts[biomarker] += 1
-
     common_biomarkers = [
-        BiomarkerCount(biomarker=biomarker, count=count)
+        BiomarkerCount.model_construct(biomarker=biomarker, count=count)
         for biomarker, count in biomarker_counts.most_common(10)
     ]
 
     # Average similarity score
-    avg_score = sum(c.similarity_score for c in competitors) / len(competitors)
+    avg_score = total_score / len(competitors)
 
-    return MarketInsights(
+    return MarketInsights.model_construct(
         total_competing_trials=len(competitors),
         top_sponsors=top_sponsors,
         geographic_hotspots=geographic_hotspots,
@@ -318,14 +409,24 @@ def _generate_market_insights(
     )
 
 
-def get_trial_as_profile(
+async def get_trial_as_profile(
     nct_id: str,
-    db: Session,
+    db: AsyncSession,
 ) -> Optional[ResearcherTrialProfile]:
     """
     Load an existing trial and convert it to a ResearcherTrialProfile.
     """
-    trial = db.query(ClinicalTrial).filter(ClinicalTrial.nct_id == nct_id).first()
+    result = await db.execute(
+        select(
+            ClinicalTrial.nct_id,
+            ClinicalTrial.title,
+            ClinicalTrial.phase,
+            ClinicalTrial.biomarker_requirements,
+            ClinicalTrial.structured_eligibility,
+            ClinicalTrial.location_states,
+        ).where(ClinicalTrial.nct_id == nct_id)
+    )
+    trial = result.first()
 
     if not trial:
         return None
@@ -348,15 +449,8 @@ def get_trial_as_profile(
         hist_req = trial.structured_eligibility.get("histology", {}) or {}
         histology = hist_req.get("allowed", []) or []
 
-    # Extract locations (states)
-    locations = []
-    if trial.locations:
-        seen_states = set()
-        for loc in trial.locations:
-            state = loc.get("state")
-            if state and state not in seen_states:
-                locations.append(state)
-                seen_states.add(state)
+    # Extract locations (distinct states, in site order)
+    locations = list(dict.fromkeys(state for state in trial.location_states or () if state))
 
     # Extract eligibility criteria
     age_range = None
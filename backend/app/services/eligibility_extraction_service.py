@@ -6,47 +6,54 @@ eligibility requirements using Claude AI.
 """
 
 import os
-import json
+import re
+import asyncio
+import hashlib
 import logging
-from typing import Any, Optional
-from anthropic import Anthropic
+from typing import Any, Awaitable, Callable, Iterable, Optional
+from anthropic import Anthropic, AsyncAnthropic, DefaultAsyncHttpxClient
+from anthropic.types import Message
+from sqlalchemy import select
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.exc import SQLAlchemyError
+
+from app.database import AsyncSessionLocal, SessionLocal
+from app.models import EligibilityExtraction
+from app.schemas.eligibility import StructuredEligibility
+from app.services.batch_dispatcher import BatchDispatcher
 
 logger = logging.getLogger(__name__)
 
-# Initialize Anthropic client
+# Initialize Anthropic clients. The async one serves the concurrent and
+# batched extraction paths; it speaks HTTP/2, so concurrent extractions are
+# multiplexed over one kept-alive connection instead of each paying for a
+# TCP+TLS handshake.
 client = Anthropic(api_key=os.getenv("ANTHROPIC_API_KEY"))
+async_client = AsyncAnthropic(
+    api_key=os.getenv("ANTHROPIC_API_KEY"),
+    http_client=DefaultAsyncHttpxClient(http2=True),
+)
 
-# Use Claude Sonnet for cost-effective batch processing
+# Extractions go to Claude Haiku first, primed with a few worked examples;
+# Sonnet re-extracts only the ones Haiku is unsure about
 MODEL = "claude-sonnet-4-20250514"
+MODEL_FAST = os.getenv("EXTRACTION_MODEL_FAST", "claude-haiku-4-5-20251001")
 
-# Current extraction version - increment when changing the extraction logic
-EXTRACTION_VERSION = "2.0.0"
-
-
-def extract_eligibility(
-    eligibility_text: str,
-    trial_title: Optional[str] = None
-) -> dict[str, Any]:
-    """
-    Extract structured eligibility criteria from free text.
+# Haiku extractions below this confidence are redone with MODEL
+ESCALATION_CONFIDENCE = float(os.getenv("EXTRACTION_ESCALATION_CONFIDENCE", "0.6"))
 
-    Uses Claude to parse eligibility criteria into a structured format
-    matching the StructuredEligibility schema.
+# Current extraction version - increment when changing the extraction logic
+EXTRACTION_VERSION = "2.1.0"
 
-    Args:
-        eligibility_text: Raw eligibility criteria text from clinical trial
-        trial_title: Optional trial title for context
+# Extraction requests kept in flight by aextract_eligibility_many
+EXTRACTION_CONCURRENCY = int(os.getenv("EXTRACTION_CONCURRENCY", "20"))
 
-    Returns:
-        Dictionary matching StructuredEligibility schema
-    """
-    if not eligibility_text or len(eligibility_text.strip()) < 20:
-        logger.warning("Eligibility text too short for extraction")
-        return _empty_eligibility(notes=["Eligibility text too short for extraction"])
+# Requests per Message Batch in aextract_eligibility_batch
+EXTRACTION_BATCH_MAX_REQUESTS = int(os.getenv("EXTRACTION_BATCH_MAX_REQUESTS", "10000"))
 
-    system_prompt = """You are a clinical trial eligibility extraction system specializing in NSCLC (non-small cell lung cancer) trials.
+EXTRACTION_SYSTEM_PROMPT = """You are a clinical trial eligibility extraction system specializing in NSCLC (non-small cell lung cancer) trials.
 
-Extract structured eligibility criteria from the provided text. Return a JSON object with these fields:
+Extract structured eligibility criteria from the provided text and record them with the extract_eligibility tool, using these fields:
 
 {
   "age": {"min": number or null, "max": number or null},
@@ -112,54 +119,609 @@ Guidelines:
 - For organ function: look for mentions of "adequate renal/hepatic function", creatinine clearance, AST/ALT limits, bilirubin
 - For prior malignancy: look for "no prior malignancy", "history of other cancer", years specified for exclusion window
 - Set extraction_confidence based on how clear the criteria are (0.9+ for clear, 0.5-0.8 for ambiguous)
-- Add notes for anything ambiguous or unclear
+- Add notes for anything ambiguous or unclear"""
+
+# Claude is made to answer through this tool, so the extraction arrives as
+# the tool call's already-parsed input rather than as JSON text
+EXTRACTION_TOOL = {
+    "name": "extract_eligibility",
+    "description": "Record the structured eligibility criteria extracted from a clinical trial.",
+    # The OpenAPI example is documentation only; leave it out of the prompt
+    "input_schema": {
+        key: value
+        for key, value in StructuredEligibility.model_json_schema().items()
+        if key != "example"
+    },
+}
+
+
+# Worked examples for MODEL_FAST, covering a specific EGFR mutation, a fusion
+# and a PD-L1 threshold. They sit in the cached system prompt rather than in
+# the messages, so every request reuses them from the prompt cache.
+EXTRACTION_EXAMPLES = """
+
+Examples (criteria, then the fields to record; omitted fields are null or empty):
+
+Criteria:
+- Age >= 18 years
+- Stage IIIB-IV non-squamous NSCLC with EGFR exon 19 deletion or L858R
+- Progression on osimertinib; no more than 2 prior lines
+- ECOG 0-1; stable, treated brain metastases allowed
+Fields: {"age": {"min": 18}, "ecog": {"min": 0, "max": 1}, "disease_stage": {"allowed": ["IIIB", "IIIC", "IV"]}, "histology": {"allowed": ["non-squamous"]}, "biomarkers": {"required_positive": {"EGFR": ["exon 19 deletion", "L858R"]}}, "prior_treatments": {"required": ["osimertinib"], "max_lines": 2}, "brain_metastases": {"allowed": true, "controlled_only": true, "untreated_allowed": false}, "extraction_confidence": 0.9}
+
+Criteria:
+- Locally advanced or metastatic NSCLC with ALK rearrangement (FISH, IHC or NGS)
+- No prior ALK inhibitor
+- Exclusion: pregnancy; other malignancy within 3 years except non-melanoma skin cancer
+Fields: {"disease_stage": {"allowed": ["III", "IV", "metastatic"]}, "biomarkers": {"required_positive": {"ALK": ["rearrangement"]}}, "prior_treatments": {"excluded": ["ALK inhibitor"], "treatment_naive_required": false}, "prior_malignancy": {"excluded": true, "years_lookback": 3, "exceptions": ["non-melanoma skin cancer"]}, "common_exclusions": ["pregnancy"], "extraction_confidence": 0.85}
 
-Return ONLY valid JSON, no other text."""
+Criteria:
+- Previously untreated stage IV NSCLC, PD-L1 TPS >= 50%
+- No EGFR, ALK or ROS1 alterations
+- At least 4 weeks since radiotherapy; adequate renal and hepatic function
+Fields: {"disease_stage": {"allowed": ["IV"]}, "biomarkers": {"required_negative": ["EGFR", "ALK", "ROS1"], "pdl1_expression": {"min_tps": 50, "level": "high"}}, "prior_treatments": {"treatment_naive_required": true}, "washout": {"min_days_since_radiation": 28}, "organ_function": {"renal_exclusion": true, "hepatic_exclusion": true}, "extraction_confidence": 0.9}"""
 
+
+def _extraction_request(
+    eligibility_text: str,
+    trial_title: Optional[str],
+    model: str = MODEL_FAST,
+) -> dict[str, Any]:
     user_message = f"""Extract structured eligibility from this clinical trial:
 
 {f'Trial: {trial_title}' if trial_title else ''}
 
 Eligibility Criteria:
-{eligibility_text}
+{eligibility_text}"""
+
+    system_prompt = EXTRACTION_SYSTEM_PROMPT
+    if model == MODEL_FAST:
+        system_prompt += EXTRACTION_EXAMPLES
+
+    return {
+        "model": model,
+        "max_tokens": 2048,
+        # Prompt-cache the static instructions; only the criteria vary per call
+        "system": [{"type": "text", "text": system_prompt, "cache_control": {"type": "ephemeral"}}],
+        "tools": [EXTRACTION_TOOL],
+        "tool_choice": {"type": "tool", "name": EXTRACTION_TOOL["name"]},
+        "messages": [{"role": "user", "content": user_message}],
+    }
+
+
+def _too_short(eligibility_text: str) -> bool:
+    return not eligibility_text or len(eligibility_text.strip()) < 20
+
+
+def _too_short_result() -> dict[str, Any]:
+    logger.warning("Eligibility text too short for extraction")
+    return _empty_eligibility(notes=["Eligibility text too short for extraction"])
+
+
+def parse_extraction(response: Message) -> dict[str, Any]:
+    """
+    Validated StructuredEligibility dict from an extraction response, the
+    form stored in structured_eligibility and the extraction cache.
+    """
+    tool_input = next((block.input for block in response.content if block.type == "tool_use"), None)
+    if tool_input is None:
+        raise ValueError(f"No {EXTRACTION_TOOL['name']} tool call in response (stop_reason={response.stop_reason})")
+
+    # Validate and fill in defaults. The prompt asks for null on fields that
+    # are not mentioned; dropping those lets the schema defaults apply.
+    return StructuredEligibility.model_validate(_drop_nulls(tool_input)).model_dump()
+
+
+def _needs_escalation(result: Optional[dict[str, Any]], error: Optional[Exception]) -> bool:
+    """Whether a MODEL_FAST extraction should be redone with MODEL; logs the decision."""
+    if error is not None:
+        logger.info(f"Escalating eligibility extraction to {MODEL}: {MODEL_FAST} failed ({error})")
+        return True
+    confidence = result["extraction_confidence"]
+    if confidence < ESCALATION_CONFIDENCE:
+        logger.info(f"Escalating eligibility extraction to {MODEL}: {MODEL_FAST} confidence {confidence:.2f}")
+        return True
+    logger.debug(f"Eligibility extraction kept from {MODEL_FAST}: confidence {confidence:.2f}")
+    return False
+
+
+def _failed_extraction(e: Exception) -> dict[str, Any]:
+    logger.error(f"Claude API error during eligibility extraction: {e}")
+    return _empty_eligibility(
+        confidence=0.0,
+        notes=[f"Extraction error: {str(e)}"]
+    )
+
+
+# Persistent cache
+#
+# Claude extractions are stored in eligibility_extractions by the SHA-256 of
+# the criteria text and EXTRACTION_VERSION, so re-ingesting or reprocessing
+# unchanged criteria costs no API call, and bumping the version invalidates
+# every entry. A database error only means a miss.
+
+def extraction_text_hash(eligibility_text: str) -> str:
+    """Key of an eligibility text in the eligibility_extractions table."""
+    return hashlib.sha256(eligibility_text.encode()).hexdigest()
+
+
+def _lookup_statement(text_hashes: Iterable[str]):
+    return select(EligibilityExtraction.text_hash, EligibilityExtraction.result).where(
+        EligibilityExtraction.text_hash.in_(list(text_hashes)),
+        EligibilityExtraction.version == EXTRACTION_VERSION,
+    )
+
+
+def _store_statement(results: dict[str, dict[str, Any]]):
+    return pg_insert(EligibilityExtraction).values([
+        {"text_hash": text_hash, "version": EXTRACTION_VERSION, "result": result}
+        for text_hash, result in results.items()
+    ]).on_conflict_do_nothing()
+
+
+def load_cached_extractions(text_hashes: Iterable[str]) -> dict[str, dict[str, Any]]:
+    """Stored extractions for the current version, by text hash."""
+    text_hashes = set(text_hashes)
+    if not text_hashes:
+        return {}
+    try:
+        with SessionLocal() as db:
+            return {row.text_hash: row.result for row in db.execute(_lookup_statement(text_hashes))}
+    except (SQLAlchemyError, OSError) as e:
+        logger.warning(f"Eligibility extraction cache read failed: {e}")
+        return {}
+
+
+def store_extractions(results: dict[str, dict[str, Any]]) -> None:
+    """Store Claude extractions for the current version, by text hash."""
+    if not results:
+        return
+    try:
+        with SessionLocal() as db:
+            db.execute(_store_statement(results))
+            db.commit()
+    except (SQLAlchemyError, OSError) as e:
+        logger.warning(f"Eligibility extraction cache write failed: {e}")
+
+
+async def _aload_cached_extractions(text_hashes: Iterable[str]) -> dict[str, dict[str, Any]]:
+    text_hashes = set(text_hashes)
+    if not text_hashes:
+        return {}
+    try:
+        async with AsyncSessionLocal() as db:
+            result = await db.execute(_lookup_statement(text_hashes))
+            return {row.text_hash: row.result for row in result}
+    except (SQLAlchemyError, OSError) as e:
+        logger.warning(f"Eligibility extraction cache read failed: {e}")
+        return {}
+
+
+async def _astore_extractions(results: dict[str, dict[str, Any]]) -> None:
+    if not results:
+        return
+    try:
+        async with AsyncSessionLocal() as db:
+            await db.execute(_store_statement(results))
+            await db.commit()
+    except (SQLAlchemyError, OSError) as e:
+        logger.warning(f"Eligibility extraction cache write failed: {e}")
+
+
+# Deterministic fast path
+#
+# Short, formulaic criteria ("Age >= 18 years", "ECOG 0-1", "Stage IV NSCLC")
+# are extracted with regular expressions instead of a Claude call. Each
+# criterion line counts as understood when a pattern extracts something from
+# it; the share of understood lines is the extraction confidence.
+
+# Minimum share of understood criterion lines to skip the Claude call
+FAST_PATH_MIN_CONFIDENCE = float(os.getenv("EXTRACTION_FAST_PATH_MIN_CONFIDENCE", "0.85"))
+
+# Longer lines usually carry conditions the patterns cannot represent
+_FAST_PATH_MAX_LINE_WORDS = 15
+
+_BULLET = re.compile(r"^\s*(?:[-*\u2022\u00b7]|\d{1,2}[.)])\s*")
+_INCLUSION_HEADING = re.compile(r"^\s*inclusion\s+criteria\s*:?\s*$", re.I)
+_EXCLUSION_HEADING = re.compile(r"^\s*exclusion\s+criteria\s*:?\s*$", re.I)
+
+_AGE_RANGE = re.compile(r"\baged?\s*(?:between\s*)?(\d{1,2})\s*(?:-|\u2013|to|and)\s*(\d{2,3})\b", re.I)
+_AGE_MIN = re.compile(
+    r"\baged?\s*(?:\u2265|>=|>|of at least|at least|over)?\s*(\d{1,2})\b"
+    r"|(?:\u2265|>=|at least)\s*(\d{1,2})\s*years",
+    re.I,
+)
+_AGE_MAX = re.compile(r"(?:\u2264|<=|under|younger than|no older than)\s*(\d{2,3})\s*years", re.I)
+# "at least 5 years" is a duration unless the line is about age
+_AGE_WORD = re.compile(r"\b(?:aged?|years? old)\b", re.I)
+# Words an age criterion may carry besides the limits themselves; anything
+# else left on the line is content the age patterns do not capture
+_AGE_LINE_FILLER = re.compile(
+    r"\b(?:patients?|participants?|subjects?|adults?|men|women|males?|females?|must|be|is|are"
+    r"|aged?|years?|old|older|of|or|and|at|least|over|under|between|to|than|younger|equal|greater"
+    r"|less|the|time|informed|consent|signing|screening|enrollment)\b|[^a-z]+",
+    re.I,
+)
+_ECOG = re.compile(
+    r"\bECOG\b(?:\s*(?:performance\s+status|PS))?\s*(?:score\s*)?(?:of\s*)?"
+    r"(?:(\d)\s*(?:-|\u2013|to|or)\s*(\d)|(\u2264|<=|<)\s*(\d)|(\d)\b)",
+    re.I,
+)
+_STAGE_TOKEN = r"(?:IV|I{1,3})[ABC]?"
+_STAGE = re.compile(
+    rf"(?i:\bstages?)\s+({_STAGE_TOKEN}(?:\s*(?:,|/|or|and|-|\u2013|to)\s*{_STAGE_TOKEN})*)\b"
+)
+_METASTATIC = re.compile(r"\bmetastatic\b", re.I)
+_NSCLC = re.compile(r"\b(?:NSCLC|non[- ]small[- ]cell lung (?:cancer|carcinoma))\b", re.I)
+_HISTOLOGY = re.compile(r"\b(non-squamous|nonsquamous|squamous|adenocarcinoma|large cell)\b", re.I)
+_BIOMARKER = re.compile(r"\b(EGFR|ALK|ROS1|BRAF|KRAS|MET|RET|NTRK|HER2)\b")
+# A negation counts only next to the biomarker it applies to
+_BIOMARKER_NEGATED = re.compile(
+    r"\b(EGFR|ALK|ROS1|BRAF|KRAS|MET|RET|NTRK|HER2)[- ](?i:wild[- ]type|negative)\b"
+    r"|\b(?i:wild[- ]type|without(?: an?)?)\s+(EGFR|ALK|ROS1|BRAF|KRAS|MET|RET|NTRK|HER2)\b"
+)
+_NEGATION = re.compile(r"\b(?:wild[- ]type|negative|without|no|not)\b", re.I)
+_HISTOLOGY_EXCEPT = re.compile(r"\b(?:excluding|exclude[sd]?|other than|except)\b", re.I)
+_MUTATION = re.compile(
+    r"\b(L858R|T790M|G12C|V600E|exon 19 deletion|exon 20 insertion|exon 14 skipping)\b", re.I
+)
+_PDL1 = re.compile(r"\bPD-?L1\b[^\d\n]{0,20}(?:\u2265|>=)\s*(\d{1,3})\s*%", re.I)
+_COMMON_EXCLUSIONS = {
+    "pregnancy": re.compile(r"\bpregnan|\bbreast-?feeding|\blactat", re.I),
+    "active infection": re.compile(r"\bactive (?:\w+ )?infection", re.I),
+    "autoimmune disease": re.compile(r"\bautoimmune disease", re.I),
+    "uncontrolled hypertension": re.compile(r"\buncontrolled hypertension", re.I),
+    "HIV": re.compile(r"\bHIV\b"),
+    "hepatitis B or C": re.compile(r"\bhepatitis\b", re.I),
+}
+
+# Stages in order, for filling in ranges such as IIIB-IV
+_STAGE_ORDER = ["I", "IA", "IB", "II", "IIA", "IIB", "III", "IIIA", "IIIB", "IIIC", "IV"]
+
+
+def _stages(enumeration: str) -> Optional[list[str]]:
+    """
+    Stage tokens in an enumeration, with ranges (e.g. IIIB-IV) filled in over
+    _STAGE_ORDER; None when a range endpoint is not in it.
+    """
+    tokens = re.findall(rf"{_STAGE_TOKEN}|-|\u2013|to", enumeration)
+    stages = []
+    for i, token in enumerate(tokens):
+        if token in ("-", "\u2013", "to"):
+            if 0 < i < len(tokens) - 1:
+                low, high = tokens[i - 1], tokens[i + 1]
+                if low not in _STAGE_ORDER or high not in _STAGE_ORDER:
+                    return None
+                between = _STAGE_ORDER[_STAGE_ORDER.index(low) + 1:_STAGE_ORDER.index(high)]
+                stages.extend(stage for stage in between if stage not in stages)
+        elif token not in stages:
+            stages.append(token)
+    return stages
+
+
+def _extract_inclusion_line(line: str, result: dict[str, Any], fields: set[str]) -> bool:
+    understood = False
+
+    age_matches = []
+    if _AGE_WORD.search(line):
+        if match := _AGE_RANGE.search(line):
+            result["age"] = {"min": int(match[1]), "max": int(match[2])}
+            age_matches.append(match)
+        else:
+            if match := _AGE_MIN.search(line):
+                result["age"]["min"] = int(match[1] or match[2])
+                age_matches.append(match)
+            if match := _AGE_MAX.search(line):
+                result["age"]["max"] = int(match[1])
+                age_matches.append(match)
+    if age_matches:
+        fields.add("age")
+        # The line is understood through its age limits only if nothing else
+        # is on it; other content is left for the remaining patterns
+        rest = line
+        for match in age_matches:
+            rest = rest.replace(match[0], " ")
+        if not _AGE_LINE_FILLER.sub("", rest):
+            understood = True
+
+    if match := _ECOG.search(line):
+        if match[1] is not None:
+            low, high = int(match[1]), int(match[2])
+        elif match[3] is not None:
+            low, high = 0, int(match[4]) - (match[3] == "<")
+        else:
+            low = high = int(match[5])
+        result["ecog"] = {"min": max(0, min(4, low)), "max": max(0, min(4, high))}
+        fields.add("ecog")
+        understood = True
+
+    for match in _STAGE.finditer(line):
+        stages = _stages(match[1])
+        if stages is None:
+            return False
+        for stage in stages:
+            if stage not in result["disease_stage"]["allowed"]:
+                result["disease_stage"]["allowed"].append(stage)
+        fields.add("disease_stage")
+        understood = True
+    if _METASTATIC.search(line):
+        if "metastatic" not in result["disease_stage"]["allowed"]:
+            result["disease_stage"]["allowed"].append("metastatic")
+        fields.add("disease_stage")
+        understood = True
+
+    histologies = _HISTOLOGY.findall(line)
+    if histologies and (_NEGATION.search(line) or _HISTOLOGY_EXCEPT.search(line)):
+        # "excluding squamous", "no adenocarcinoma": which histologies are
+        # allowed is left to Claude
+        return False
+    for histology in histologies:
+        histology = histology.lower()
+        if histology not in result["histology"]["allowed"]:
+            result["histology"]["allowed"].append(histology)
+        fields.add("histology")
+        understood = True
+    if _NSCLC.search(line):
+        understood = True
+
+    if match := _PDL1.search(line):
+        min_tps = int(match[1])
+        result["biomarkers"]["pdl1_expression"] = {
+            "min_tps": min_tps,
+            "max_tps": 100,
+            "level": "high" if min_tps >= 50 else "any",
+        }
+        fields.add("biomarkers")
+        understood = True
+
+    biomarkers = _BIOMARKER.findall(line)
+    if biomarkers:
+        negated = {m[1] or m[2] for m in _BIOMARKER_NEGATED.finditer(line)}
+        if negated:
+            if negated != set(biomarkers):
+                # Negative and positive biomarkers on one line
+                return False
+            for biomarker in biomarkers:
+                if biomarker not in result["biomarkers"]["required_negative"]:
+                    result["biomarkers"]["required_negative"].append(biomarker)
+        elif _NEGATION.search(line):
+            # A negation that is not attached to a biomarker, e.g. "EGFR-mutant
+            # NSCLC without brain metastases", may or may not apply to it
+            return False
+        elif len(biomarkers) == 1:
+            mutations = [m.lower() for m in _MUTATION.findall(line)]
+            result["biomarkers"]["required_positive"][biomarkers[0]] = mutations or ["positive"]
+        else:
+            # "EGFR or ALK" alternatives cannot be expressed as requirements
+            return False
+        fields.add("biomarkers")
+        understood = True
+
+    return understood
+
+
+def _extract_exclusion_line(line: str, result: dict[str, Any], fields: set[str]) -> bool:
+    understood = False
+    for exclusion, pattern in _COMMON_EXCLUSIONS.items():
+        if pattern.search(line):
+            if exclusion not in result["common_exclusions"]:
+                result["common_exclusions"].append(exclusion)
+            fields.add("common_exclusions")
+            understood = True
+    return understood
+
+
+def extract_eligibility_fast(eligibility_text: str) -> Optional[dict[str, Any]]:
+    """
+    Extract eligibility with regular expressions alone, or None when Claude
+    is needed.
+
+    Returns a result only when age, ECOG and disease stage were all found and
+    at least FAST_PATH_MIN_CONFIDENCE of the criterion lines were understood.
+    The fields filled this way are listed in extraction_notes.
+    """
+    result = _empty_eligibility()
+    fields: set[str] = set()
+    total = understood = 0
+    exclusion = False
+
+    for raw_line in eligibility_text.splitlines():
+        if _INCLUSION_HEADING.match(raw_line):
+            exclusion = False
+            continue
+        if _EXCLUSION_HEADING.match(raw_line):
+            exclusion = True
+            continue
+
+        line = _BULLET.sub("", raw_line).strip()
+        if not line:
+            continue
+
+        total += 1
+        if len(line.split()) > _FAST_PATH_MAX_LINE_WORDS:
+            continue
+        if exclusion:
+            understood += _extract_exclusion_line(line, result, fields)
+        else:
+            understood += _extract_inclusion_line(line, result, fields)
+
+    if not total or not {"age", "ecog", "disease_stage"} <= fields:
+        return None
+
+    confidence = understood / total
+    if confidence < FAST_PATH_MIN_CONFIDENCE:
+        return None
+
+    result["extraction_confidence"] = round(confidence, 2)
+    result["extraction_notes"] = [f"{field}: extracted_by=regex" for field in sorted(fields)]
+    return result
+
+
+def extract_eligibility(
+    eligibility_text: str,
+    trial_title: Optional[str] = None
+) -> dict[str, Any]:
+    """
+    Extract structured eligibility criteria from free text.
+
+    Uses Claude to parse eligibility criteria into a structured format
+    matching the StructuredEligibility schema.
+
+    Args:
+        eligibility_text: Raw eligibility criteria text from clinical trial
+        trial_title: Optional trial title for context
+
+    Returns:
+        Dictionary matching StructuredEligibility schema
+    """
+    if _too_short(eligibility_text):
+        return _too_short_result()
+
+    # Formulaic criteria need no API call
+    fast = extract_eligibility_fast(eligibility_text)
+    if fast is not None:
+        return fast
+
+    # Neither do criteria already extracted by this version
+    text_hash = extraction_text_hash(eligibility_text)
+    cached = load_cached_extractions([text_hash])
+    if text_hash in cached:
+        return cached[text_hash]
+
+    result = error = None
+    try:
+        response = client.messages.create(**_extraction_request(eligibility_text, trial_title))
+        result = parse_extraction(response)
+    except Exception as e:
+        error = e
+
+    if _needs_escalation(result, error):
+        try:
+            response = client.messages.create(**_extraction_request(eligibility_text, trial_title, MODEL))
+            result = parse_extraction(response)
+        except Exception as e:
+            return _failed_extraction(e)
+
+    store_extractions({text_hash: result})
+    return result
 
-Return only the JSON object."""
 
+async def aextract_with_claude(
+    eligibility_text: str,
+    trial_title: Optional[str],
+    call_claude: Callable[[dict[str, Any]], Awaitable[Message]],
+) -> dict[str, Any]:
+    """
+    Extract one trial through call_claude with MODEL_FAST, redoing it with
+    MODEL when needed. Skips the fast path and the cache; raises if the
+    final request fails.
+    """
+    result = error = None
     try:
-        response = client.messages.create(
-            model=MODEL,
-            max_tokens=2048,
-            system=system_prompt,
-            messages=[{"role": "user", "content": user_message}]
-        )
-
-        content = response.content[0].text.strip()
-
-        # Parse JSON - handle potential markdown code blocks
-        if content.startswith("```"):
-            lines = content.split("\n")
-            content = "\n".join(lines[1:-1] if lines[-1] == "```" else lines[1:])
-
-        result = json.loads(content)
-
-        # Validate and fill in defaults
-        result = _validate_and_fill_defaults(result)
-
-        return result
-
-    except json.JSONDecodeError as e:
-        logger.error(f"Failed to parse Claude response as JSON: {e}")
-        logger.error(f"Raw response: {content[:500]}")
-        return _empty_eligibility(
-            confidence=0.0,
-            notes=[f"JSON parse error: {str(e)}"]
-        )
+        response = await call_claude(_extraction_request(eligibility_text, trial_title))
+        result = parse_extraction(response)
     except Exception as e:
-        logger.error(f"Claude API error during eligibility extraction: {e}")
-        return _empty_eligibility(
-            confidence=0.0,
-            notes=[f"Extraction error: {str(e)}"]
-        )
+        error = e
+
+    if _needs_escalation(result, error):
+        response = await call_claude(_extraction_request(eligibility_text, trial_title, MODEL))
+        result = parse_extraction(response)
+
+    return result
+
+
+async def _aextract_all(
+    trials: list[tuple[str, Optional[str]]],
+    call_claude: Callable[[dict[str, Any]], Awaitable[Message]],
+) -> list[dict[str, Any]]:
+    """
+    Extract (eligibility_text, trial_title) pairs, in order: the fast path,
+    then the persistent cache in one query, then call_claude for the rest
+    (MODEL_FAST, escalating to MODEL when needed).
+    """
+    results: list[Optional[dict[str, Any]]] = [None] * len(trials)
+    text_hashes: dict[int, str] = {}
+
+    for i, (eligibility_text, _) in enumerate(trials):
+        if _too_short(eligibility_text):
+            results[i] = _too_short_result()
+        elif (fast := extract_eligibility_fast(eligibility_text)) is not None:
+            results[i] = fast
+        else:
+            text_hashes[i] = extraction_text_hash(eligibility_text)
+
+    cached = await _aload_cached_extractions(text_hashes.values())
+    misses = []
+    for i, text_hash in text_hashes.items():
+        if text_hash in cached:
+            results[i] = cached[text_hash]
+        else:
+            misses.append(i)
+
+    extracted: dict[str, dict[str, Any]] = {}
+
+    async def extract(i: int) -> None:
+        try:
+            result = await aextract_with_claude(*trials[i], call_claude)
+        except Exception as e:
+            results[i] = _failed_extraction(e)
+            return
+
+        results[i] = extracted[text_hashes[i]] = result
+
+    await asyncio.gather(*(extract(i) for i in misses))
+    await _astore_extractions(extracted)
+
+    return results
+
+
+async def aextract_eligibility(
+    eligibility_text: str,
+    trial_title: Optional[str] = None
+) -> dict[str, Any]:
+    """Async extract_eligibility."""
+    async def call_claude(params: dict[str, Any]) -> Message:
+        return await async_client.messages.create(**params)
+
+    results = await _aextract_all([(eligibility_text, trial_title)], call_claude)
+    return results[0]
+
+
+async def aextract_eligibility_many(
+    trials: list[tuple[str, Optional[str]]],
+    concurrency: int = EXTRACTION_CONCURRENCY,
+) -> list[dict[str, Any]]:
+    """
+    Extract eligibility for (eligibility_text, trial_title) pairs concurrently.
+
+    Extraction is bound by API latency, so up to `concurrency` requests are
+    kept in flight. Results are in the order of `trials`.
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def call_claude(params: dict[str, Any]) -> Message:
+        async with semaphore:
+            return await async_client.messages.create(**params)
+
+    return await _aextract_all(trials, call_claude)
+
+
+async def aextract_eligibility_batch(
+    trials: list[tuple[str, Optional[str]]],
+) -> list[dict[str, Any]]:
+    """
+    Extract eligibility for (eligibility_text, trial_title) pairs through the
+    Message Batches API.
+
+    Batched requests cost half as much but complete asynchronously (usually
+    within minutes, up to 24 hours), so this is for backfills rather than
+    anything a user waits on. Results are in the order of `trials`.
+    """
+    dispatcher = BatchDispatcher(async_client, max_requests=EXTRACTION_BATCH_MAX_REQUESTS)
+    try:
+        return await _aextract_all(trials, dispatcher.submit)
+    finally:
+        await dispatcher.close()
 
 
 def _empty_eligibility(
@@ -167,156 +729,17 @@ def _empty_eligibility(
     notes: Optional[list[str]] = None
 ) -> dict[str, Any]:
     """Return an empty eligibility structure with defaults."""
-    return {
-        "age": {"min": None, "max": None},
-        "ecog": {"min": None, "max": None},
-        "disease_stage": {"allowed": [], "excluded": []},
-        "histology": {"allowed": [], "excluded": []},
-        "biomarkers": {
-            "required_positive": {},
-            "required_negative": [],
-            "pdl1_expression": None
-        },
-        "prior_treatments": {
-            "required": [],
-            "excluded": [],
-            "max_lines": None,
-            "min_lines": None,
-            "treatment_naive_required": False
-        },
-        "brain_metastases": {
-            "allowed": True,
-            "controlled_only": False,
-            "untreated_allowed": False
-        },
-        "organ_function": {
-            "renal_exclusion": False,
-            "hepatic_exclusion": False,
-            "creatinine_max": None,
-            "bilirubin_max": None,
-            "notes": None
-        },
-        "prior_malignancy": {
-            "excluded": False,
-            "years_lookback": None,
-            "exceptions": []
-        },
-        "washout": {
-            "min_days_since_chemo": None,
-            "min_days_since_radiation": None,
-            "min_days_since_surgery": None,
-            "min_days_since_immunotherapy": None,
-            "general_min_days": None
-        },
-        "common_exclusions": [],
-        "extraction_confidence": confidence,
-        "extraction_notes": notes or []
-    }
-
+    return StructuredEligibility(
+        extraction_confidence=confidence,
+        extraction_notes=notes or [],
+    ).model_dump()
 
-def _validate_and_fill_defaults(result: dict) -> dict:
-    """Validate extracted result and fill in missing defaults."""
-    defaults = _empty_eligibility(confidence=0.5)
-
-    # Ensure all top-level keys exist
-    for key in defaults:
-        if key not in result:
-            result[key] = defaults[key]
-
-    # Validate nested structures
-    if not isinstance(result.get("age"), dict):
-        result["age"] = defaults["age"]
-    else:
-        result["age"].setdefault("min", None)
-        result["age"].setdefault("max", None)
-
-    if not isinstance(result.get("ecog"), dict):
-        result["ecog"] = defaults["ecog"]
-    else:
-        result["ecog"].setdefault("min", None)
-        result["ecog"].setdefault("max", None)
-        # Clamp ECOG values to valid range
-        if result["ecog"]["min"] is not None:
-            result["ecog"]["min"] = max(0, min(4, result["ecog"]["min"]))
-        if result["ecog"]["max"] is not None:
-            result["ecog"]["max"] = max(0, min(4, result["ecog"]["max"]))
-
-    if not isinstance(result.get("disease_stage"), dict):
-        result["disease_stage"] = defaults["disease_stage"]
-    else:
-        result["disease_stage"].setdefault("allowed", [])
-        result["disease_stage"].setdefault("excluded", [])
-
-    if not isinstance(result.get("histology"), dict):
-        result["histology"] = defaults["histology"]
-    else:
-        result["histology"].setdefault("allowed", [])
-        result["histology"].setdefault("excluded", [])
-
-    if not isinstance(result.get("biomarkers"), dict):
-        result["biomarkers"] = defaults["biomarkers"]
-    else:
-        result["biomarkers"].setdefault("required_positive", {})
-        result["biomarkers"].setdefault("required_negative", [])
-        result["biomarkers"].setdefault("pdl1_expression", None)
-
-    if not isinstance(result.get("prior_treatments"), dict):
-        result["prior_treatments"] = defaults["prior_treatments"]
-    else:
-        result["prior_treatments"].setdefault("required", [])
-        result["prior_treatments"].setdefault("excluded", [])
-        result["prior_treatments"].setdefault("max_lines", None)
-        result["prior_treatments"].setdefault("min_lines", None)
-        result["prior_treatments"].setdefault("treatment_naive_required", False)
-
-    if not isinstance(result.get("brain_metastases"), dict):
-        result["brain_metastases"] = defaults["brain_metastases"]
-    else:
-        result["brain_metastases"].setdefault("allowed", True)
-        result["brain_metastases"].setdefault("controlled_only", False)
-        result["brain_metastases"].setdefault("untreated_allowed", False)
-
-    if not isinstance(result.get("common_exclusions"), list):
-        result["common_exclusions"] = []
-
-    if not isinstance(result.get("extraction_notes"), list):
-        result["extraction_notes"] = []
-
-    # Validate organ_function
-    if not isinstance(result.get("organ_function"), dict):
-        result["organ_function"] = defaults["organ_function"]
-    else:
-        result["organ_function"].setdefault("renal_exclusion", False)
-        result["organ_function"].setdefault("hepatic_exclusion", False)
-        result["organ_function"].setdefault("creatinine_max", None)
-        result["organ_function"].setdefault("bilirubin_max", None)
-        result["organ_function"].setdefault("notes", None)
-
-    # Validate prior_malignancy
-    if not isinstance(result.get("prior_malignancy"), dict):
-        result["prior_malignancy"] = defaults["prior_malignancy"]
-    else:
-        result["prior_malignancy"].setdefault("excluded", False)
-        result["prior_malignancy"].setdefault("years_lookback", None)
-        result["prior_malignancy"].setdefault("exceptions", [])
-
-    # Validate washout
-    if not isinstance(result.get("washout"), dict):
-        result["washout"] = defaults["washout"]
-    else:
-        result["washout"].setdefault("min_days_since_chemo", None)
-        result["washout"].setdefault("min_days_since_radiation", None)
-        result["washout"].setdefault("min_days_since_surgery", None)
-        result["washout"].setdefault("min_days_since_immunotherapy", None)
-        result["washout"].setdefault("general_min_days", None)
-
-    # Ensure confidence is a valid float
-    try:
-        result["extraction_confidence"] = max(0.0, min(1.0, float(result.get("extraction_confidence", 0.5))))
-    except (ValueError, TypeError):
-        result["extraction_confidence"] = 0.5
 
-    return result
+def _drop_nulls(value: Any) -> Any:
+    """Drop null values from nested objects, so the schema fills in its defaults."""
+    if isinstance(value, dict):
+        return {k: _drop_nulls(v) for k, v in value.items() if v is not None}
+    return value
 
 
 def get_extraction_version() -> str:
@@ -1,17 +1,22 @@
+import os
+import re
+import time
+import heapq
+import asyncio
 import logging
 from typing import Any, Optional
 from datetime import datetime, date
-from sqlalchemy.orm import Session
-from sqlalchemy import func, and_, or_
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select, func, and_, or_
 from decimal import Decimal
 
 from app.models import Treatment, ClinicalTrial
-from app.services.claude_service import evaluate_trial_eligibility
+from app.services.claude_service import ELIGIBILITY_GROUP_SIZE, aevaluate_trials_eligibility
 
 logger = logging.getLogger(__name__)
 
 # Maximum number of trials to evaluate with Claude per request
-# Note: Each trial evaluation requires a Claude API call, so keep this low for faster responses
+# Note: Every ELIGIBILITY_GROUP_SIZE uncached trials cost a Claude API call, so keep this low for faster responses
 MAX_TRIAL_EVALUATIONS = 10
 
 # Maximum number of trials to return from v2 matching
@@ -20,10 +25,58 @@ MAX_V2_RESULTS = 20
 # Default relevance categories for matching
 DEFAULT_RELEVANCE_CATEGORIES = ["nsclc_specific", "nsclc_primary"]
 
+# Structured eligibility only appears when extract_eligibility.py runs, so
+# whether any exists is re-checked at most this often (seconds)
+STRUCTURED_FLAG_TTL = int(os.getenv("STRUCTURED_FLAG_TTL", "300"))
+_has_structured: Optional[tuple[bool, float]] = None
 
-def match_treatments(
+
+def _normalize_biomarkers(biomarkers: dict[str, list[str]]) -> dict[str, list[str]]:
+    """
+    Patient biomarkers keyed by upper-cased name with lower-cased values, built
+    once per request instead of re-normalized for every trial scored. The first
+    spelling of a name wins, as with the per-trial scan this replaces.
+    """
+    normalized: dict[str, list[str]] = {}
+    for name, values in biomarkers.items():
+        normalized.setdefault(name.upper(), [v.lower() for v in values])
+    return normalized
+
+
+# Biomarker values that mean "present" when matching treatment requirements
+TREATMENT_POSITIVE_INDICATORS = frozenset({"positive", "present", "detected", "rearrangement", "fusion"})
+
+# Drug classes of treatments without biomarker requirements that still apply
+# to NSCLC broadly
+_GENERAL_DRUG_CLASS = re.compile(r"chemotherapy|immunotherapy|pd-1|pd-l1", re.I)
+
+# Profile fields that only decide which trial sites are shown, not whether
+# the patient is eligible
+NON_ELIGIBILITY_FIELDS = frozenset({"location", "travel_distance_miles"})
+
+
+def _eligibility_profile(profile: dict[str, Any]) -> dict[str, Any]:
+    """
+    The part of a profile sent to Claude for eligibility evaluation. Leaving
+    out location and unanswered (None) fields means patients who differ only
+    in those share cached evaluations, and the prompt is shorter. Empty lists
+    and dicts are kept: no prior treatments is itself an answer.
+    """
+    return {
+        field: value
+        for field, value in profile.items()
+        if field not in NON_ELIGIBILITY_FIELDS and value is not None
+    }
+
+
+def _clamp01(x: float) -> float:
+    """Clamp a score to [0, 1] without the max/min call overhead."""
+    return 0.0 if x < 0.0 else 1.0 if x > 1.0 else x
+
+
+async def match_treatments(
     profile: dict[str, Any],
-    db: Session
+    db: AsyncSession
 ) -> list[dict[str, Any]]:
     """
     Match FDA-approved treatments to a patient profile based on biomarkers.
@@ -31,11 +84,12 @@ def match_treatments(
     Uses rule-based matching against Treatment.biomarker_requirements.
     Returns a list of treatment matches with scores and reasons.
     """
-    patient_biomarkers = profile.get("biomarkers", {})
+    patient_biomarkers = _normalize_biomarkers(profile.get("biomarkers", {}))
     matches = []
 
     # Query all treatments
-    treatments = db.query(Treatment).all()
+    result = await db.execute(select(Treatment))
+    treatments = result.scalars().all()
 
     for treatment in treatments:
         match_score = 0.0
@@ -46,29 +100,22 @@ def match_treatments(
         # If treatment has no biomarker requirements, it may be broadly applicable
         if not treatment_requirements:
             # Check if it's a general NSCLC treatment (e.g., chemo, immunotherapy)
-            drug_class = (treatment.drug_class or "").lower()
-            if any(term in drug_class for term in ["chemotherapy", "immunotherapy", "pd-1", "pd-l1"]):
+            if _GENERAL_DRUG_CLASS.search(treatment.drug_class or ""):
                 match_score = 0.3
                 match_reasons.append("General NSCLC treatment")
 
         # Match biomarkers
         for biomarker, required_values in treatment_requirements.items():
-            biomarker_upper = biomarker.upper()
-
             # Check if patient has this biomarker
-            patient_values = None
-            for patient_biomarker, values in patient_biomarkers.items():
-                if patient_biomarker.upper() == biomarker_upper:
-                    patient_values = values
-                    break
+            patient_values = patient_biomarkers.get(biomarker.upper())
 
             if patient_values:
                 # Patient has this biomarker
                 required_set = set(v.lower() for v in (required_values if isinstance(required_values, list) else [required_values]))
-                patient_set = set(v.lower() for v in patient_values)
+                patient_set = set(patient_values)
 
                 # Check for positive/presence match
-                positive_indicators = {"positive", "present", "detected", "rearrangement", "fusion"}
+                positive_indicators = TREATMENT_POSITIVE_INDICATORS
                 if positive_indicators & required_set and positive_indicators & patient_set:
                     match_score += 0.8
                     match_reasons.append(f"{biomarker} positive match")
@@ -110,10 +157,11 @@ def match_treatments(
     return matches
 
 
-def match_trials(
+async def match_trials(
     profile: dict[str, Any],
-    db: Session,
-    max_evaluations: int = MAX_TRIAL_EVALUATIONS
+    db: AsyncSession,
+    max_evaluations: int = MAX_TRIAL_EVALUATIONS,
+    use_batch: bool = False
 ) -> list[dict[str, Any]]:
     """
     Match clinical trials to a patient profile.
@@ -121,40 +169,56 @@ def match_trials(
     1. Pre-filter trials by biomarker keywords
     2. Evaluate top candidates with Claude for eligibility
     3. Return matches with eligibility results
+
+    With use_batch, evaluations go through the Message Batches API (half the
+    cost, slower to complete) instead of direct calls.
     """
     patient_biomarkers = profile.get("biomarkers", {})
     patient_location = profile.get("location", "")
 
-    # Query recruiting/active trials
-    # Use case-insensitive matching to handle different status formats
-    query = db.query(ClinicalTrial).filter(
-        func.upper(ClinicalTrial.status).in_(["RECRUITING", "ACTIVE_NOT_RECRUITING", "ENROLLING_BY_INVITATION"])
-    )
-
-    trials = query.all()
+    # Patient biomarker names are upper-cased once per request, and each
+    # trial's requirement names once per trial, rather than once per pair
+    patient_keys = [b.upper() for b in patient_biomarkers]
+    criteria_keys = list(dict.fromkeys(patient_keys))
+
+    # Query recruiting/active trials; is_active matches the status
+    # case-insensitively to handle different status formats.
+    # Relevance scoring needs only these columns. Whether each biomarker
+    # appears in the criteria text, often several kilobytes, is tested by
+    # Postgres, so full rows are fetched only for the top candidates.
+    query = select(
+        ClinicalTrial.id,
+        ClinicalTrial.title,
+        ClinicalTrial.biomarker_requirements,
+        *(
+            func.strpos(func.upper(ClinicalTrial.eligibility_criteria), key) > 0
+            for key in criteria_keys
+        ),
+    ).where(ClinicalTrial.is_active)
+
+    result = await db.execute(query)
+    rows = result.all()
 
     # Pre-filter and score trials based on biomarker relevance
     candidates = []
-    for trial in trials:
+    for row in rows:
         relevance_score = 0.0
-        trial_biomarkers = trial.biomarker_requirements or {}
+        trial_biomarkers = row.biomarker_requirements or {}
+        trial_keys = [b.upper() for b in trial_biomarkers]
+        in_criteria = dict(zip(criteria_keys, row[3:]))
+        title_upper = row.title.upper() if row.title else ""
 
         # Check biomarker overlap
-        for patient_biomarker in patient_biomarkers.keys():
-            biomarker_upper = patient_biomarker.upper()
-
+        for biomarker_upper in patient_keys:
             # Check in biomarker_requirements
-            for trial_biomarker in trial_biomarkers.keys():
-                if trial_biomarker.upper() == biomarker_upper:
-                    relevance_score += 1.0
+            relevance_score += trial_keys.count(biomarker_upper)
 
             # Check in eligibility criteria text
-            if trial.eligibility_criteria:
-                if patient_biomarker.upper() in trial.eligibility_criteria.upper():
-                    relevance_score += 0.5
+            if in_criteria[biomarker_upper]:
+                relevance_score += 0.5
 
             # Check in title
-            if trial.title and patient_biomarker.upper() in trial.title.upper():
+            if title_upper and biomarker_upper in title_upper:
                 relevance_score += 0.3
 
         # Give some score to trials without specific biomarker requirements
@@ -162,32 +226,57 @@ def match_trials(
             # Could be a general NSCLC trial
             relevance_score = 0.1
 
-        candidates.append((trial, relevance_score))
+        candidates.append((row.id, relevance_score))
 
-    # Sort by relevance and take top candidates for evaluation
-    candidates.sort(key=lambda x: x[1], reverse=True)
-    top_candidates = candidates[:max_evaluations]
+    # Take the top candidates by relevance for evaluation
+    top_scored = heapq.nlargest(max_evaluations, candidates, key=lambda x: x[1])
 
-    # Evaluate eligibility with Claude
-    matches = []
-    for trial, relevance_score in top_candidates:
-        # Only evaluate if there's eligibility criteria
-        if trial.eligibility_criteria:
-            eligibility = evaluate_trial_eligibility(
-                profile=profile,
-                eligibility_text=trial.eligibility_criteria,
-                trial_title=trial.title or trial.nct_id
-            )
-        else:
-            # No criteria to evaluate
-            eligibility = {
-                "status": "uncertain",
-                "confidence": 0.3,
-                "matching_criteria": [],
-                "excluding_criteria": [],
-                "explanation": "No eligibility criteria available for evaluation"
-            }
+    # Second, small query for the full rows of the top candidates
+    full = {}
+    if top_scored:
+        result = await db.execute(
+            select(ClinicalTrial).where(ClinicalTrial.id.in_([trial_id for trial_id, _ in top_scored]))
+        )
+        full = {trial.id: trial for trial in result.scalars().all()}
+    top_candidates = [(full[trial_id], score) for trial_id, score in top_scored]
+
+    # Only evaluate trials that have eligibility criteria, several per
+    # Claude request, with all groups in flight at once
+    to_evaluate = [trial for trial, _ in top_candidates if trial.eligibility_criteria]
+    groups = [
+        to_evaluate[i:i + ELIGIBILITY_GROUP_SIZE]
+        for i in range(0, len(to_evaluate), ELIGIBILITY_GROUP_SIZE)
+    ]
+    eligibility_profile = _eligibility_profile(profile)
+
+    # Direct calls are limited to CLAUDE_CONCURRENCY per worker inside
+    # claude_service, so cached trials are answered without waiting for a slot
+    group_results = await asyncio.gather(*(
+        aevaluate_trials_eligibility(
+            eligibility_profile,
+            [(trial.title or trial.nct_id, trial.eligibility_criteria) for trial in group],
+            use_batch=use_batch,
+        )
+        for group in groups
+    ))
+    evaluated = {
+        trial.id: eligibility
+        for group, results in zip(groups, group_results)
+        for trial, eligibility in zip(group, results)
+    }
+
+    # No criteria to evaluate
+    no_criteria = {
+        "status": "uncertain",
+        "confidence": 0.3,
+        "matching_criteria": [],
+        "excluding_criteria": [],
+        "explanation": "No eligibility criteria available for evaluation"
+    }
+    eligibilities = [evaluated.get(trial.id, no_criteria) for trial, _ in top_candidates]
 
+    matches = []
+    for (trial, relevance_score), eligibility in zip(top_candidates, eligibilities):
         # Filter locations by patient location if provided
         locations = trial.locations
         if patient_location and locations:
@@ -227,9 +316,25 @@ def match_trials(
     return matches
 
 
-def match_trials_v2(
+async def has_structured_eligibility(db: AsyncSession) -> bool:
+    """Whether any trial has structured eligibility, cached per process."""
+    global _has_structured
+    now = time.monotonic()
+    if _has_structured is not None and now - _has_structured[1] < STRUCTURED_FLAG_TTL:
+        return _has_structured[0]
+
+    value = await db.scalar(
+        select(ClinicalTrial.id)
+        .where(ClinicalTrial.structured_eligibility.isnot(None))
+        .limit(1)
+    ) is not None
+    _has_structured = (value, now)
+    return value
+
+
+async def match_trials_v2(
     profile: dict[str, Any],
-    db: Session,
+    db: AsyncSession,
     max_results: int = MAX_V2_RESULTS,
     relevance_categories: Optional[list[str]] = None
 ) -> list[dict[str, Any]]:
@@ -252,7 +357,7 @@ def match_trials_v2(
         relevance_categories = DEFAULT_RELEVANCE_CATEGORIES
 
     # Extract patient data
-    patient_biomarkers = profile.get("biomarkers", {})
+    patient_biomarkers = _normalize_biomarkers(profile.get("biomarkers", {}))
     patient_age = profile.get("age")
     patient_ecog = profile.get("ecog_status")
     patient_stage = profile.get("stage", "").upper() if profile.get("stage") else None
@@ -262,17 +367,18 @@ def match_trials_v2(
     patient_brain_mets = profile.get("brain_metastases")
 
     # Step 1: PostgreSQL pre-filter for recruiting trials with structured eligibility
-    query = db.query(ClinicalTrial).filter(
-        func.upper(ClinicalTrial.status).in_(["RECRUITING", "ACTIVE_NOT_RECRUITING", "ENROLLING_BY_INVITATION"]),
+    query = select(ClinicalTrial).where(
+        ClinicalTrial.is_active,
         ClinicalTrial.structured_eligibility.isnot(None)
     )
 
     # Filter by relevance
     if relevance_categories:
-        query = query.filter(ClinicalTrial.nsclc_relevance.in_(relevance_categories))
+        query = query.where(ClinicalTrial.nsclc_relevance.in_(relevance_categories))
 
     # Get candidates (limit to reasonable number for scoring)
-    candidates = query.limit(500).all()
+    result = await db.execute(query.limit(500))
+    candidates = result.scalars().all()
 
     # Step 2: Score each trial against patient profile
     scored_matches = []
@@ -334,17 +440,18 @@ def match_trials_v2(
                 "match_score": score
             })
 
-    # Step 3: Sort by eligibility status and score
+    # Step 3: Top matches by eligibility status and score; only the
+    # returned ones need ordering
     status_order = {"eligible": 0, "uncertain": 1, "ineligible": 2}
-    scored_matches.sort(
+    return heapq.nsmallest(
+        max_results,
+        scored_matches,
         key=lambda x: (
             status_order.get(x["eligibility"]["status"], 1),
             -x["match_score"]
         )
     )
 
-    return scored_matches[:max_results]
-
 
 def _score_trial_match(
     trial: ClinicalTrial,
@@ -358,6 +465,7 @@ def _score_trial_match(
 ) -> tuple[float, list[str], list[str]]:
     """
     Score a trial match against patient profile using structured eligibility.
+    patient_biomarkers is in the form returned by _normalize_biomarkers.
 
     Returns: (score, matching_reasons, excluding_reasons)
     - score: 0.0 to 1.0 (higher = better match)
@@ -435,14 +543,8 @@ def _score_trial_match(
     required_negative = biomarker_req.get("required_negative", [])
 
     for biomarker, required_mutations in required_positive.items():
-        biomarker_upper = biomarker.upper()
-        patient_values = None
-
         # Find matching patient biomarker
-        for pb, pv in patient_biomarkers.items():
-            if pb.upper() == biomarker_upper:
-                patient_values = [v.lower() for v in pv]
-                break
+        patient_values = patient_biomarkers.get(biomarker.upper())
 
         if patient_values:
             # Patient has this biomarker
@@ -475,13 +577,7 @@ def _score_trial_match(
 
     # Check required negative biomarkers
     for neg_biomarker in required_negative:
-        neg_upper = neg_biomarker.upper()
-        patient_values = None
-
-        for pb, pv in patient_biomarkers.items():
-            if pb.upper() == neg_upper:
-                patient_values = [v.lower() for v in pv]
-                break
+        patient_values = patient_biomarkers.get(neg_biomarker.upper())
 
         if patient_values:
             positive_indicators = {"positive", "present", "detected", "rearrangement", "fusion", "+"}
@@ -495,11 +591,7 @@ def _score_trial_match(
     # Check PD-L1 if specified
     pdl1_req = biomarker_req.get("pdl1_expression")
     if pdl1_req:
-        pdl1_values = None
-        for pb, pv in patient_biomarkers.items():
-            if pb.upper() == "PD-L1":
-                pdl1_values = pv
-                break
+        pdl1_values = patient_biomarkers.get("PD-L1")
 
         if pdl1_values:
             # Try to extract TPS percentage from patient values
@@ -553,7 +645,7 @@ def _score_trial_match(
         score -= 0.4
 
     # Normalize score to 0-1 range
-    score = max(0.0, min(1.0, (score + 0.5)))  # Shift and clamp
+    score = _clamp01(score + 0.5)  # Shift and clamp
 
     return score, matching, excluding
 
@@ -579,9 +671,9 @@ def _generate_explanation(status: str, matching: list[str], excluding: list[str]
         return "Insufficient information for definitive assessment"
 
 
-def match_trials_structured(
+async def match_trials_structured(
     profile: dict[str, Any],
-    db: Session,
+    db: AsyncSession,
     max_results: int = MAX_V2_RESULTS,
     relevance_categories: Optional[list[str]] = None
 ) -> list[dict[str, Any]]:
@@ -607,7 +699,7 @@ def match_trials_structured(
         relevance_categories = DEFAULT_RELEVANCE_CATEGORIES
 
     # Extract patient data (existing fields)
-    patient_biomarkers = profile.get("biomarkers", {})
+    patient_biomarkers = _normalize_biomarkers(profile.get("biomarkers", {}))
     patient_age = profile.get("age")
     patient_ecog = profile.get("ecog_status")
     patient_stage = profile.get("stage", "").upper() if profile.get("stage") else None
@@ -625,17 +717,18 @@ def match_trials_structured(
     patient_travel_distance = profile.get("travel_distance_miles")
 
     # PostgreSQL pre-filter for recruiting trials with structured eligibility
-    query = db.query(ClinicalTrial).filter(
-        func.upper(ClinicalTrial.status).in_(["RECRUITING", "ACTIVE_NOT_RECRUITING", "ENROLLING_BY_INVITATION"]),
+    query = select(ClinicalTrial).where(
+        ClinicalTrial.is_active,
         ClinicalTrial.structured_eligibility.isnot(None)
     )
 
     # Filter by relevance
     if relevance_categories:
-        query = query.filter(ClinicalTrial.nsclc_relevance.in_(relevance_categories))
+        query = query.where(ClinicalTrial.nsclc_relevance.in_(relevance_categories))
 
     # Get candidates
-    candidates = query.limit(500).all()
+    result = await db.execute(query.limit(500))
+    candidates = result.scalars().all()
 
     # Score each trial against patient profile with enhanced scoring
     scored_matches = []
@@ -712,17 +805,17 @@ def match_trials_structured(
                 "match_score": score
             })
 
-    # Sort by eligibility status and score
+    # Top matches by eligibility status and score
     status_order = {"eligible": 0, "uncertain": 1, "ineligible": 2}
-    scored_matches.sort(
+    return heapq.nsmallest(
+        max_results,
+        scored_matches,
         key=lambda x: (
             status_order.get(x["eligibility"]["status"], 1),
             -x["match_score"]
         )
     )
 
-    return scored_matches[:max_results]
-
 
 def _score_trial_match_structured(
     trial: ClinicalTrial,
@@ -856,6 +949,6 @@ def _score_trial_match_structured(
                 score += 0.15
 
     # Re-normalize score to 0-1 range
-    score = max(0.0, min(1.0, score))
+    score = _clamp01(score)
 
     return score, matching, excluding
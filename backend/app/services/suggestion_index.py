@@ -0,0 +1,166 @@
+"""
+In-memory index behind /search/suggest.
+
+Typeahead runs on every keystroke, so instead of three ILIKE queries per
+request the suggestion texts are loaded once per worker and searched in
+memory, with a periodic reload to pick up new rows.
+"""
+
+import os
+import asyncio
+import logging
+from array import array
+from typing import Any, Iterable, Optional
+
+from sqlalchemy import select
+
+from app.database import AsyncSessionLocal
+from app.models import Treatment, ClinicalTrial, CancerCenter
+
+logger = logging.getLogger(__name__)
+
+# How often each worker reloads the suggestion texts from the database
+SUGGEST_REFRESH_SECONDS = float(os.getenv("SUGGEST_REFRESH_SECONDS", "300"))
+
+# Order in which suggestion types are returned, as before
+SUGGESTION_TYPES = ("treatment", "trial", "center")
+
+
+def _trigrams(text: str) -> set[str]:
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+class _Entries:
+    """Lower-cased match texts for one suggestion type, with a trigram posting list."""
+
+    __slots__ = ("_texts", "_suggestions", "_postings")
+
+    def __init__(self, rows: Iterable[tuple[str, dict[str, Any]]]):
+        self._texts: list[str] = []
+        self._suggestions: list[dict[str, Any]] = []
+        self._postings: dict[str, array] = {}
+
+        for text, suggestion in rows:
+            position = len(self._texts)
+            text = text.lower()
+            self._texts.append(text)
+            self._suggestions.append(suggestion)
+            for gram in _trigrams(text):
+                self._postings.setdefault(gram, array("I")).append(position)
+
+    def search(self, q: str, limit: int) -> list[dict[str, Any]]:
+        """First `limit` entries containing q (already lower-cased)."""
+        if len(q) >= 3:
+            # Every match contains all of q's trigrams; scan the rarest one's entries
+            candidates = min(
+                (self._postings.get(gram, ()) for gram in _trigrams(q)), key=len
+            )
+        else:
+            candidates = range(len(self._texts))
+
+        matches = []
+        for position in candidates:
+            if q in self._texts[position]:
+                matches.append(self._suggestions[position])
+                if len(matches) == limit:
+                    break
+        return matches
+
+
+class SuggestionIndex:
+    """Substring search over treatment names, trial IDs/titles and center names."""
+
+    def __init__(self, refresh_seconds: float = SUGGEST_REFRESH_SECONDS):
+        self._refresh_seconds = refresh_seconds
+        self._entries: Optional[dict[str, _Entries]] = None
+        self._loading: Optional[asyncio.Task] = None
+        self._refresher: Optional[asyncio.Task] = None
+
+    async def _load(self) -> None:
+        async with AsyncSessionLocal() as db:
+            treatments = (await db.execute(
+                select(Treatment.id, Treatment.generic_name)
+            )).all()
+            trials = (await db.execute(
+                select(ClinicalTrial.nct_id, ClinicalTrial.title)
+            )).all()
+            centers = (await db.execute(
+                select(CancerCenter.id, CancerCenter.name)
+            )).all()
+
+        def build() -> dict[str, _Entries]:
+            return {
+                "treatment": _Entries(
+                    (t.generic_name, {"id": t.id, "text": t.generic_name, "type": "treatment"})
+                    for t in treatments
+                ),
+                # \0 keeps a query from matching across the ID/title boundary
+                "trial": _Entries(
+                    (
+                        f"{t.nct_id}\0{t.title or ''}",
+                        {
+                            "id": t.nct_id,
+                            "text": t.title[:80] + "..." if len(t.title or "") > 80 else t.title,
+                            "type": "trial",
+                        },
+                    )
+                    for t in trials
+                ),
+                "center": _Entries(
+                    (c.name, {"id": c.id, "text": c.name, "type": "center"})
+                    for c in centers
+                ),
+            }
+
+        # Building the posting lists is CPU-bound; keep it off the event loop
+        self._entries = await asyncio.to_thread(build)
+        logger.info(
+            f"Loaded suggestion index: {len(treatments)} treatments, "
+            f"{len(trials)} trials, {len(centers)} centers"
+        )
+
+    async def ensure_loaded(self) -> None:
+        """Load the index if it has not been loaded yet; concurrent callers share one load."""
+        if self._entries is not None:
+            return
+        if self._loading is None or self._loading.done():
+            self._loading = asyncio.create_task(self._load())
+        await asyncio.shield(self._loading)
+
+    async def _refresh_forever(self) -> None:
+        while True:
+            await asyncio.sleep(self._refresh_seconds)
+            try:
+                await self._load()
+            except Exception as e:
+                # Keep serving the previous snapshot
+                logger.error(f"Suggestion index refresh failed: {e}")
+
+    async def start(self) -> None:
+        """Initial load and periodic refresh; called on app startup."""
+        try:
+            await self.ensure_loaded()
+        except Exception as e:
+            # Retried on the first /search/suggest request
+            logger.error(f"Suggestion index load failed: {e}")
+        self._refresher = asyncio.create_task(self._refresh_forever())
+
+    async def close(self) -> None:
+        """Stop refreshing; called on app shutdown."""
+        if self._refresher is not None:
+            self._refresher.cancel()
+            await asyncio.gather(self._refresher, return_exceptions=True)
+            self._refresher = None
+
+    async def search(self, q: str, limit: int) -> list[dict[str, Any]]:
+        """Up to `limit` suggestions of each type whose text contains q, case-insensitively."""
+        await self.ensure_loaded()
+        q = q.lower()
+        return [
+            suggestion
+            for suggestion_type in SUGGESTION_TYPES
+            for suggestion in self._entries[suggestion_type].search(q, limit)
+        ]
+
+
+suggestion_index = SuggestionIndex()
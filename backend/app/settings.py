@@ -0,0 +1,22 @@
+from pydantic_settings import BaseSettings, SettingsConfigDict
+
+DEFAULT_CORS_ORIGINS = [
+    "http://localhost:3000",
+    "http://127.0.0.1:3000",
+]
+
+
+class Settings(BaseSettings):
+    """App settings read once from the environment (and .env) at startup."""
+    model_config = SettingsConfigDict(env_file=".env", extra="ignore")
+
+    # Extra allowed origins, comma-separated (CORS_ORIGINS)
+    cors_origins: str = ""
+
+    @property
+    def cors_origin_list(self) -> list[str]:
+        extra = [origin.strip() for origin in self.cors_origins.split(",") if origin.strip()]
+        return DEFAULT_CORS_ORIGINS + extra
+
+
+settings = Settings()
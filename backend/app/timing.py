@@ -0,0 +1,25 @@
+import time
+
+
+class Timer:
+    """
+    Monotonic elapsed-time measurement for processing_time_ms fields.
+
+    Starts on creation (or on entering a with block); read .ms at any point.
+    """
+
+    __slots__ = ("_start",)
+
+    def __init__(self):
+        self._start = time.perf_counter_ns()
+
+    def __enter__(self) -> "Timer":
+        self._start = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        return None
+
+    @property
+    def ms(self) -> int:
+        return (time.perf_counter_ns() - self._start) // 1_000_000
@@ -0,0 +1,29 @@
+"""
+Gunicorn settings for running the API with Uvicorn workers.
+
+    gunicorn -c gunicorn_conf.py app.main:app
+
+The API is mostly I/O bound (Postgres, Claude), but request validation and
+JSON rendering hold the GIL, so several worker processes are needed to use
+more than one core.
+"""
+
+import os
+
+bind = os.getenv("BIND", "0.0.0.0:8000")
+workers = int(os.getenv("WEB_CONCURRENCY", (os.cpu_count() or 1) * 2 + 1))
+worker_class = "uvicorn.workers.UvicornWorker"
+keepalive = 5
+# /match can wait on several Claude calls, so allow more than the default 30s
+timeout = int(os.getenv("WORKER_TIMEOUT", "60"))
+# Import the app once in the master; workers fork with it already loaded
+preload_app = True
+accesslog = "-"
+
+
+def child_exit(server, worker):
+    # With PROMETHEUS_MULTIPROC_DIR set, /metrics aggregates all workers;
+    # drop the samples of workers that have exited
+    if os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+        from prometheus_client import multiprocess
+        multiprocess.mark_process_dead(worker.pid)
@@ -8,102 +8,45 @@ with concurrent processing for much faster throughput.
 Usage:
     python scripts/extract_eligibility.py --force-all
     python scripts/extract_eligibility.py --force-all --workers 20
+    python scripts/extract_eligibility.py --force-all --batch
 """
 
 import argparse
 import asyncio
 import sys
 import time
-import json
 import os
 from datetime import datetime
 from pathlib import Path
-from concurrent.futures import ThreadPoolExecutor, as_completed
 
 # Add the backend directory to the path
 sys.path.insert(0, str(Path(__file__).parent.parent))
 
-from anthropic import Anthropic
+from anthropic import AsyncAnthropic, DefaultAsyncHttpxClient
 from sqlalchemy import func, case
 from app.database import SessionLocal, engine
 from app.models import ClinicalTrial
-
-# Initialize Anthropic client
-client = Anthropic(api_key=os.getenv("ANTHROPIC_API_KEY"))
-MODEL = "claude-sonnet-4-20250514"
-EXTRACTION_VERSION = "2.0.0"
-
-SYSTEM_PROMPT = """You are a clinical trial eligibility extraction system specializing in NSCLC (non-small cell lung cancer) trials.
-
-Extract structured eligibility criteria from the provided text. Return a JSON object with these fields:
-
-{
-  "age": {"min": number or null, "max": number or null},
-  "ecog": {"min": number (0-4) or null, "max": number (0-4) or null},
-  "disease_stage": {
-    "allowed": ["stage values that ARE allowed"],
-    "excluded": ["stage values that are NOT allowed"]
-  },
-  "histology": {
-    "allowed": ["histology types that ARE allowed"],
-    "excluded": ["histology types that are NOT allowed"]
-  },
-  "biomarkers": {
-    "required_positive": {"BIOMARKER_NAME": ["specific_mutations"] or ["positive"]},
-    "required_negative": ["biomarkers that must be negative/wild-type"],
-    "pdl1_expression": {"min_tps": number, "max_tps": number, "level": "high/low/any"} or null
-  },
-  "prior_treatments": {
-    "required": ["treatments patient MUST have had"],
-    "excluded": ["treatments patient must NOT have had"],
-    "max_lines": number or null,
-    "min_lines": number or null,
-    "treatment_naive_required": boolean
-  },
-  "brain_metastases": {
-    "allowed": boolean,
-    "controlled_only": boolean,
-    "untreated_allowed": boolean
-  },
-  "organ_function": {
-    "renal_exclusion": boolean,
-    "hepatic_exclusion": boolean,
-    "creatinine_max": number or null,
-    "bilirubin_max": number or null,
-    "notes": string or null
-  },
-  "prior_malignancy": {
-    "excluded": boolean,
-    "years_lookback": number or null,
-    "exceptions": ["list of exceptions"]
-  },
-  "washout": {
-    "min_days_since_chemo": number or null,
-    "min_days_since_radiation": number or null,
-    "min_days_since_surgery": number or null,
-    "min_days_since_immunotherapy": number or null,
-    "general_min_days": number or null
-  },
-  "common_exclusions": ["pregnancy", "active infection", etc.],
-  "extraction_confidence": float 0-1,
-  "extraction_notes": ["notes about uncertain extractions"]
-}
-
-Guidelines:
-- ONLY extract what is EXPLICITLY stated
-- Use null for fields not mentioned
-- Convert weeks to days for washout (4 weeks = 28 days)
-- Set extraction_confidence 0.9+ for clear criteria, 0.5-0.8 for ambiguous
-
-Return ONLY valid JSON, no other text."""
+from app.services.batch_dispatcher import BatchDispatcher
+from app.services.eligibility_extraction_service import (
+    EXTRACTION_VERSION,
+    aextract_with_claude,
+    extract_eligibility_fast,
+    extraction_text_hash,
+    load_cached_extractions,
+    store_extractions,
+)
 
 
 def parse_args():
     parser = argparse.ArgumentParser(description="Extract eligibility (parallel)")
     parser.add_argument("--force-all", action="store_true", help="Re-extract all trials")
     parser.add_argument("--limit", type=int, default=None, help="Max trials to process")
-    parser.add_argument("--workers", type=int, default=15, help="Parallel workers (default: 15)")
+    parser.add_argument("--workers", type=int, default=15, help="Concurrent requests (default: 15)")
     parser.add_argument("--dry-run", action="store_true", help="Preview without changes")
+    parser.add_argument(
+        "--batch", action="store_true",
+        help="Submit through the Message Batches API (half price, finishes within 24h)",
+    )
     return parser.parse_args()
 
 
@@ -135,50 +78,73 @@ def get_trials_to_process(force_all: bool, limit: int | None):
         db.close()
 
 
-def extract_single(trial_data) -> dict:
-    """Extract eligibility for a single trial (runs in thread)."""
-    trial_id, nct_id, title, eligibility_text = trial_data
+def record_claude(result: dict, extracted: dict) -> dict:
+    """Fill the trial's result record from a Claude extraction."""
+    result["success"] = True
+    result["extracted"] = extracted
+    result["confidence"] = extracted["extraction_confidence"]
+    return result
+
 
-    result = {
+def new_result(trial_id, nct_id) -> dict:
+    return {
         "id": trial_id,
         "nct_id": nct_id,
         "success": False,
         "extracted": None,
     }
 
-    try:
-        user_message = f"""Extract structured eligibility from this clinical trial:
-
-{f'Trial: {title}' if title else ''}
-
-Eligibility Criteria:
-{eligibility_text}
-
-Return only the JSON object."""
-
-        response = client.messages.create(
-            model=MODEL,
-            max_tokens=2048,
-            system=SYSTEM_PROMPT,
-            messages=[{"role": "user", "content": user_message}]
-        )
-
-        content = response.content[0].text.strip()
-
-        # Parse JSON - handle potential markdown code blocks
-        if content.startswith("```"):
-            lines = content.split("\n")
-            content = "\n".join(lines[1:-1] if lines[-1] == "```" else lines[1:])
 
-        extracted = json.loads(content)
-        result["success"] = True
-        result["extracted"] = extracted
-        result["confidence"] = extracted.get("extraction_confidence", 0.5)
-
-    except Exception as e:
-        result["error"] = str(e)
-
-    return result
+def record_fast(result: dict, eligibility_text: str) -> bool:
+    """Fill the result from the regex fast path; False if Claude is needed."""
+    extracted = extract_eligibility_fast(eligibility_text)
+    if extracted is None:
+        return False
+    result["success"] = True
+    result["extracted"] = extracted
+    result["confidence"] = extracted["extraction_confidence"]
+    return True
+
+
+async def extract_all(trials, on_result, workers: int, batch: bool) -> None:
+    """
+    Extract every trial concurrently over one HTTP/2 connection pool.
+
+    Up to `workers` requests are in flight at once. With batch, requests go
+    through the Message Batches API instead, pooled into batches of up to
+    10,000. on_result is awaited with each trial's result as it completes.
+    """
+    async_client = AsyncAnthropic(
+        api_key=os.getenv("ANTHROPIC_API_KEY"),
+        http_client=DefaultAsyncHttpxClient(http2=True),
+    )
+    async with async_client:
+        dispatcher = BatchDispatcher(async_client, max_requests=10000) if batch else None
+        semaphore = asyncio.Semaphore(workers)
+
+        async def call_claude(params: dict):
+            if dispatcher is not None:
+                return await dispatcher.submit(params)
+            async with semaphore:
+                return await async_client.messages.create(**params)
+
+        async def extract(trial_data) -> None:
+            trial_id, nct_id, title, eligibility_text = trial_data
+            result = new_result(trial_id, nct_id)
+            try:
+                if not record_fast(result, eligibility_text):
+                    result["text_hash"] = extraction_text_hash(eligibility_text)
+                    extracted = await aextract_with_claude(eligibility_text, title, call_claude)
+                    record_claude(result, extracted)
+            except Exception as e:
+                result["error"] = str(e)
+            await on_result(result)
+
+        try:
+            await asyncio.gather(*(extract(t) for t in trials))
+        finally:
+            if dispatcher is not None:
+                await dispatcher.close()
 
 
 def update_trials_batch(results: list[dict]):
@@ -198,6 +164,13 @@ def update_trials_batch(results: list[dict]):
     finally:
         db.close()
 
+    # Keep new Claude extractions for later runs over the same criteria
+    store_extractions({
+        result["text_hash"]: result["extracted"]
+        for result in results
+        if result["success"] and "text_hash" in result
+    })
+
 
 def main():
     args = parse_args()
@@ -215,15 +188,29 @@ def main():
         return
 
     print(f"Found {total} trials to process")
-    print(f"Workers: {args.workers}")
+
+    # Criteria already extracted by this version are reused without an API call
+    text_hashes = {t.id: extraction_text_hash(t.eligibility_criteria) for t in trials}
+    cached = load_cached_extractions(text_hashes.values())
+    to_extract = [t for t in trials if text_hashes[t.id] not in cached]
+    if cached:
+        print(f"Cached: {total - len(to_extract)} | To extract: {len(to_extract)}")
+    if args.batch:
+        print("Mode: Message Batches API")
+    else:
+        print(f"Workers: {args.workers}")
 
     if args.dry_run:
         print("DRY RUN - No changes will be made\n")
 
     # Estimate
-    estimated_time = (total / args.workers) * 2  # ~2 sec per request with parallel
-    print(f"Estimated time: {estimated_time/60:.1f} minutes")
-    print(f"Estimated cost: ${total * 0.003 * 2:.2f}")
+    if args.batch:
+        print("Estimated time: usually under an hour, at most 24 hours")
+        print(f"Estimated cost: ${len(to_extract) * 0.003:.2f}")  # batches are half price
+    else:
+        estimated_time = (len(to_extract) / args.workers) * 2  # ~2 sec per request with parallel
+        print(f"Estimated time: {estimated_time/60:.1f} minutes")
+        print(f"Estimated cost: ${len(to_extract) * 0.003 * 2:.2f}")
 
     if not args.dry_run:
         confirm = input("\nProceed? (y/N): ")
@@ -231,38 +218,52 @@ def main():
             print("Aborted.")
             return
 
-    # Process with thread pool
     start_time = time.time()
     successes = 0
     failures = 0
+    completed = 0
     batch_results = []
     batch_size = 50  # Commit every 50 trials
 
+    async def on_result(result: dict):
+        nonlocal successes, failures, completed, batch_results
+        completed += 1
+
+        if result["success"]:
+            successes += 1
+            status = f"OK ({result.get('confidence', 0):.2f})"
+        else:
+            failures += 1
+            status = f"FAIL: {result.get('error', 'Unknown')[:50]}"
+
+        print(f"[{completed}/{total}] {result['nct_id']}: {status}")
+
+        if not args.dry_run:
+            batch_results.append(result)
+
+            # Commit batch in a thread so the event loop keeps serving the
+            # other requests; swap it out first so results arriving during
+            # the commit start the next batch
+            if len(batch_results) >= batch_size:
+                to_commit, batch_results = batch_results, []
+                await asyncio.to_thread(update_trials_batch, to_commit)
+                print(f"         [Committed {len(to_commit)} trials]")
+
     print(f"\nProcessing...")
 
-    with ThreadPoolExecutor(max_workers=args.workers) as executor:
-        futures = {executor.submit(extract_single, t): t for t in trials}
+    async def run():
+        for trial_id, nct_id, _, _ in trials:
+            text_hash = text_hashes[trial_id]
+            if text_hash in cached:
+                result = new_result(trial_id, nct_id)
+                result["success"] = True
+                result["extracted"] = cached[text_hash]
+                result["confidence"] = cached[text_hash].get("extraction_confidence", 0.5)
+                await on_result(result)
 
-        for i, future in enumerate(as_completed(futures), 1):
-            result = future.result()
+        await extract_all(to_extract, on_result, args.workers, args.batch)
 
-            if result["success"]:
-                successes += 1
-                status = f"OK ({result.get('confidence', 0):.2f})"
-            else:
-                failures += 1
-                status = f"FAIL: {result.get('error', 'Unknown')[:50]}"
-
-            print(f"[{i}/{total}] {result['nct_id']}: {status}")
-
-            if not args.dry_run:
-                batch_results.append(result)
-
-                # Commit batch
-                if len(batch_results) >= batch_size:
-                    update_trials_batch(batch_results)
-                    print(f"         [Committed {len(batch_results)} trials]")
-                    batch_results = []
+    asyncio.run(run())
 
     # Final batch
     if not args.dry_run and batch_results:
@@ -0,0 +1,116 @@
+"""
+Regex fast path of eligibility extraction.
+
+Run from backend/: python -m unittest discover -s tests
+"""
+
+import sys
+import unittest
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from app.services.eligibility_extraction_service import extract_eligibility_fast
+
+
+def criteria(*lines: str) -> str:
+    return "\n".join(["Inclusion Criteria:", "Age >= 18 years", "Stage IV NSCLC", "ECOG 0-1", *lines])
+
+
+class BiomarkerNegationTest(unittest.TestCase):
+    def test_without_elsewhere_on_line_is_not_a_negative_requirement(self):
+        # Enough understood lines to clear the threshold despite this one
+        result = extract_eligibility_fast(criteria(
+            "EGFR-mutant NSCLC without brain metastases", "Adenocarcinoma", "Metastatic disease", "Non-squamous histology"
+        ))
+        self.assertEqual(result["biomarkers"]["required_negative"], [])
+        self.assertLess(result["extraction_confidence"], 1.0)
+
+    def test_without_elsewhere_on_line_is_not_understood(self):
+        # Three other understood lines; one not understood is below the threshold
+        self.assertIsNone(extract_eligibility_fast(criteria("EGFR-mutant NSCLC without brain metastases")))
+
+    def test_wild_type_after_biomarker(self):
+        result = extract_eligibility_fast(criteria("EGFR wild-type"))
+        self.assertEqual(result["biomarkers"]["required_negative"], ["EGFR"])
+        self.assertEqual(result["biomarkers"]["required_positive"], {})
+
+    def test_negative_after_biomarker(self):
+        result = extract_eligibility_fast(criteria("ALK-negative"))
+        self.assertEqual(result["biomarkers"]["required_negative"], ["ALK"])
+
+    def test_without_before_biomarker(self):
+        result = extract_eligibility_fast(criteria("Without an EGFR mutation"))
+        self.assertEqual(result["biomarkers"]["required_negative"], ["EGFR"])
+
+    def test_mixed_negative_and_positive_falls_through(self):
+        self.assertIsNone(extract_eligibility_fast(criteria("EGFR wild-type and ALK fusion")))
+
+    def test_positive_biomarker(self):
+        result = extract_eligibility_fast(criteria("EGFR L858R mutation"))
+        self.assertEqual(result["biomarkers"]["required_positive"], {"EGFR": ["l858r"]})
+        self.assertEqual(result["biomarkers"]["required_negative"], [])
+
+
+class AgeTest(unittest.TestCase):
+    def test_minimum_age(self):
+        result = extract_eligibility_fast(criteria())
+        self.assertEqual(result["age"]["min"], 18)
+        self.assertEqual(result["extraction_confidence"], 1.0)
+
+    def test_duration_is_not_an_age(self):
+        result = extract_eligibility_fast(criteria(
+            "No other cancer for at least 5 years", "Adenocarcinoma", "Metastatic disease", "Non-squamous histology"
+        ))
+        self.assertEqual(result["age"]["min"], 18)
+        self.assertLess(result["extraction_confidence"], 1.0)
+
+    def test_duration_line_is_not_understood(self):
+        self.assertIsNone(extract_eligibility_fast(criteria("No other cancer for at least 5 years")))
+
+    def test_age_with_other_content_is_not_understood(self):
+        self.assertIsNone(extract_eligibility_fast(criteria("Age >= 18 years and no prior malignancy")))
+
+    def test_age_phrasings(self):
+        for line, expected in [
+            ("At least 18 years of age at the time of signing informed consent", {"min": 18, "max": None}),
+            ("Aged 18 to 75 years", {"min": 18, "max": 75}),
+            ("Patients must be 18 years old or older", None),
+        ]:
+            text = "\n".join(["Inclusion Criteria:", line, "Stage IV NSCLC", "ECOG 0-1"])
+            result = extract_eligibility_fast(text)
+            if expected is None:
+                self.assertIsNone(result, line)
+            else:
+                self.assertEqual(result["age"], expected, line)
+
+
+class HistologyTest(unittest.TestCase):
+    def test_allowed_histology(self):
+        result = extract_eligibility_fast(criteria("Adenocarcinoma histology"))
+        self.assertEqual(result["histology"]["allowed"], ["adenocarcinoma"])
+
+    def test_negated_histology_is_not_understood(self):
+        for line in [
+            "Stage IV NSCLC excluding squamous histology",
+            "Histology other than squamous cell carcinoma",
+            "No adenocarcinoma",
+        ]:
+            self.assertIsNone(extract_eligibility_fast(criteria(line)), line)
+
+
+class StageTest(unittest.TestCase):
+    def test_range_to_whole_stage(self):
+        result = extract_eligibility_fast(criteria("Stage IIIB-IV"))
+        self.assertEqual(result["disease_stage"]["allowed"], ["IV", "IIIB", "IIIC"])
+
+    def test_range_within_stage(self):
+        result = extract_eligibility_fast(criteria("Stage IIIA-IIIC"))
+        self.assertEqual(result["disease_stage"]["allowed"], ["IV", "IIIA", "IIIB", "IIIC"])
+
+    def test_range_endpoint_outside_stage_order_falls_through(self):
+        self.assertIsNone(extract_eligibility_fast(criteria("Stage IIIB-IVB")))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,7 +1,7 @@
 'use client';
 
 import { useEffect, useState } from 'react';
-import { api, ClinicalTrial, PaginatedResponse, RelevanceStats } from '@/lib/api';
+import { api, ClinicalTrialListItem, PaginatedResponse, RelevanceStats } from '@/lib/api';
 import { Card } from '@/components/Card';
 import { FilterSelect } from '@/components/FilterSelect';
 import { Pagination } from '@/components/Pagination';
@@ -34,7 +34,7 @@ const relevanceColors: Record<string, { bg: string; text: string }> = {
 };
 
 export default function TrialsPage() {
-  const [data, setData] = useState<PaginatedResponse<ClinicalTrial> | null>(null);
+  const [data, setData] = useState<PaginatedResponse<ClinicalTrialListItem> | null>(null);
   const [phases, setPhases] = useState<string[]>([]);
   const [statuses, setStatuses] = useState<string[]>([]);
   const [biomarkers, setBiomarkers] = useState<string[]>([]);
@@ -292,7 +292,7 @@ export default function TrialsPage() {
                             : 'orange'
                         }]
                       : []),
-                    ...(trial.structured_eligibility
+                    ...(trial.has_structured_eligibility
                       ? [{ label: 'Structured', color: 'emerald' }]
                       : []),
                   ]}
@@ -300,13 +300,13 @@ export default function TrialsPage() {
                     ...(trial.sponsor
                       ? [{ label: 'Sponsor', value: trial.sponsor }]
                       : []),
-                    ...(trial.locations && trial.locations.length > 0
-                      ? [{ label: 'Locations', value: `${trial.locations.length} sites` }]
+                    ...(trial.location_count > 0
+                      ? [{ label: 'Locations', value: `${trial.location_count} sites` }]
                       : []),
-                    ...(trial.structured_eligibility?.biomarkers?.required_positive
+                    ...(trial.required_biomarkers
                       ? [{
                           label: 'Biomarkers',
-                          value: Object.keys(trial.structured_eligibility.biomarkers.required_positive).join(', ') || 'None specified'
+                          value: Object.keys(trial.required_biomarkers).join(', ') || 'None specified'
                         }]
                       : []),
                   ]}
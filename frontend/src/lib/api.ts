@@ -126,10 +126,30 @@ export interface ClinicalTrial {
   eligibility_extracted_at: string | null;
 }
 
+// Trial row returned by the /trials list endpoint
+export interface ClinicalTrialListItem {
+  id: number;
+  nct_id: string;
+  title: string | null;
+  brief_summary: string | null;
+  phase: string | null;
+  status: string | null;
+  sponsor: string | null;
+  conditions: string[] | null;
+  primary_completion_date: string | null;
+  study_url: string | null;
+  last_updated: string | null;
+  nsclc_relevance: string | null;
+  relevance_score: number | null;
+  location_count: number;
+  has_structured_eligibility: boolean;
+  required_biomarkers: Record<string, unknown> | null;
+}
+
 export interface RelevanceStats {
   total: number;
   nsclc_relevant_count: number;
-  categories: Record<string, { count: number; percentage: number }>;
+  categories: Record<string, { count: number; percentage: number; phases: Record<string, number> }>;
 }
 
 export interface CancerCenter {
@@ -158,6 +178,7 @@ export interface PaginatedResponse<T> {
   page: number;
   page_size: number;
   total_pages: number;
+  next_cursor?: string | null;
 }
 
 export interface SearchResult {
@@ -417,7 +438,7 @@ export const api = {
     relevance?: string;
     include_all_relevance?: boolean;
     has_structured_eligibility?: boolean;
-  }) => fetchApi<PaginatedResponse<ClinicalTrial>>('/trials', params as Record<string, string | number>),
+  }) => fetchApi<PaginatedResponse<ClinicalTrialListItem>>('/trials', params as Record<string, string | number>),
 
   getTrial: (nctId: string) => fetchApi<ClinicalTrial>(`/trials/${nctId}`),
 